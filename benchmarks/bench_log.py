@@ -0,0 +1,99 @@
+"""
+Microbenchmark for lambdas._log: per-call cost of the previous print-per-record logger
+against the buffered logger, level filtering, sampling and lazy fields.
+
+Usage:
+    python benchmarks/bench_log.py [calls]
+
+Output goes through a line-buffered pipe into a discarding child process. Like the Lambda
+runtime's stdout, that costs one write per line, so both formatting and write overhead
+are measured.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from lambdas import _log  # noqa: E402
+
+EVENT = {"run_id": "run-123", "repo": "org/repo", "sha": "abc123"}
+
+
+def _legacy(level, message, event=None, **fields):
+    # The logger as it was: timestamp, JSON encode and print for every call
+    rec = {"ts": datetime.utcnow().isoformat() + "Z", "level": level.upper(), "message": message}
+    rec.update({k: v for k, v in _log._ctx_fields(event).items() if v is not None})
+    rec.update(fields)
+    print(json.dumps(rec, separators=(",", ":")))
+
+
+def _expensive():
+    return sum(range(2000))
+
+
+def _time(fn, calls):
+    start = time.perf_counter()
+    fn(calls)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def legacy(calls):
+    for i in range(calls):
+        _legacy("INFO", "parsed plan", EVENT, items=i)
+
+
+def unbuffered(calls):
+    for i in range(calls):
+        _log.log("INFO", "parsed plan", EVENT, items=i)
+
+
+@_log.buffered
+def buffered(calls):
+    for i in range(calls):
+        _log.log("INFO", "parsed plan", EVENT, items=i)
+
+
+def filtered(calls):
+    # DEBUG records below LOG_LEVEL=INFO, with an expensive field passed lazily
+    for _ in range(calls):
+        _log.log("DEBUG", "plan detail", EVENT, detail=_expensive)
+
+
+def filtered_eager(calls):
+    for _ in range(calls):
+        _log.log("DEBUG", "plan detail", EVENT, detail=_expensive())
+
+
+@_log.buffered
+def sampled(calls):
+    for i in range(calls):
+        _log.log("INFO", "poll tick", EVENT, items=i)
+
+
+def main(calls=20000):
+    _log.set_level("INFO")
+    _log.set_sample_rate("poll tick", 0.1)
+    cases = [legacy, unbuffered, buffered, filtered, filtered_eager, sampled]
+    real = sys.stdout
+    sink = subprocess.Popen([sys.executable, "-c", "import sys\nfor _ in sys.stdin.buffer: pass"], stdin=subprocess.PIPE)
+    pipe = open(sink.stdin.fileno(), "w", buffering=1, closefd=False)
+    sys.stdout = pipe
+    try:
+        results = [(fn.__name__, _time(fn, calls)) for fn in cases]
+    finally:
+        sys.stdout = real
+        pipe.close()
+        sink.stdin.close()
+        sink.wait()
+    base = results[0][1]
+    print(f"{'case':<16}{'ns/call':>10}{'vs legacy':>12}")
+    for name, ns in results:
+        print(f"{name:<16}{ns:>10.0f}{base / ns:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
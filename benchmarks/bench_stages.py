@@ -0,0 +1,191 @@
+"""
+Scaling benchmark for the deterministic stages: plan parsing (tf_plan_parser._parse_changes),
+iam_lint.lint_policy, opa_gate, impact_map and risk_score, on synthetic plans of 100 to 100k
+resources (tools/synth_plan.py).
+
+Each (stage, size) records the best-of-N wall time and the tracemalloc peak of one extra run.
+Handler log output is discarded. Without the bundled OPA CLI, opa_gate measures its heuristic
+path, which is what runs when the CLI is missing or times out.
+
+Usage:
+    python benchmarks/bench_stages.py [--sizes 100,1000,10000,100000] [--stages parse,lint]
+    python benchmarks/bench_stages.py --save      # record benchmarks/baselines/stages.json
+    python benchmarks/bench_stages.py --check     # exit 1 on regression against the baseline
+
+Baselines store a calibration time (a fixed pure-Python workload). --check scales the stored
+times by the current/baseline calibration ratio, so a baseline from another machine still
+gives a usable comparison. Differences under a small absolute floor are ignored as noise.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from lambdas import iam_lint, impact_map, opa_gate, risk_score, tf_plan_parser  # noqa: E402
+from tools.synth_plan import generate, policy_document  # noqa: E402
+
+SIZES = [100, 1_000, 10_000, 100_000]
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "stages.json")
+# Regression = slower than baseline by more than TIME_THRESHOLD (after calibration) and by more than TIME_FLOOR_MS
+TIME_THRESHOLD = 0.5
+TIME_FLOOR_MS = 0.5
+MEM_THRESHOLD = 0.2
+MEM_FLOOR_MB = 0.25
+# Stop repeating a case once this much time has been spent on it
+CASE_BUDGET_S = 1.0
+MAX_REPEATS = 20
+
+
+_DEVNULL = open(os.devnull, "w")
+
+
+def _quiet(fn: Callable[[], Any]) -> Callable[[], Any]:
+    def run():
+        real = sys.stdout
+        sys.stdout = _DEVNULL
+        try:
+            return fn()
+        finally:
+            sys.stdout = real
+    return run
+
+
+def cases(plan: Dict[str, Any]) -> Dict[str, Callable[[], Any]]:
+    """Stage name -> zero-argument call on inputs derived from ``plan`` (prepared outside the timing)."""
+    summary = tf_plan_parser._parse_changes(plan)
+    policy = policy_document(plan)
+    violations = iam_lint.lint_policy(policy)
+    impact = _quiet(lambda: impact_map.handler({"summary": summary}, None))()
+    state = {"run_id": "bench", "plan": {"Payload": {"summary": summary}}, "policy": policy,
+             "metadata": {"tags": {"Owner": "o", "CostCenter": "c"}},
+             "lint": {"Payload": {"violations": violations}}, "impact": {"Payload": impact}}
+    return {
+        "parse": lambda: tf_plan_parser._parse_changes(plan),
+        "lint": lambda: iam_lint.lint_policy(policy),
+        "opa": _quiet(lambda: opa_gate.handler(state, None)),
+        "impact": _quiet(lambda: impact_map.handler({"run_id": "bench", "summary": summary}, None)),
+        "risk": _quiet(lambda: risk_score.handler(state, None)),
+    }
+
+
+def measure(fn: Callable[[], Any]) -> Dict[str, float]:
+    times = []
+    spent = 0.0
+    while len(times) < MAX_REPEATS and (len(times) < 3 or spent < CASE_BUDGET_S):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        times.append(dt)
+        spent += dt
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return {"ms": round(min(times) * 1000.0, 4), "peak_mb": round(max(0, peak) / (1024 * 1024), 4), "repeats": len(times)}
+
+
+def calibrate() -> float:
+    """Best-of-5 time (ms) of a fixed workload resembling the stages (dicts, strings, json)."""
+    doc = json.dumps({"Statement": [{"Action": [f"s3:A{i}", "s3:B"], "Resource": f"arn:{i}"} for i in range(200)]})
+    best = float("inf")
+    for _ in range(5):
+        t0 = time.perf_counter()
+        for _ in range(50):
+            seen = set()
+            for st in json.loads(doc)["Statement"]:
+                seen.update(a.split(":")[0] for a in st["Action"])
+                seen.add(st["Resource"].rsplit(":", 1)[-1])
+        best = min(best, time.perf_counter() - t0)
+    return round(best * 1000.0, 4)
+
+
+def run(sizes: List[int], stages: Optional[List[str]] = None, seed: int = 0, progress=None) -> Dict[str, Any]:
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for size in sizes:
+        plan = generate(resources=size, seed=seed)
+        for stage, fn in cases(plan).items():
+            if stages and stage not in stages:
+                continue
+            res = measure(fn)
+            results.setdefault(stage, {})[str(size)] = res
+            if progress:
+                progress(stage, size, res)
+        del plan
+    return {"calibration_ms": calibrate(), "python": platform.python_version(), "seed": seed, "results": results}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], time_threshold: float = TIME_THRESHOLD,
+            mem_threshold: float = MEM_THRESHOLD) -> List[Dict[str, Any]]:
+    """Regressions of ``current`` against ``baseline``; cases missing from either side are skipped."""
+    scale = (current.get("calibration_ms") or 1.0) / (baseline.get("calibration_ms") or current.get("calibration_ms") or 1.0)
+    out = []
+    for stage, by_size in (current.get("results") or {}).items():
+        for size, cur in by_size.items():
+            base = ((baseline.get("results") or {}).get(stage) or {}).get(size)
+            if not base:
+                continue
+            expected_ms = base["ms"] * scale
+            if cur["ms"] > expected_ms * (1 + time_threshold) and cur["ms"] - expected_ms > TIME_FLOOR_MS:
+                out.append({"stage": stage, "size": int(size), "metric": "ms", "baseline": round(expected_ms, 4),
+                            "current": cur["ms"], "ratio": round(cur["ms"] / expected_ms, 2)})
+            if cur["peak_mb"] > base["peak_mb"] * (1 + mem_threshold) and cur["peak_mb"] - base["peak_mb"] > MEM_FLOOR_MB:
+                out.append({"stage": stage, "size": int(size), "metric": "peak_mb", "baseline": base["peak_mb"],
+                            "current": cur["peak_mb"], "ratio": round(cur["peak_mb"] / (base["peak_mb"] or 1e-9), 2)})
+    return out
+
+
+def _row(stage: str, size: int, res: Dict[str, float]) -> None:
+    per_k = res["ms"] / size * 1000
+    print(f"{stage:<8}{size:>9}{res['ms']:>12.3f}{per_k:>14.3f}{res['peak_mb']:>11.2f}", flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    ap.add_argument("--stages", help="comma-separated subset of parse,lint,opa,impact,risk")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    ap.add_argument("--check", action="store_true", help="compare with the baseline; exit 1 on regression")
+    ap.add_argument("--threshold", type=float, default=TIME_THRESHOLD, help="allowed relative slowdown")
+    ap.add_argument("--mem-threshold", type=float, default=MEM_THRESHOLD, help="allowed relative peak memory growth")
+    ap.add_argument("--json", help="also write the results here")
+    args = ap.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    stages = [s for s in (args.stages or "").split(",") if s] or None
+
+    print(f"{'stage':<8}{'resources':>9}{'ms':>12}{'ms/1k res':>14}{'peak MB':>11}")
+    current = run(sizes, stages, args.seed, progress=_row)
+    print(f"calibration {current['calibration_ms']} ms (python {current['python']})")
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(current, fh, indent=2, sort_keys=True)
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as fh:
+            json.dump(current, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        print(f"baseline written to {args.baseline}")
+    if args.check:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = compare(current, baseline, args.threshold, args.mem_threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['stage']} @ {r['size']}: {r['metric']} {r['current']} vs {r['baseline']} ({r['ratio']}x)")
+        if regressions:
+            return 1
+        print("no regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -99,8 +99,9 @@ with Diagram(
 
     # State machine tasks
     sfn >> Edge(label="ParsePlan") >> tfplan
-    sfn >> Edge(label="LoadMode") >> config_mode >> ssm
-    sfn >> Edge(label="BundleGuard") >> bundle_guard >> table
+    sfn >> Edge(label="ResolveConfig") >> config_mode >> ssm
+    config_mode >> Edge(label="bundle approval, repo settings (cached)") >> table
+    bundle_guard >> table
     sfn >> Edge(label="OPA Gate") >> opa
     sfn >> lint
     sfn >> risk
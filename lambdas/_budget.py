@@ -0,0 +1,97 @@
+import math
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+# Time kept back from the Lambda deadline for logging, result serialization and
+# the runtime's own bookkeeping. Work that would eat into it is skipped.
+RESERVE_MS = int(os.environ.get("BUDGET_RESERVE_MS", "1500"))
+# Never hand a client a timeout below this, even when the budget is nearly gone
+MIN_TIMEOUT_S = 0.5
+# SDK attempts per call (first try included) when the budget has room for all of them
+MAX_ATTEMPTS = 2
+# Shortest per-attempt timeout worth a retry; below it the budget goes to a single attempt
+MIN_ATTEMPT_S = 5.0
+
+_CLIENTS: Dict[Tuple[str, int, int, Optional[str]], Any] = {}
+
+
+class Budget:
+    """Deadline-aware execution budget for a single invocation.
+
+    Built from the Lambda context (``get_remaining_time_in_millis``) and an optional
+    pipeline-wide ``deadline_ms`` (epoch millis) carried in the event; the earlier one wins.
+    Handlers use it to size HTTP/SDK/subprocess timeouts and to stop early with a
+    partial result flagged ``degraded`` instead of being killed mid-flight.
+    """
+
+    def __init__(self, deadline: Optional[float] = None, reserve_ms: int = RESERVE_MS):
+        # deadline is a time.monotonic() value; None means unbounded (local runs, tests)
+        self.deadline = deadline
+        self.reserve_ms = reserve_ms
+
+    @classmethod
+    def from_context(cls, context: Any, event: Optional[Dict[str, Any]] = None, reserve_ms: Optional[int] = None) -> "Budget":
+        now = time.monotonic()
+        deadlines = []
+        getter = getattr(context, "get_remaining_time_in_millis", None)
+        if callable(getter):
+            try:
+                deadlines.append(now + float(getter()) / 1000.0)
+            except Exception:
+                pass
+        pipeline_deadline = (event or {}).get("deadline_ms") if isinstance(event, dict) else None
+        if pipeline_deadline:
+            try:
+                deadlines.append(now + (float(pipeline_deadline) - time.time() * 1000.0) / 1000.0)
+            except (TypeError, ValueError):
+                pass
+        return cls(min(deadlines) if deadlines else None, RESERVE_MS if reserve_ms is None else reserve_ms)
+
+    def remaining_ms(self) -> float:
+        """Usable milliseconds left (after the reserve); ``inf`` when unbounded."""
+        if self.deadline is None:
+            return math.inf
+        return max(0.0, (self.deadline - time.monotonic()) * 1000.0 - self.reserve_ms)
+
+    def nearly_spent(self, need_ms: float = 0.0) -> bool:
+        """True when less than ``need_ms`` of usable budget is left."""
+        return self.remaining_ms() <= need_ms
+
+    def timeout(self, cap: float) -> float:
+        """Seconds to give an internal call: the remaining budget, capped at ``cap``."""
+        remaining_s = self.remaining_ms() / 1000.0
+        return max(MIN_TIMEOUT_S, min(float(cap), remaining_s))
+
+    def config(self, cap: float) -> Config:
+        """botocore Config whose attempts, retries included, fit inside the budget together.
+
+        Each attempt gets ``cap`` while the budget has room for all of them; otherwise the
+        remaining time is divided across the attempts, and a nearly spent budget gets a
+        single attempt. ``total_max_attempts`` counts the first try (``max_attempts`` would not).
+        """
+        remaining_s = self.remaining_ms() / 1000.0
+        attempts = MAX_ATTEMPTS
+        while attempts > 1 and remaining_s / attempts < min(float(cap), MIN_ATTEMPT_S):
+            attempts -= 1
+        t = max(1, int(max(MIN_TIMEOUT_S, min(float(cap), remaining_s / attempts))))
+        return Config(connect_timeout=t, read_timeout=t, retries={"total_max_attempts": attempts})
+
+    def client(self, service: str, cap: float, session: Any = None) -> Any:
+        """boto3 client sized to the budget.
+
+        Clients for the default session are cached per (service, timeout, attempts) so
+        warm containers keep reusing connections; timeouts are rounded down to whole seconds.
+        """
+        cfg = self.config(cap)
+        if session is not None:
+            return session.client(service, config=cfg)
+        key = (service, int(cfg.read_timeout), cfg.retries["total_max_attempts"], os.environ.get("AWS_REGION"))
+        cli = _CLIENTS.get(key)
+        if cli is None:
+            cli = boto3.client(service, config=cfg)
+            _CLIENTS[key] = cli
+        return cli
@@ -0,0 +1,154 @@
+import functools
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from lambdas._budget import Budget
+from lambdas._log import log, stage_metric
+from lambdas._state import payload as unwrap
+from lambdas._trace import span
+
+# Stage results larger than this (compact JSON) go to S3; the state keeps a reference
+THRESHOLD_BYTES = int(os.environ.get("CLAIM_THRESHOLD_BYTES", "32768"))
+# Defaults to the bucket the run's plan came from (event["bucket"])
+CLAIM_BUCKET = os.environ.get("CLAIM_BUCKET")
+CLAIM_PREFIX = os.environ.get("CLAIM_PREFIX", "claims/")
+# Fetched claims kept per container, by content hash (as JSON bytes: each resolve
+# returns a fresh object, so a handler mutating its input cannot corrupt later reads)
+MEMO_MAX = int(os.environ.get("CLAIM_MEMO_MAX", "32"))
+REF = "$claim"
+
+# Fields the state machine reads from $.<key>.Payload (Choice rules, Pass parameters);
+# they stay inline next to the reference so routing never needs the blob
+KEEP: Dict[str, tuple] = {
+    "plan": ("status", "error"),
+    "opa": ("allow", "deny", "degraded"),
+    "lint": ("valid",),
+    "impact": ("blast_radius",),
+    "risk": ("risk", "confidence", "drivers"),
+    "drift": ("drift", "degraded"),
+    "verdict": ("verdict", "confidence", "degraded"),
+}
+
+_lock = threading.Lock()
+_MEMO: "OrderedDict[str, bytes]" = OrderedDict()
+# Handlers called in-process by another handler (pipeline_runner, publisher) return plain results
+_active = False
+
+
+def _s3(budget: Budget):
+    return budget.client("s3", cap=5)
+
+
+def is_ref(v: Any) -> bool:
+    return isinstance(v, dict) and isinstance(v.get(REF), dict)
+
+
+def offload(value: Any, event: Optional[Dict[str, Any]], key: str, budget: Optional[Budget] = None,
+            threshold: Optional[int] = None) -> Any:
+    """``value`` itself when small, else a reference ``{"$claim": {...}, <KEEP[key] fields>}``.
+
+    The blob is gzip'd JSON at ``<CLAIM_PREFIX><run_id>/<key>-<sha256[:16]>.json.gz``; the key is
+    content addressed, so a retried task rewrites the same object. Without a bucket, or when
+    the upload fails, the full value is returned: an oversized state beats a lost result.
+    """
+    if not isinstance(value, dict) or is_ref(value):
+        return value
+    raw = json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+    if len(raw) <= (THRESHOLD_BYTES if threshold is None else threshold):
+        return value
+    e = event or {}
+    bucket = CLAIM_BUCKET or e.get("bucket")
+    if not bucket:
+        log("INFO", "claim skipped - no bucket", e, key=key, bytes=len(raw))
+        return value
+    sha = hashlib.sha256(raw).hexdigest()
+    s3_key = f"{CLAIM_PREFIX}{e.get('run_id') or 'norun'}/{key}-{sha[:16]}.json.gz"
+    body = gzip.compress(raw, compresslevel=6)
+    try:
+        with span("claim.put", key=key, bytes=len(raw), compressed=len(body)):
+            _s3(budget or Budget()).put_object(Bucket=bucket, Key=s3_key, Body=body,
+                                               ContentType="application/json", ContentEncoding="gzip")
+    except Exception as err:
+        log("ERROR", "claim put failed", e, key=key, error=str(err))
+        return value
+    _remember(sha, raw)
+    stage_metric("ClaimBytes", len(raw), "Bytes")
+    log("INFO", "claim offloaded", e, key=key, bytes=len(raw), compressed=len(body))
+    ref = {REF: {"bucket": bucket, "key": s3_key, "sha256": sha, "bytes": len(raw)}}
+    ref.update({f: value[f] for f in KEEP.get(key, ()) if f in value})
+    return ref
+
+
+def _remember(sha: str, raw: bytes) -> None:
+    with _lock:
+        _MEMO[sha] = raw
+        _MEMO.move_to_end(sha)
+        while len(_MEMO) > MEMO_MAX:
+            _MEMO.popitem(last=False)
+
+
+def resolve(v: Any, budget: Optional[Budget] = None) -> Any:
+    """The full value behind a reference (fetched once per container); anything else unchanged.
+
+    Every call returns a new object; callers may modify it.
+    """
+    if not is_ref(v):
+        return v
+    c = v[REF]
+    with _lock:
+        raw = _MEMO.get(c["sha256"])
+        if raw is not None:
+            _MEMO.move_to_end(c["sha256"])
+    if raw is None:
+        with span("claim.get", key=c["key"], bytes=c.get("bytes")):
+            body = _s3(budget or Budget()).get_object(Bucket=c["bucket"], Key=c["key"])["Body"].read()
+            raw = gzip.decompress(body)
+        if hashlib.sha256(raw).hexdigest() != c["sha256"]:
+            raise ValueError(f"claim {c['key']} failed its digest check")
+        _remember(c["sha256"], raw)
+    return json.loads(raw)
+
+
+def payload(v: Any, budget: Optional[Budget] = None) -> Dict[str, Any]:
+    """``_state.payload`` plus claim-check resolution: an offloaded result is fetched on first use."""
+    return resolve(unwrap(v), budget) or {}
+
+
+@contextmanager
+def inline():
+    """Handlers called inside this block return plain results (they are handed along in-process)."""
+    global _active
+    prev, _active = _active, True
+    try:
+        yield
+    finally:
+        _active = prev
+
+
+def claim_check(key: str) -> Callable:
+    """Handler decorator: offload the result under state key ``key`` when it is oversized.
+
+    Only the outermost handler of an invocation offloads; see ``inline()``.
+    """
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(event: Any, context: Any = None, *args: Any, **kwargs: Any) -> Any:
+            if _active:
+                return fn(event, context, *args, **kwargs)
+            with inline():
+                out = fn(event, context, *args, **kwargs)
+            e = event if isinstance(event, dict) else {}
+            return offload(out, e, key, Budget.from_context(context, e))
+        return wrapper
+    return deco
+
+
+def clear() -> None:
+    with _lock:
+        _MEMO.clear()
@@ -0,0 +1,154 @@
+import gzip
+import json
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except Exception:  # pragma: no cover
+    pa = None
+
+from lambdas import _rollup
+from lambdas._sketch import DDSketch
+
+# Column name -> type for the PRRuns export ("str", "float", "int", "list")
+SCHEMA: List[Tuple[str, str]] = [
+    ("run_id", "str"),
+    ("created_at", "str"),
+    ("repo", "str"),
+    ("sha", "str"),
+    ("verdict", "str"),
+    ("confidence", "float"),
+    ("tokens_estimated", "int"),
+    ("review_ms", "int"),
+    ("agent_ms", "int"),
+    ("violations", "list"),
+    ("published_verdict", "str"),
+]
+JSON_FORMAT = "pr-columnar/1"
+# Date-partitioned layout in the artifacts bucket: <prefix>dt=YYYY-MM-DD/part-<tag>.<ext>
+EXPORT_PREFIX = "exports/prruns/"
+CONTENT_TYPES = {"parquet": "application/vnd.apache.parquet", "json.gz": "application/gzip"}
+_BUCKETS = DDSketch()
+
+
+def _value(attr: Dict[str, Any], kind: str) -> Any:
+    if not isinstance(attr, dict):
+        return None
+    if kind == "list":
+        return list(attr.get("SS") or []) or [x.get("S") for x in (attr.get("L") or []) if x.get("S")] or None
+    raw = attr.get("N") if kind in ("int", "float") else attr.get("S")
+    if raw is None:
+        return None
+    if kind == "int":
+        return int(float(raw))
+    if kind == "float":
+        return float(raw)
+    return raw
+
+
+def columns_from_items(items: Iterable[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Typed DynamoDB items -> column lists (missing attributes become None)."""
+    cols: Dict[str, List[Any]] = {name: [] for name, _ in SCHEMA}
+    for it in items:
+        for name, kind in SCHEMA:
+            cols[name].append(_value(it.get(name), kind))
+    return cols
+
+
+def default_format() -> str:
+    return "parquet" if pa is not None else "json"
+
+
+def encode(cols: Dict[str, List[Any]], fmt: str = "") -> Tuple[bytes, str]:
+    """Serialize columns; returns (bytes, file extension). Parquet needs pyarrow."""
+    fmt = fmt or default_format()
+    if fmt == "parquet":
+        if pa is None:
+            raise RuntimeError("pyarrow not available in runtime")
+        types = {"str": pa.string(), "float": pa.float64(), "int": pa.int64(), "list": pa.list_(pa.string())}
+        schema = pa.schema([(name, types[kind]) for name, kind in SCHEMA])
+        table = pa.Table.from_pydict({name: cols.get(name, []) for name, _ in SCHEMA}, schema=schema)
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink, compression="zstd")
+        return sink.getvalue().to_pybytes(), "parquet"
+    body = json.dumps({"format": JSON_FORMAT, "columns": cols}, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(body, compresslevel=6), "json.gz"
+
+
+def decode(data: bytes, ext: str) -> Any:
+    """Read a file written by encode(): a pyarrow Table for Parquet, a column dict otherwise."""
+    if ext == "parquet":
+        if pa is None:
+            raise RuntimeError("pyarrow not available in runtime")
+        return pq.read_table(pa.BufferReader(data))
+    doc = json.loads(gzip.decompress(data).decode("utf-8"))
+    if doc.get("format") != JSON_FORMAT:
+        raise ValueError("unsupported export format")
+    return doc["columns"]
+
+
+def part_key(prefix: str, day: str, tag: str, ext: str) -> str:
+    return f"{prefix}dt={day}/part-{tag}.{ext}"
+
+
+def key_ext(key: str) -> Optional[str]:
+    """File extension of an export object (None for anything else under the prefix)."""
+    return next((ext for ext in CONTENT_TYPES if key.endswith(f".{ext}")), None)
+
+
+def _aggregate_arrow(table) -> Dict[str, float]:
+    t: Dict[str, float] = {"runs": float(table.num_rows)}
+    verdicts = pc.utf8_lower(pc.fill_null(table.column("verdict"), ""))
+    for row in pc.value_counts(verdicts).to_pylist():
+        key = f"v_{row['values'] if row['values'] in _rollup.VERDICTS else 'other'}"
+        t[key] = t.get(key, 0) + row["counts"]
+    conf = table.column("confidence")
+    t["conf_sum"] = pc.sum(conf).as_py() or 0.0
+    t["conf_n"] = float(pc.count(conf).as_py())
+    t["tokens"] = float(pc.sum(table.column("tokens_estimated")).as_py() or 0)
+    rt = pc.drop_null(table.column("review_ms"))
+    if len(rt):
+        pos = pc.filter(rt, pc.greater(rt, 0))
+        zero = len(rt) - len(pos)
+        if zero:
+            t[f"{_rollup.REVIEW_PREFIX}z"] = float(zero)
+        if len(pos):
+            keys = pc.ceil(pc.divide(pc.ln(pc.cast(pos, pa.float64())), _BUCKETS._log_gamma))
+            for row in pc.value_counts(pc.cast(keys, pa.int64())).to_pylist():
+                t[f"{_rollup.REVIEW_PREFIX}{row['values']}"] = float(row["counts"])
+        t["rt_sum"] = float(pc.sum(rt).as_py())
+    flat = pc.drop_null(pc.list_flatten(table.column("violations")))
+    if len(flat):
+        for row in pc.value_counts(flat).to_pylist():
+            t[f"{_rollup.VIOLATION_PREFIX}{row['values']}"] = float(row["counts"])
+    return {k: v for k, v in t.items() if v}
+
+
+def _aggregate_lists(cols: Dict[str, List[Any]]) -> Dict[str, float]:
+    # Column-at-a-time passes over plain lists: the same shape as the Arrow path
+    t: Dict[str, float] = {"runs": float(len(cols.get("run_id") or []))}
+    for v, n in Counter((x or "").lower() for x in cols.get("verdict") or []).items():
+        key = f"v_{v if v in _rollup.VERDICTS else 'other'}"
+        t[key] = t.get(key, 0) + n
+    conf = [x for x in cols.get("confidence") or [] if x is not None]
+    t["conf_sum"], t["conf_n"] = float(sum(conf)), float(len(conf))
+    t["tokens"] = float(sum(x for x in cols.get("tokens_estimated") or [] if x))
+    rt = [x for x in cols.get("review_ms") or [] if x is not None]
+    for k, n in Counter(_BUCKETS.key(x) for x in rt).items():
+        t[f"{_rollup.REVIEW_PREFIX}{'z' if k is None else k}"] = float(n)
+    if rt:
+        t["rt_sum"] = float(sum(rt))
+    for vid, n in Counter(v for vs in cols.get("violations") or [] if vs for v in vs).items():
+        t[f"{_rollup.VIOLATION_PREFIX}{vid}"] = float(n)
+    return {k: v for k, v in t.items() if v}
+
+
+def aggregate(data: Any) -> Dict[str, float]:
+    """Rollup-style totals (runs, v_*, conf_*, tokens, rt:*, viol:*) for one decoded file."""
+    if pa is not None and isinstance(data, pa.Table):
+        return _aggregate_arrow(data)
+    return _aggregate_lists(data)
+
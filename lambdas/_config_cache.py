@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from lambdas._budget import Budget
+from lambdas._log import log, stage_metric
+
+# Mode, bundle approvals and per-repo settings change rarely; warm containers reuse them this long
+CONFIG_TTL_S = float(os.environ.get("CONFIG_TTL_S", "300"))
+# How often the config epoch item is re-read. tools/approve_bundle.py bumps the epoch,
+# so a new approval reaches warm containers within this window instead of the full TTL.
+EPOCH_CHECK_S = float(os.environ.get("CONFIG_EPOCH_CHECK_S", "30"))
+TABLE_NAME = os.environ.get("TABLE_NAME")
+MODE_PARAM = os.environ.get("MODE_PARAM", "pr-review/mode")
+BUNDLE_HASH = os.environ.get("BUNDLE_HASH", "")
+DEFAULT_MODE = "comment_only"
+
+# Config items share the runs table (hash key run_id) with the rollup items
+EPOCH_KEY = "CONFIG#EPOCH"
+BUNDLE_PREFIX = "CONFIG#BUNDLE#"
+REPO_PREFIX = "CONFIG#REPO#"
+
+_lock = threading.Lock()
+# key -> (expires_at monotonic, epoch it was loaded under, value)
+_ENTRIES: Dict[str, Tuple[float, int, Any]] = {}
+_EPOCH: Dict[str, Any] = {"value": None, "checked": 0.0}
+
+
+def _ddb(budget: Budget):
+    return budget.client("dynamodb", cap=3)
+
+
+def _ssm(budget: Budget):
+    return budget.client("ssm", cap=5)
+
+
+def _key(pk: str) -> Dict[str, Any]:
+    return {"run_id": {"S": pk}}
+
+
+def epoch(budget: Optional[Budget] = None) -> int:
+    """Config epoch from DynamoDB, re-read at most every EPOCH_CHECK_S.
+
+    A changed epoch drops every cached entry. Read failures keep the last known value
+    so an outage degrades to plain TTL expiry.
+    """
+    now = time.monotonic()
+    with _lock:
+        if _EPOCH["value"] is not None and now - _EPOCH["checked"] < EPOCH_CHECK_S:
+            return _EPOCH["value"]
+    value = _EPOCH["value"] or 0
+    if TABLE_NAME:
+        try:
+            res = _ddb(budget or Budget()).get_item(TableName=TABLE_NAME, Key=_key(EPOCH_KEY), ProjectionExpression="epoch")
+            value = int(((res.get("Item") or {}).get("epoch") or {}).get("N") or 0)
+        except Exception as e:
+            log("ERROR", "config epoch read failed", None, error=str(e))
+    with _lock:
+        if _EPOCH["value"] is not None and value != _EPOCH["value"]:
+            _ENTRIES.clear()
+        _EPOCH.update(value=value, checked=now)
+    return value
+
+
+def get(key: str, loader: Callable[[Budget], Any], budget: Optional[Budget] = None, ttl: Optional[float] = None) -> Any:
+    """Cached ``loader(budget)`` under ``key``; reloaded after ``ttl`` or when the epoch moves.
+
+    Loader exceptions propagate and nothing is cached, so a failed lookup is retried next call.
+    """
+    budget = budget or Budget()
+    ep = epoch(budget)
+    kind = key.split(":", 1)[0]
+    now = time.monotonic()
+    with _lock:
+        hit = _ENTRIES.get(key)
+    if hit and hit[0] > now and hit[1] == ep:
+        stage_metric("CacheHits", 1, Cache=f"config-{kind}")
+        return hit[2]
+    stage_metric("CacheMisses", 1, Cache=f"config-{kind}")
+    value = loader(budget)
+    with _lock:
+        _ENTRIES[key] = (now + (CONFIG_TTL_S if ttl is None else ttl), ep, value)
+    return value
+
+
+def invalidate(key: Optional[str] = None) -> None:
+    """Drop one entry (or everything) and force the next call to re-read the epoch."""
+    with _lock:
+        if key is None:
+            _ENTRIES.clear()
+        else:
+            _ENTRIES.pop(key, None)
+        _EPOCH["checked"] = 0.0
+
+
+def _load_mode(budget: Budget) -> str:
+    resp = _ssm(budget).get_parameter(Name=MODE_PARAM)
+    val = (resp.get("Parameter") or {}).get("Value")
+    return val.strip() if val else DEFAULT_MODE
+
+
+def mode(budget: Optional[Budget] = None, event: Any = None) -> str:
+    """Review mode from SSM (comment_only | suggest_approve | auto_approve); comment_only on failure."""
+    try:
+        return get(f"mode:{MODE_PARAM}", _load_mode, budget)
+    except Exception as e:
+        log("ERROR", "ssm get failed", event, error=str(e))
+        return DEFAULT_MODE
+
+
+def _load_approval(bundle_hash: str) -> Callable[[Budget], bool]:
+    def load(budget: Budget) -> bool:
+        res = _ddb(budget).get_item(TableName=TABLE_NAME, Key=_key(f"{BUNDLE_PREFIX}{bundle_hash}"), ConsistentRead=True)
+        approved = (res.get("Item") or {}).get("approved")
+        return isinstance(approved, dict) and approved.get("BOOL") is True
+    return load
+
+
+def bundle_status(bundle_hash: Optional[str] = None, budget: Optional[Budget] = None, event: Any = None) -> Dict[str, Any]:
+    """Governance check for a prompt/rule bundle: ``{approved, hash, reason}``.
+
+    Reasons: approved | not-approved | no-table | no-hash | ddb-error. Only lookups that
+    reached DynamoDB are cached; an approval bumps the epoch and clears a cached "not-approved".
+    """
+    bh = bundle_hash or BUNDLE_HASH
+    if not TABLE_NAME:
+        log("ERROR", "missing TABLE_NAME", event)
+        return {"approved": False, "hash": bh, "reason": "no-table"}
+    if not bh:
+        log("ERROR", "missing bundle hash", event)
+        return {"approved": False, "hash": "", "reason": "no-hash"}
+    try:
+        approved = get(f"bundle:{bh}", _load_approval(bh), budget)
+    except Exception as e:
+        log("ERROR", "bundle_guard ddb error", event, error=str(e))
+        return {"approved": False, "hash": bh, "reason": "ddb-error"}
+    return {"approved": approved, "hash": bh, "reason": "approved" if approved else "not-approved"}
+
+
+def _load_repo(repo: str) -> Callable[[Budget], Dict[str, Any]]:
+    def load(budget: Budget) -> Dict[str, Any]:
+        res = _ddb(budget).get_item(TableName=TABLE_NAME, Key=_key(f"{REPO_PREFIX}{repo}"))
+        raw = ((res.get("Item") or {}).get("settings") or {}).get("S")
+        return json.loads(raw) if raw else {}
+    return load
+
+
+def repo_settings(repo: Optional[str], budget: Optional[Budget] = None, event: Any = None) -> Dict[str, Any]:
+    """Per-repo overrides (item CONFIG#REPO#<org/repo>, attribute ``settings`` as a JSON string).
+
+    Empty when the repo has none, the table is not configured or the read fails.
+    """
+    if not (repo and TABLE_NAME):
+        return {}
+    try:
+        return get(f"repo:{repo}", _load_repo(repo), budget)
+    except Exception as e:
+        log("ERROR", "repo settings read failed", event, error=str(e))
+        return {}
+
+
+def resolve(event: Dict[str, Any], budget: Optional[Budget] = None) -> Dict[str, Any]:
+    """Everything the pipeline needs before the gates: ``{mode, bundle, settings}``.
+
+    A repo's ``settings.mode`` overrides the global SSM mode.
+    """
+    budget = budget or Budget()
+    settings = repo_settings(event.get("repo"), budget, event)
+    return {
+        "mode": settings.get("mode") or mode(budget, event),
+        "bundle": bundle_status(event.get("bundle_hash"), budget, event),
+        "settings": settings,
+    }
@@ -0,0 +1,264 @@
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from lambdas import _github_ratelimit as ratelimit
+from lambdas._log import stage_metric
+from lambdas._github_ratelimit import HIGH, LOW, RateLimitDeferred  # noqa: F401 (re-exported for handlers)
+
+DEFAULT_API = "https://api.github.com"
+HTTP_TIMEOUT_S = 10
+POOL_SIZE = int(os.environ.get("GITHUB_POOL_SIZE", "4"))
+ETAG_CACHE_SIZE = 256
+USER_AGENT = "pr-review-agent"
+# Retries after a rate-limit rejection; low-priority calls are deferred instead
+MAX_THROTTLE_RETRIES = 3
+# Pooled connections idle longer than this are closed rather than reused: the server (or a
+# load balancer) has likely dropped them, often while the container was frozen, and a write
+# on a dropped connection fails only after GitHub may have acted on it
+IDLE_CLOSE_S = float(os.environ.get("GITHUB_IDLE_CLOSE_S", "30"))
+
+# Errors that mean a pooled keep-alive connection went stale between invocations
+_STALE = (http.client.RemoteDisconnected, http.client.CannotSendRequest, BrokenPipeError, ConnectionResetError)
+# Of those, the ones that, raised while sending, mean the request never left this process
+_UNSENT = (http.client.CannotSendRequest, BrokenPipeError)
+# Methods that are safe to resend after the server may already have acted on them
+_IDEMPOTENT = frozenset(("GET", "HEAD"))
+
+
+class GitHubError(RuntimeError):
+    """Non-2xx response from the GitHub API."""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None, body: Any = None):
+        super().__init__(f"github {status}: {message}")
+        self.status = status
+        self.headers = headers or {}
+        self.body = body
+
+
+class Response:
+    def __init__(self, status: int, headers: Dict[str, str], data: Any, cached: bool = False):
+        self.status = status
+        self.headers = headers
+        self.data = data
+        # True when served from the ETag cache after a 304
+        self.cached = cached
+
+
+class GitHubClient:
+    """Keep-alive GitHub REST client shared by the GitHub lambdas.
+
+    - Keeps a small pool of persistent HTTP(S) connections per container so warm
+      invocations skip the TCP/TLS handshake; connections idle past IDLE_CLOSE_S are
+      replaced rather than risk a write the server never answers.
+    - GETs are conditional: the last ETag per (path, token) is replayed as
+      If-None-Match and a 304 returns the cached body (304s don't count against the rate limit).
+    - JSON encoding/decoding and error mapping live here, not in each handler.
+    - Every call passes through the rate-limit scheduler: ``priority`` decides whether a
+      call waits out a throttle (HIGH) or is deferred with RateLimitDeferred (LOW).
+    """
+
+    def __init__(self, base_url: str = DEFAULT_API, pool_size: int = POOL_SIZE, scheduler: Optional[ratelimit.Scheduler] = None):
+        parts = urlsplit(base_url)
+        self.base_url = base_url.rstrip("/")
+        self.scheme = parts.scheme or "https"
+        self.host = parts.hostname or "api.github.com"
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        self.pool_size = pool_size
+        # (connection, wall-clock time it was released); wall clock keeps running while frozen
+        self._pool: List[Tuple[http.client.HTTPConnection, float]] = []
+        self._lock = threading.Lock()
+        self._etags: "OrderedDict[Tuple[str, str], Tuple[str, Any]]" = OrderedDict()
+        self.connections_opened = 0
+        self.scheduler = scheduler or ratelimit.scheduler()
+
+    # -- connection pool -------------------------------------------------
+    def _new_conn(self, timeout: float) -> http.client.HTTPConnection:
+        self.connections_opened += 1
+        if self.scheme == "http":
+            return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        return http.client.HTTPSConnection(self.host, self.port, timeout=timeout)
+
+    def _acquire(self, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        now = time.time()
+        with self._lock:
+            # Most recently released last; anything idle too long is dropped, not tried
+            idle = [c for c, used in self._pool if now - used > IDLE_CLOSE_S]
+            self._pool = [(c, used) for c, used in self._pool if now - used <= IDLE_CLOSE_S]
+            conn = self._pool.pop()[0] if self._pool else None
+        for c in idle:
+            c.close()
+        if conn is None:
+            return self._new_conn(timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._pool) < self.pool_size:
+                self._pool.append((conn, time.time()))
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            conns, self._pool = self._pool, []
+        for c, _ in conns:
+            c.close()
+
+    # -- requests --------------------------------------------------------
+    def _path(self, path_or_url: str) -> str:
+        if path_or_url.startswith(self.base_url):
+            path_or_url = path_or_url[len(self.base_url):]
+        if not path_or_url.startswith("/"):
+            path_or_url = "/" + path_or_url
+        return self.prefix + path_or_url
+
+    def _send(self, method: str, path: str, body: Optional[bytes], headers: Dict[str, str], timeout: float):
+        conn, reused = self._acquire(timeout)
+        sent = False
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            sent = True
+            resp = conn.getresponse()
+            raw = resp.read()
+        except _STALE as e:
+            conn.close()
+            # A reset after the request went out may follow GitHub acting on it: resending a
+            # POST/PATCH/PUT could duplicate a comment or check run, or re-issue a merge
+            if not reused or not (method in _IDEMPOTENT or (not sent and isinstance(e, _UNSENT))):
+                raise
+            # The server dropped an idle keep-alive connection
+            conn = self._new_conn(timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                raw = resp.read()
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return resp.status, {k.lower(): v for k, v in resp.getheaders()}, raw
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        token: Optional[str] = None,
+        body: Any = None,
+        timeout: float = HTTP_TIMEOUT_S,
+        headers: Optional[Dict[str, str]] = None,
+        conditional: bool = True,
+        priority: str = HIGH,
+        rate_key: Optional[str] = None,
+        max_wait_s: Optional[float] = None,
+    ) -> Response:
+        method = method.upper()
+        full_path = self._path(path)
+        hdrs = {"Accept": "application/vnd.github+json", "User-Agent": USER_AGENT}
+        if token:
+            hdrs["Authorization"] = f"Bearer {token}"
+        data = None
+        if body is not None:
+            data = json.dumps(body, separators=(",", ":")).encode("utf-8")
+            hdrs["Content-Type"] = "application/json"
+        if headers:
+            hdrs.update(headers)
+
+        cache_key = None
+        if method == "GET" and conditional:
+            cache_key = (full_path, hashlib.sha256((token or "").encode("utf-8")).hexdigest()[:16])
+            with self._lock:
+                hit = self._etags.get(cache_key)
+            if hit:
+                hdrs["If-None-Match"] = hit[0]
+
+        # Callers name the installation (see rate_key()); its tokens rotate hourly, so a
+        # token fingerprint only stands in for it when the installation is unknown
+        key = rate_key or ("tok:" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:16] if token else "anonymous")
+        wait_cap = timeout if max_wait_s is None else max_wait_s
+        attempts = 0
+        while True:
+            self.scheduler.before(key, priority, wait_cap)
+            status, resp_headers, raw = self._send(method, full_path, data, hdrs, timeout)
+            throttled = self.scheduler.after(key, status, resp_headers)
+            if throttled and attempts < MAX_THROTTLE_RETRIES:
+                # before() sleeps out the block (HIGH) or raises RateLimitDeferred (LOW / too long)
+                attempts += 1
+                continue
+            break
+        if status == 304 and cache_key:
+            with self._lock:
+                cached = self._etags.get(cache_key)
+                if cached:
+                    self._etags.move_to_end(cache_key)
+            if cached:
+                stage_metric("CacheHits", 1, Cache="etag")
+                return Response(status, resp_headers, cached[1], cached=True)
+        if cache_key:
+            stage_metric("CacheMisses", 1, Cache="etag")
+
+        payload: Any = None
+        if raw:
+            try:
+                payload = json.loads(raw.decode("utf-8"))
+            except ValueError:
+                payload = raw.decode("utf-8", errors="replace")
+        if status >= 400:
+            msg = payload.get("message") if isinstance(payload, dict) else str(payload or "")
+            raise GitHubError(status, msg or "request failed", resp_headers, payload)
+
+        if cache_key and resp_headers.get("etag"):
+            with self._lock:
+                self._etags[cache_key] = (resp_headers["etag"], payload)
+                self._etags.move_to_end(cache_key)
+                while len(self._etags) > ETAG_CACHE_SIZE:
+                    self._etags.popitem(last=False)
+        return Response(status, resp_headers, payload)
+
+    def get(self, path: str, token: Optional[str] = None, **kw) -> Any:
+        return self.request("GET", path, token, **kw).data
+
+    def post(self, path: str, token: Optional[str] = None, body: Any = None, **kw) -> Any:
+        return self.request("POST", path, token, body=body if body is not None else {}, **kw).data
+
+    def patch(self, path: str, token: Optional[str] = None, body: Any = None, **kw) -> Any:
+        return self.request("PATCH", path, token, body=body if body is not None else {}, **kw).data
+
+    def put(self, path: str, token: Optional[str] = None, body: Any = None, **kw) -> Any:
+        return self.request("PUT", path, token, body=body if body is not None else {}, **kw).data
+
+
+def rate_key(installation_id: Any) -> Optional[str]:
+    """Rate-limit window key for an installation, or None when it is not known."""
+    return f"inst:{installation_id}" if installation_id else None
+
+
+_CLIENTS: Dict[str, GitHubClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def client(base_url: Optional[str] = None) -> GitHubClient:
+    """Per-container client for ``base_url`` (default: env GITHUB_API_URL or api.github.com)."""
+    url = (base_url or os.environ.get("GITHUB_API_URL") or DEFAULT_API).rstrip("/")
+    with _CLIENTS_LOCK:
+        cli = _CLIENTS.get(url)
+        if cli is None:
+            cli = GitHubClient(url)
+            _CLIENTS[url] = cli
+        return cli
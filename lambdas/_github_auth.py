@@ -0,0 +1,230 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import jwt  # PyJWT
+except Exception:  # pragma: no cover
+    jwt = None
+
+from lambdas._budget import Budget
+from lambdas._log import stage_metric
+from lambdas import _github
+
+# Installation tokens live one hour; hand out a cached one only while it has
+# at least this much life left so callers never start work with a dying token.
+REFRESH_MARGIN_S = int(os.environ.get("TOKEN_REFRESH_MARGIN_S", "600"))
+# Secrets are re-read periodically so key rotation is picked up by warm containers
+SECRET_TTL_S = int(os.environ.get("GITHUB_SECRET_TTL_S", "900"))
+APP_JWT_LIFETIME_S = 540
+# Optional shared tier: item per installation in the runs table (hash key run_id, expired
+# through its ttl attribute), token encrypted with KMS
+TOKEN_CACHE_TABLE = os.environ.get("TOKEN_CACHE_TABLE")
+TOKEN_CACHE_KMS_KEY = os.environ.get("TOKEN_CACHE_KMS_KEY")
+
+_lock = threading.Lock()
+_SECRETS: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_KEYS: Dict[str, Any] = {}
+_APP_JWTS: Dict[Tuple[str, str], Tuple[float, str]] = {}
+_INSTALLATIONS: Dict[str, int] = {}
+_TOKENS: Dict[int, Tuple[float, str]] = {}
+
+
+def _aws(service: str, budget: Budget):
+    return budget.client(service, cap=5)
+
+
+def _fetch_secret(arn: str, budget: Budget) -> Dict[str, Any]:
+    val = _aws("secretsmanager", budget).get_secret_value(SecretId=arn)
+    secret = val.get("SecretString")
+    if secret:
+        try:
+            return json.loads(secret)
+        except Exception:
+            return {"private_key": secret}
+    return {}
+
+
+def get_secret(arn: str, budget: Optional[Budget] = None) -> Dict[str, Any]:
+    """GitHub App secret (app_id, private_key, optional installation_id), memoized per container."""
+    now = time.time()
+    hit = _SECRETS.get(arn)
+    if hit and now - hit[0] < SECRET_TTL_S:
+        return hit[1]
+    secret = _fetch_secret(arn, budget or Budget())
+    _SECRETS[arn] = (now, secret)
+    return secret
+
+
+def _private_key(pem: str) -> Any:
+    # Parsing the PEM is most of the RS256 signing cost; do it once per key
+    fp = hashlib.sha256(pem.encode("utf-8")).hexdigest()
+    key = _KEYS.get(fp)
+    if key is None:
+        try:
+            from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+            key = load_pem_private_key(pem.encode("utf-8"), password=None)
+        except Exception:
+            # PyJWT will parse the PEM itself
+            key = pem
+        _KEYS[fp] = key
+    return key
+
+
+def app_jwt(app_id: str, private_key_pem: str) -> str:
+    """App JWT (RS256), reused until a minute before it expires."""
+    if not jwt:
+        raise RuntimeError("PyJWT not available in runtime")
+    now = time.time()
+    cache_key = (str(app_id), hashlib.sha256(private_key_pem.encode("utf-8")).hexdigest())
+    hit = _APP_JWTS.get(cache_key)
+    if hit and hit[0] - now > 60:
+        return hit[1]
+    iat = int(now)
+    payload = {"iat": iat - 60, "exp": iat + APP_JWT_LIFETIME_S, "iss": str(app_id)}
+    token = jwt.encode(payload, _private_key(private_key_pem), algorithm="RS256")
+    if isinstance(token, bytes):
+        token = token.decode("utf-8")
+    _APP_JWTS[cache_key] = (iat + APP_JWT_LIFETIME_S, token)
+    return token
+
+
+def _parse_expiry(value: Optional[str]) -> float:
+    if value:
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc).timestamp()
+        except ValueError:
+            pass
+    return time.time() + 3600
+
+
+def _fresh(expires_at: float) -> bool:
+    return expires_at - time.time() > REFRESH_MARGIN_S
+
+
+def _ddb_key(installation_id: int) -> Dict[str, Any]:
+    return {"run_id": {"S": f"CACHE#GHTOKEN#{installation_id}"}}
+
+
+def _ddb_get(installation_id: int, budget: Budget) -> Optional[Tuple[float, str]]:
+    if not TOKEN_CACHE_TABLE:
+        return None
+    try:
+        res = _aws("dynamodb", budget).get_item(TableName=TOKEN_CACHE_TABLE, Key=_ddb_key(installation_id), ConsistentRead=True)
+        item = res.get("Item") or {}
+        expires_at = float((item.get("expires_at") or {}).get("N") or 0)
+        blob = (item.get("token_ct") or {}).get("B")
+        if not blob or not _fresh(expires_at):
+            return None
+        if isinstance(blob, str):
+            blob = base64.b64decode(blob)
+        pt = _aws("kms", budget).decrypt(
+            CiphertextBlob=blob,
+            EncryptionContext={"installation_id": str(installation_id)},
+        )["Plaintext"]
+        return expires_at, pt.decode("utf-8")
+    except Exception:
+        # The shared tier is an optimization; fall through to minting
+        return None
+
+
+def _ddb_put(installation_id: int, expires_at: float, token: str, budget: Budget) -> None:
+    if not (TOKEN_CACHE_TABLE and TOKEN_CACHE_KMS_KEY):
+        return
+    try:
+        ct = _aws("kms", budget).encrypt(
+            KeyId=TOKEN_CACHE_KMS_KEY,
+            Plaintext=token.encode("utf-8"),
+            EncryptionContext={"installation_id": str(installation_id)},
+        )["CiphertextBlob"]
+        item = dict(_ddb_key(installation_id))
+        item.update({
+            "token_ct": {"B": ct},
+            "expires_at": {"N": str(int(expires_at))},
+            # DynamoDB TTL sweeps expired tokens
+            "ttl": {"N": str(int(expires_at))},
+        })
+        _aws("dynamodb", budget).put_item(TableName=TOKEN_CACHE_TABLE, Item=item)
+    except Exception:
+        pass
+
+
+def _cached_token(installation_id: int, budget: Budget) -> Optional[Tuple[float, str, str]]:
+    hit = _TOKENS.get(installation_id)
+    if hit and _fresh(hit[0]):
+        stage_metric("CacheHits", 1, Cache="token-container")
+        return hit[0], hit[1], "container"
+    shared = _ddb_get(installation_id, budget)
+    if shared:
+        with _lock:
+            _TOKENS[installation_id] = shared
+        stage_metric("CacheHits", 1, Cache="token-dynamodb")
+        return shared[0], shared[1], "dynamodb"
+    stage_metric("CacheMisses", 1, Cache="token")
+    return None
+
+
+def installation_token(secret: Dict[str, Any], repo: Optional[str] = None, budget: Optional[Budget] = None) -> Dict[str, Any]:
+    """Installation token for the App described by ``secret``.
+
+    Lookup order: container cache -> DynamoDB tier (if TOKEN_CACHE_TABLE) -> mint.
+    The repo -> installation ID mapping, the parsed private key and the App JWT are
+    memoized per container, so a warm hit makes no network calls at all.
+    Returns { token, expires_at, installation_id, source }.
+    """
+    budget = budget or Budget()
+    timeout = budget.timeout(_github.HTTP_TIMEOUT_S)
+    app_id = secret.get("app_id") or os.environ.get("GITHUB_APP_ID")
+    private_key = secret.get("private_key")
+    if not (app_id and private_key):
+        raise ValueError("missing-app-credentials")
+
+    iid = secret.get("installation_id") or (repo and _INSTALLATIONS.get(repo))
+    if iid:
+        hit = _cached_token(int(iid), budget)
+        if hit:
+            return {"token": hit[1], "expires_at": int(hit[0]), "installation_id": int(iid), "source": hit[2]}
+
+    jwt_token = app_jwt(str(app_id), private_key)
+    # JWT calls spend the App's own budget, not an installation's
+    app_key = f"app:{app_id}"
+    if not iid:
+        if not repo:
+            raise ValueError("missing-repo-for-installation-lookup")
+        j = _github.client().get(f"/repos/{repo}/installation", jwt_token, timeout=timeout, rate_key=app_key)
+        iid = int(j.get("id"))
+        with _lock:
+            _INSTALLATIONS[repo] = iid
+        hit = _cached_token(iid, budget)
+        if hit:
+            return {"token": hit[1], "expires_at": int(hit[0]), "installation_id": iid, "source": hit[2]}
+
+    iid = int(iid)
+    j = _github.client().post(f"/app/installations/{iid}/access_tokens", jwt_token, timeout=timeout, rate_key=app_key)
+    token = j.get("token")
+    expires_at = _parse_expiry(j.get("expires_at"))
+    with _lock:
+        _TOKENS[iid] = (expires_at, token)
+    _ddb_put(iid, expires_at, token, budget)
+    return {"token": token, "expires_at": int(expires_at), "installation_id": iid, "source": "minted"}
+
+
+def invalidate(installation_id: Optional[int] = None, repo: Optional[str] = None, budget: Optional[Budget] = None) -> None:
+    """Drop cached state after GitHub rejects a token (401) or an installation moves."""
+    with _lock:
+        if repo:
+            iid = _INSTALLATIONS.pop(repo, None)
+            installation_id = installation_id or iid
+        if installation_id is not None:
+            _TOKENS.pop(int(installation_id), None)
+    if installation_id is not None and TOKEN_CACHE_TABLE:
+        try:
+            _aws("dynamodb", budget or Budget()).delete_item(TableName=TOKEN_CACHE_TABLE, Key=_ddb_key(int(installation_id)))
+        except Exception:
+            pass
@@ -0,0 +1,205 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from lambdas._log import log, stage_metric
+
+HIGH = "high"  # check runs, merges, token minting: the review signal itself
+LOW = "low"    # PR comments and other nice-to-haves
+
+# Below this many remaining calls in the window, low-priority calls are deferred
+LOW_PRIORITY_FLOOR = int(os.environ.get("GITHUB_LOW_PRIORITY_FLOOR", "500"))
+# Below this, even high-priority calls wait for the reset if the budget allows
+HIGH_PRIORITY_FLOOR = int(os.environ.get("GITHUB_HIGH_PRIORITY_FLOOR", "10"))
+BACKOFF_BASE_S = 1.0
+BACKOFF_CAP_S = 30.0
+# Optional persistence so cold containers start from the last known headroom; items share
+# the runs table (hash key run_id) and expire through its ttl attribute
+RATE_LIMIT_TABLE = os.environ.get("RATE_LIMIT_TABLE")
+PERSIST_INTERVAL_S = 30.0
+
+
+class RateLimitDeferred(RuntimeError):
+    """Raised instead of sending a call that would spend scarce rate-limit budget."""
+
+    def __init__(self, key: str, wait_s: float, reason: str):
+        super().__init__(f"github call deferred ({reason}); retry in {int(wait_s)}s")
+        self.key = key
+        self.wait_s = wait_s
+        self.reason = reason
+
+
+class _Window:
+    __slots__ = ("remaining", "limit", "reset", "blocked_until", "backoff", "persisted_at", "loaded")
+
+    def __init__(self):
+        self.remaining: Optional[int] = None
+        self.limit: Optional[int] = None
+        self.reset = 0.0
+        self.blocked_until = 0.0
+        self.backoff = 0
+        self.persisted_at = 0.0
+        self.loaded = False
+
+
+class Scheduler:
+    """Tracks GitHub rate-limit headroom per installation and gates calls by priority.
+
+    State comes from X-RateLimit-* / Retry-After response headers; keys are the
+    installation (``inst:<id>``), the App for JWT calls, or a token fingerprint as a last resort. Low-priority calls are deferred well before
+    the budget runs dry, high-priority calls only wait when GitHub has actually
+    blocked us and the wait fits in the caller's time budget.
+    """
+
+    def __init__(self, store: Any = None):
+        self._windows: Dict[str, _Window] = {}
+        self._lock = threading.Lock()
+        self._store = store
+
+    def _window(self, key: str) -> _Window:
+        with self._lock:
+            w = self._windows.get(key)
+            if w is None:
+                w = self._windows[key] = _Window()
+        if not w.loaded:
+            w.loaded = True
+            self._load(key, w)
+        return w
+
+    # -- gating ------------------------------------------------------------
+    def before(self, key: str, priority: str, max_wait_s: float) -> None:
+        """Sleep or raise RateLimitDeferred before a call; returns when it may proceed."""
+        w = self._window(key)
+        now = time.time()
+        wait = 0.0
+        reason = ""
+        if w.blocked_until > now:
+            wait, reason = w.blocked_until - now, "retry-after"
+        elif w.remaining is not None and w.reset > now:
+            if priority == LOW and w.remaining < LOW_PRIORITY_FLOOR:
+                raise RateLimitDeferred(key, w.reset - now, "low-headroom")
+            if w.remaining <= HIGH_PRIORITY_FLOOR:
+                wait, reason = w.reset - now, "exhausted"
+        if wait <= 0:
+            return
+        if priority == LOW or wait > max_wait_s:
+            raise RateLimitDeferred(key, wait, reason)
+        time.sleep(wait)
+
+    def backoff_delay(self, key: str, headers: Mapping[str, str]) -> float:
+        """Delay before retrying a throttled call: Retry-After if given, else jittered exponential."""
+        w = self._window(key)
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        if w.remaining == 0 and w.reset > time.time():
+            return w.reset - time.time()
+        delay = min(BACKOFF_CAP_S, BACKOFF_BASE_S * (2 ** w.backoff))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    # -- accounting --------------------------------------------------------
+    def after(self, key: str, status: int, headers: Mapping[str, str]) -> bool:
+        """Record response headers; returns True when the response was a rate-limit rejection."""
+        w = self._window(key)
+        now = time.time()
+        try:
+            if "x-ratelimit-remaining" in headers:
+                w.remaining = int(headers["x-ratelimit-remaining"])
+            if "x-ratelimit-limit" in headers:
+                w.limit = int(headers["x-ratelimit-limit"])
+            if "x-ratelimit-reset" in headers:
+                w.reset = float(headers["x-ratelimit-reset"])
+        except ValueError:
+            pass
+        throttled = status == 429 or (status == 403 and (w.remaining == 0 or "retry-after" in headers))
+        if throttled:
+            w.backoff += 1
+            w.blocked_until = max(w.blocked_until, now + self.backoff_delay(key, headers))
+        elif status < 400:
+            w.backoff = 0
+        self._emit(key, w, throttled)
+        if throttled or now - w.persisted_at > PERSIST_INTERVAL_S:
+            self._save(key, w)
+        return throttled
+
+    def headroom(self, key: str) -> Optional[float]:
+        w = self._window(key)
+        if w.remaining is None or not w.limit:
+            return None
+        return w.remaining / float(w.limit)
+
+    def _emit(self, key: str, w: _Window, throttled: bool) -> None:
+        if w.remaining is None:
+            return
+        log(
+            "INFO",
+            "github rate-limit headroom",
+            None,
+            rate_key=key,
+            remaining=w.remaining,
+            limit=w.limit,
+            headroom=round(w.remaining / float(w.limit), 4) if w.limit else None,
+            reset_in_s=max(0, int(w.reset - time.time())),
+            throttled=throttled,
+        )
+        if w.limit:
+            stage_metric("GitHubRateHeadroom", round(100.0 * w.remaining / float(w.limit), 2), "Percent")
+        if throttled:
+            stage_metric("GitHubThrottled", 1)
+
+    # -- persistence -------------------------------------------------------
+    def _ddb(self):
+        if self._store is not None:
+            return self._store
+        if not RATE_LIMIT_TABLE:
+            return None
+        from lambdas._budget import Budget
+
+        return Budget().client("dynamodb", cap=2)
+
+    def _load(self, key: str, w: _Window) -> None:
+        ddb = self._ddb()
+        if ddb is None:
+            return
+        try:
+            item = ddb.get_item(TableName=RATE_LIMIT_TABLE, Key={"run_id": {"S": f"CACHE#RATELIMIT#{key}"}}).get("Item") or {}
+            n = lambda k: float((item.get(k) or {}).get("N") or 0)  # noqa: E731
+            if n("reset") > time.time():
+                w.remaining = int(n("remaining"))
+                w.limit = int(n("limit")) or None
+                w.reset = n("reset")
+            w.blocked_until = n("blocked_until")
+        except Exception:
+            pass
+
+    def _save(self, key: str, w: _Window) -> None:
+        ddb = self._ddb()
+        w.persisted_at = time.time()
+        if ddb is None or w.remaining is None:
+            return
+        try:
+            ddb.put_item(
+                TableName=RATE_LIMIT_TABLE,
+                Item={
+                    "run_id": {"S": f"CACHE#RATELIMIT#{key}"},
+                    "remaining": {"N": str(w.remaining)},
+                    "limit": {"N": str(w.limit or 0)},
+                    "reset": {"N": str(int(w.reset))},
+                    "blocked_until": {"N": str(int(w.blocked_until))},
+                    "ttl": {"N": str(int(max(w.reset, w.blocked_until)) + 3600)},
+                },
+            )
+        except Exception:
+            pass
+
+
+_SCHEDULER = Scheduler()
+
+
+def scheduler() -> Scheduler:
+    return _SCHEDULER
@@ -1,35 +1,219 @@
+import contextvars
+import functools
 import json
 import os
-from datetime import datetime
-from typing import Any, Dict, Optional
+import random
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "WARN": 30, "ERROR": 40, "CRITICAL": 50}
+# Records below this level are dropped before any formatting work
+MIN_LEVEL = LEVELS.get(os.environ.get("LOG_LEVEL", "INFO").upper(), 20)
+# Per-message sampling, e.g. LOG_SAMPLE_RATES='{"teams_notifier start": 0.1}'; ERROR and above are never sampled
+SAMPLE_RATES: Dict[str, float] = json.loads(os.environ.get("LOG_SAMPLE_RATES") or "{}")
+# Buffered records are flushed early once this many are pending
+BUFFER_MAX = int(os.environ.get("LOG_BUFFER_MAX", "500"))
+# CloudWatch namespace for Embedded Metric Format records
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "PRReview")
+# EMF accepts at most 100 values per metric and 30 dimensions per set
+EMF_MAX_VALUES = 100
+
+# (epoch seconds, level, message, context fields, fields, sample rate)
+_Record = Tuple[float, str, str, Dict[str, Any], Dict[str, Any], float]
+_buffer: List[_Record] = []
+# @buffered nesting depth, per context: a sink thread still running after its caller
+# returned (publisher timeouts) must not keep the caller's invocation from flushing
+_depth: "contextvars.ContextVar[int]" = contextvars.ContextVar("log_depth", default=0)
+# Pending metrics: dimension items -> {metric name: (unit, [values])}
+_metrics: Dict[Tuple[Tuple[str, str], ...], Dict[str, Tuple[str, List[float]]]] = {}
+# Stage name of the outermost @buffered handler (lambdas.tf_plan_parser -> tf_plan_parser)
+_stage: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("log_stage", default=None)
+_lock = threading.Lock()
+
+
+# Deployment-level context; read once per container rather than on every call
+_ENV_CTX = {"run_id": os.environ.get("RUN_ID"), "repo": os.environ.get("REPO"), "sha": os.environ.get("SHA")}
+_ENCODER = json.JSONEncoder(separators=(",", ":"), default=str)
+# (whole second, formatted prefix): records logged within the same second share it
+_ts_cache: Tuple[int, str] = (-1, "")
 
 
 def _ctx_fields(event: Optional[Dict[str, Any]]) -> Dict[str, Any]:
-    e = event or {}
+    e = event if isinstance(event, dict) else {}
     # Common context propagation for observability
     # Prefer explicit fields in event, then environment variables
     return {
-        "run_id": e.get("run_id") or os.environ.get("RUN_ID"),
-        "repo": e.get("repo") or os.environ.get("REPO"),
-        "sha": e.get("sha") or os.environ.get("SHA"),
+        "run_id": e.get("run_id") or _ENV_CTX["run_id"],
+        "repo": e.get("repo") or _ENV_CTX["repo"],
+        "sha": e.get("sha") or _ENV_CTX["sha"],
     }
 
 
-def log(level: str, message: str, event: Optional[Dict[str, Any]] = None, **fields: Any) -> None:
-    """Minimal structured logger printing JSON lines suitable for CloudWatch Logs.
+def _iso(ts: float) -> str:
+    global _ts_cache
+    sec = int(ts)
+    if _ts_cache[0] != sec:
+        _ts_cache = (sec, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec)))
+    return f"{_ts_cache[1]}.{int((ts - sec) * 1e6):06d}Z"
 
-    Usage: log("INFO", "parsed plan", event, items=10)
-    """
-    rec: Dict[str, Any] = {
-        "ts": datetime.utcnow().isoformat() + "Z",
-        "level": level.upper(),
+
+def set_level(level: str) -> None:
+    global MIN_LEVEL
+    MIN_LEVEL = LEVELS[level.upper()]
+
+
+def set_sample_rate(message: str, rate: float) -> None:
+    """Keep roughly ``rate`` of the records logged with ``message`` (1.0 keeps all)."""
+    SAMPLE_RATES[message] = rate
+
+
+def _format(rec: _Record) -> str:
+    ts, level, message, ctx, fields, rate = rec
+    out: Dict[str, Any] = {
+        "ts": _iso(ts),
+        "level": level,
         "message": message,
     }
-    rec.update({k: v for k, v in _ctx_fields(event).items() if v is not None})
-    if fields:
-        rec.update(fields)
+    out.update({k: v for k, v in ctx.items() if v is not None})
+    for k, v in fields.items():
+        # Callables are only evaluated for records that are actually written
+        if callable(v):
+            try:
+                v = v()
+            except Exception as e:
+                v = f"<field error: {e}>"
+        out[k] = v
+    if rate < 1.0:
+        out["sample_rate"] = rate
     try:
-        print(json.dumps(rec, separators=(",", ":")))
+        return _ENCODER.encode(out)
     except Exception:
         # Fallback to plain text if serialization fails
-        print(f"{rec['ts']} {rec['level']} {rec['message']} {fields}")
+        return f"{out['ts']} {level} {message} {fields}"
+
+
+def _write(records: List[_Record]) -> None:
+    if records:
+        sys.stdout.write("\n".join(_format(r) for r in records) + "\n")
+        sys.stdout.flush()
+
+
+def flush() -> None:
+    """Write all buffered records as one block."""
+    global _buffer
+    with _lock:
+        pending, _buffer = _buffer, []
+    _write(pending)
+
+
+def _emf(dims: Tuple[Tuple[str, str], ...], metrics: Dict[str, Tuple[str, List[float]]]) -> str:
+    rec: Dict[str, Any] = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [[k for k, _ in dims]],
+                "Metrics": [{"Name": name, "Unit": unit} for name, (unit, _) in metrics.items()],
+            }],
+        },
+    }
+    rec.update(dims)
+    for name, (_, values) in metrics.items():
+        rec[name] = values[0] if len(values) == 1 else values[:EMF_MAX_VALUES]
+    return _ENCODER.encode(rec)
+
+
+def flush_metrics() -> None:
+    """Write pending metrics as EMF records: one per dimension set, all its metrics together."""
+    global _metrics
+    with _lock:
+        pending, _metrics = _metrics, {}
+    if pending:
+        sys.stdout.write("\n".join(_emf(dims, m) for dims, m in pending.items()) + "\n")
+        sys.stdout.flush()
+
+
+def metric(name: str, value: float, unit: str = "None", **dimensions: str) -> None:
+    """Record a CloudWatch metric through the log stream (Embedded Metric Format, no API call).
+
+    Metrics sharing a dimension set are aggregated into one EMF record per invocation,
+    with repeated values kept as a value list so percentiles survive. Outside a
+    ``@buffered`` handler the record is written immediately.
+
+    Usage: metric("VerdictCount", 1, "Count", Verdict="GREEN")
+    """
+    dims = tuple(sorted((k, str(v)) for k, v in dimensions.items()))
+    with _lock:
+        entry = _metrics.setdefault(dims, {})
+        unit_, values = entry.get(name, (unit, []))
+        values.append(float(value))
+        entry[name] = (unit_, values)
+        overflow = len(values) >= EMF_MAX_VALUES
+    if not _depth.get() or overflow:
+        flush_metrics()
+
+
+def stage_metric(name: str, value: float, unit: str = "Count", **dimensions: str) -> None:
+    """metric() with the current handler's Stage dimension added."""
+    metric(name, value, unit, Stage=_stage.get() or "local", **dimensions)
+
+
+def log(level: str, message: str, event: Optional[Dict[str, Any]] = None, **fields: Any) -> None:
+    """Structured logger writing JSON lines suitable for CloudWatch Logs.
+
+    Usage: log("INFO", "parsed plan", event, items=10, plan=lambda: summarize(plan))
+
+    Records below LOG_LEVEL are dropped up front; messages listed in LOG_SAMPLE_RATES
+    are sampled (and carry ``sample_rate``). Callable field values are evaluated only
+    if the record is written. Inside a ``@buffered`` handler records are formatted and
+    written together when it returns; ERROR and above flush immediately.
+    """
+    lvl = level.upper()
+    rank = LEVELS.get(lvl, 20)
+    if rank < MIN_LEVEL:
+        return
+    rate = SAMPLE_RATES.get(message, 1.0) if rank < 40 else 1.0
+    if rate < 1.0 and random.random() >= rate:
+        return
+    rec = (time.time(), lvl, message, _ctx_fields(event), fields, rate)
+    if not _depth.get():
+        _write([rec])
+        return
+    with _lock:
+        _buffer.append(rec)
+        full = len(_buffer) >= BUFFER_MAX
+    if full or rank >= 40:
+        flush()
+
+
+def buffered(fn: Callable) -> Callable:
+    """Handler decorator: buffer log records and metrics for the invocation and flush them once at the end.
+
+    Records the handler's Duration (ms) and Errors as Stage metrics. Nested use (publisher
+    calling other handlers in-process) flushes at the outermost level. Depth and stage are
+    context variables; worker threads see them only when run in a copied context.
+    """
+    stage = fn.__module__.rsplit(".", 1)[-1]
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        depth = _depth.set(_depth.get() + 1)
+        outer_stage = _stage.set(_stage.get() or stage)
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = fn(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            metric("Duration", round((time.perf_counter() - start) * 1000.0, 3), "Milliseconds", Stage=stage)
+            if failed:
+                metric("Errors", 1, "Count", Stage=stage)
+            _depth.reset(depth)
+            _stage.reset(outer_stage)
+            if not _depth.get():
+                flush()
+                flush_metrics()
+    return wrapper
@@ -0,0 +1,120 @@
+import zlib
+from typing import Any, Iterable, List, Sequence, Tuple
+
+# US Letter in points, with the margins ReportLab's SimpleDocTemplate uses
+PAGE_SIZE = (612, 792)
+MARGIN = 72
+FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold", "F3": "Helvetica-Oblique"}
+# Fixed object numbers; pages and their content streams are numbered from FIRST_PAGE_OBJ
+_CATALOG, _PAGES, _FIRST_FONT = 1, 2, 3
+FIRST_PAGE_OBJ = _FIRST_FONT + len(FONTS)
+
+
+def _escape(text: str) -> bytes:
+    raw = str(text).encode("latin-1", "replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class PdfStream:
+    """Minimal PDF writer that emits each page as soon as it is finished.
+
+    Only the byte offsets of written objects are kept (for the xref table), so memory
+    is one page of content regardless of page count. Text uses the standard Type 1
+    fonts, which need no embedding. ``out`` is any object with ``write(bytes)``.
+    """
+
+    def __init__(self, out: Any, page_size: Tuple[int, int] = PAGE_SIZE):
+        self.out = out
+        self.page_size = page_size
+        self.pos = 0
+        self.offsets = {}
+        self.kids: List[int] = []
+        self._next = FIRST_PAGE_OBJ
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for i, (name, base) in enumerate(FONTS.items()):
+            self._obj(_FIRST_FONT + i, b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % base.encode())
+
+    def _write(self, data: bytes) -> None:
+        self.out.write(data)
+        self.pos += len(data)
+
+    def _obj(self, num: int, body: bytes) -> None:
+        self.offsets[num] = self.pos
+        self._write(b"%d 0 obj\n%s\nendobj\n" % (num, body))
+
+    def page(self, ops: bytes) -> None:
+        """Write one page whose content stream is ``ops`` (PDF operators)."""
+        content, page = self._next, self._next + 1
+        self._next += 2
+        data = zlib.compress(ops)
+        self._obj(content, b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(data), data))
+        fonts = b" ".join(b"/%s %d 0 R" % (name.encode(), _FIRST_FONT + i) for i, name in enumerate(FONTS))
+        self._obj(page, b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources << /Font << %s >> >> /Contents %d 0 R >>"
+                  % (_PAGES, self.page_size[0], self.page_size[1], fonts, content))
+        self.kids.append(page)
+
+    def close(self) -> None:
+        kids = b" ".join(b"%d 0 R" % k for k in self.kids)
+        self._obj(_PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.kids)))
+        self._obj(_CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % _PAGES)
+        xref = self.pos
+        size = max(self.offsets) + 1
+        rows = [b"0000000000 65535 f \n"] + [b"%010d 00000 n \n" % self.offsets[n] if n in self.offsets else b"0000000000 65535 f \n" for n in range(1, size)]
+        self._write(b"xref\n0 %d\n%s" % (size, b"".join(rows)))
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, _CATALOG, xref))
+
+
+class PageLayout:
+    """Top-to-bottom text layout over a PdfStream; starts a new page when the current one fills."""
+
+    STYLES = {"title": ("F2", 18, 28), "heading": ("F2", 13, 22), "body": ("F1", 10, 14), "bold": ("F2", 10, 14), "note": ("F3", 9, 14)}
+
+    def __init__(self, pdf: PdfStream):
+        self.pdf = pdf
+        self.width, self.height = pdf.page_size
+        self.ops: List[bytes] = []
+        self.y = self.height - MARGIN
+        self.pages = 0
+
+    def _room(self, leading: float) -> None:
+        if self.y - leading < MARGIN:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.ops:
+            self.pdf.page(b"\n".join(self.ops))
+            self.pages += 1
+        self.ops = []
+        self.y = self.height - MARGIN
+
+    def text(self, text: str, style: str = "body", x: float = MARGIN) -> None:
+        font, size, leading = self.STYLES[style]
+        self._room(leading)
+        self.y -= leading
+        self.ops.append(b"BT /%s %d Tf %.1f %.1f Td (%s) Tj ET" % (font.encode(), size, x, self.y, _escape(text)))
+
+    def row(self, cells: Sequence[Any], widths: Sequence[float], style: str = "body") -> None:
+        font, size, leading = self.STYLES[style]
+        self._room(leading)
+        self.y -= leading
+        x = MARGIN
+        for cell, w in zip(cells, widths):
+            # Rough Helvetica width (0.5em average) to clip overlong cells
+            limit = max(1, int(w / (size * 0.5)) - 1)
+            s = str(cell)
+            s = s if len(s) <= limit else s[:limit - 1] + "~"
+            self.ops.append(b"BT /%s %d Tf %.1f %.1f Td (%s) Tj ET" % (font.encode(), size, x, self.y, _escape(s)))
+            x += w
+
+    def table(self, rows: Iterable[Sequence[Any]], widths: Sequence[float], header: bool = True) -> None:
+        for i, cells in enumerate(rows):
+            self.row(cells, widths, "bold" if header and i == 0 else "body")
+
+    def space(self, points: float) -> None:
+        self.y -= points
+        if self.y < MARGIN:
+            self.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.pdf.close()
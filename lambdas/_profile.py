@@ -0,0 +1,148 @@
+import cProfile
+import functools
+import io
+import json
+import marshal
+import os
+import pstats
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from lambdas._budget import Budget
+from lambdas._log import log
+
+# Off unless PROFILE_ENABLED=1 or the event carries "profile": true / {"slow_ms": .., "mem_mb": ..}
+ENABLED = os.environ.get("PROFILE_ENABLED", "0") == "1"
+# Artifacts are kept only for invocations at or above either threshold
+SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "3000"))
+MEM_MB = float(os.environ.get("PROFILE_MEM_MB", "128"))
+PROFILE_BUCKET = os.environ.get("PROFILE_BUCKET") or os.environ.get("BUCKET_NAME")
+PROFILE_PREFIX = os.environ.get("PROFILE_PREFIX", "profiles/")
+# Local runs/tests: write artifacts here instead of S3
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+# Rows kept in the text reports
+TOP_N = int(os.environ.get("PROFILE_TOP_N", "40"))
+# Skip the upload when less than this is left; the answer matters more than the profile
+UPLOAD_MIN_MS = 1000
+
+# cProfile allows one active profiler per process; in-process handler calls
+# (publisher -> sinks) run unprofiled inside the outer one
+_active = False
+
+
+def _s3(budget: Budget):
+    return budget.client("s3", cap=5)
+
+
+def _settings(event: Any) -> Optional[Dict[str, float]]:
+    flag = event.get("profile") if isinstance(event, dict) else None
+    if not (ENABLED or flag):
+        return None
+    opts = flag if isinstance(flag, dict) else {}
+    return {"slow_ms": float(opts.get("slow_ms", SLOW_MS)), "mem_mb": float(opts.get("mem_mb", MEM_MB))}
+
+
+def _artifacts(prof: cProfile.Profile, snapshot: Optional[tracemalloc.Snapshot], meta: Dict[str, Any]) -> Dict[str, bytes]:
+    out = io.StringIO()
+    pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(TOP_N)
+    prof.create_stats()
+    files = {
+        # Loadable with pstats.Stats(path) / snakeviz
+        "cpu.prof": marshal.dumps(prof.stats),
+        "cpu.txt": out.getvalue().encode("utf-8"),
+        "meta.json": json.dumps(meta, separators=(",", ":")).encode("utf-8"),
+    }
+    if snapshot is not None:
+        lines = [f"peak_mb={meta['peak_mb']}", ""]
+        for stat in snapshot.statistics("lineno")[:TOP_N]:
+            lines.append(str(stat))
+        files["mem.txt"] = "\n".join(lines).encode("utf-8")
+    return files
+
+
+def _store(files: Dict[str, bytes], base: str, budget: Budget) -> str:
+    if PROFILE_DIR:
+        root = os.path.join(PROFILE_DIR, base)
+        os.makedirs(root, exist_ok=True)
+        for name, body in files.items():
+            with open(os.path.join(root, name), "wb") as fh:
+                fh.write(body)
+        return root
+    if not PROFILE_BUCKET:
+        raise RuntimeError("no PROFILE_BUCKET/BUCKET_NAME configured")
+    s3 = _s3(budget)
+    for name, body in files.items():
+        s3.put_object(Bucket=PROFILE_BUCKET, Key=f"{PROFILE_PREFIX}{base}/{name}", Body=body)
+    return f"s3://{PROFILE_BUCKET}/{PROFILE_PREFIX}{base}/"
+
+
+def profiled(fn: Callable) -> Callable:
+    """Handler decorator: cProfile + tracemalloc when profiling is on for this invocation.
+
+    Artifacts (pstats dump, top-N cumulative text, top allocation sites, meta) are written
+    under ``<PROFILE_PREFIX><run_id>/<stage>-<ts>/`` only when the invocation took at least
+    ``slow_ms`` or its traced allocation peak reached ``mem_mb``. Capture failures are
+    logged and never change the handler's result.
+    """
+    stage = fn.__module__.rsplit(".", 1)[-1]
+
+    @functools.wraps(fn)
+    def wrapper(event: Any, context: Any = None, *args: Any, **kwargs: Any) -> Any:
+        global _active
+        opts = _settings(event)
+        if opts is None or _active:
+            return fn(event, context, *args, **kwargs)
+        _active = True
+        own_trace = not tracemalloc.is_tracing()
+        if own_trace:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        prof = cProfile.Profile()
+        t0 = time.perf_counter()
+        error = None
+        try:
+            prof.enable()
+            try:
+                return fn(event, context, *args, **kwargs)
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                prof.disable()
+        finally:
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            slow = elapsed_ms >= opts["slow_ms"]
+            heavy = peak_mb >= opts["mem_mb"]
+            snapshot = tracemalloc.take_snapshot() if heavy else None
+            if own_trace:
+                tracemalloc.stop()
+            _active = False
+            if slow or heavy:
+                _capture(event, context, stage, prof, snapshot, {
+                    "stage": stage, "elapsed_ms": round(elapsed_ms, 1), "peak_mb": round(peak_mb, 2),
+                    "slow_ms": opts["slow_ms"], "mem_mb": opts["mem_mb"], "slow": slow, "heavy": heavy,
+                    "error": error,
+                })
+    return wrapper
+
+
+def _capture(event: Any, context: Any, stage: str, prof: cProfile.Profile,
+             snapshot: Optional[tracemalloc.Snapshot], meta: Dict[str, Any]) -> None:
+    e = event if isinstance(event, dict) else {}
+    run_id = str(e.get("run_id") or getattr(context, "aws_request_id", None) or "local")
+    meta["run_id"] = run_id
+    budget = Budget.from_context(context, e)
+    if budget.nearly_spent(UPLOAD_MIN_MS):
+        log("ERROR", "profile skipped - budget", e, stage=stage, elapsed_ms=meta["elapsed_ms"])
+        return
+    base = f"{run_id}/{stage}-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')}"
+    try:
+        where = _store(_artifacts(prof, snapshot, meta), base, budget)
+    except Exception as err:
+        log("ERROR", "profile capture failed", e, stage=stage, error=str(err))
+        return
+    log("INFO", "profile captured", e, stage=stage, location=where,
+        elapsed_ms=meta["elapsed_ms"], peak_mb=meta["peak_mb"])
@@ -0,0 +1,150 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from lambdas._sketch import DDSketch, SpaceSaving
+from lambdas._violations import KNOWN_IDS, normalize
+
+# Rollup items share PRRuns with the runs; their hash key carries this prefix
+DAY_PREFIX = "ROLLUP#DAY#"
+QUARTER_PREFIX = "ROLLUP#QUARTER#"
+# Idempotency markers: one per counted run, expired by the table TTL
+SEEN_PREFIX = "ROLLUP#SEEN#"
+SEEN_TTL_S = 35 * 86400
+VERDICTS = ("green", "amber", "red")
+# Review-time sketch buckets are stored as flat counters: rt:<bucket> (rt:z for zero)
+REVIEW_PREFIX = "rt:"
+# Per-violation-ID run counts: viol:<id>. Only known rule IDs get their own counter;
+# unrecognized messages share viol:other, so a noisy day cannot grow its item toward
+# DynamoDB's 400KB limit (and fail every retry of the stream batch)
+VIOLATION_PREFIX = "viol:"
+OTHER_VIOLATION = "other"
+# Slots kept when ranking violations across days
+TOPK_CAPACITY = 64
+# Attributes that identify a rollup item rather than count something
+KEY_ATTRS = ("run_id", "day", "updated_at")
+_BUCKETS = DDSketch()
+_ISO_DAY = re.compile(r"^\d{4}-\d{2}-\d{2}T")
+
+
+def day_key(day: str) -> Dict[str, Any]:
+    return {"run_id": {"S": f"{DAY_PREFIX}{day}"}}
+
+
+def _s(image: Dict[str, Any], k: str) -> Optional[str]:
+    v = image.get(k)
+    return v.get("S") if isinstance(v, dict) else None
+
+
+def _n(image: Dict[str, Any], k: str) -> Optional[float]:
+    v = image.get(k)
+    if isinstance(v, dict) and v.get("N") is not None:
+        try:
+            return float(v["N"])
+        except ValueError:
+            return None
+    return None
+
+
+def run_day(image: Dict[str, Any]) -> Optional[str]:
+    """YYYY-MM-DD the run belongs to, or None for items that are not runs (rollups, markers, config)."""
+    run_id = _s(image, "run_id") or ""
+    created = _s(image, "created_at") or ""
+    if run_id.startswith("ROLLUP#") or not _ISO_DAY.match(created):
+        return None
+    return created[:10]
+
+
+def violations(image: Dict[str, Any]) -> List[str]:
+    """Normalized violation IDs recorded on a run (``violations`` string set)."""
+    v = image.get("violations") or {}
+    out = list(v.get("SS") or []) or [x.get("S") for x in (v.get("L") or []) if x.get("S")]
+    # Older items carried a single free-text message
+    single = _s(image, "violation")
+    if single and normalize(single) not in out:
+        out.append(normalize(single))
+    return out
+
+
+def violation_key(vid: str) -> str:
+    """Counter name suffix for a normalized ID: itself when known, else OTHER_VIOLATION."""
+    return vid if vid in KNOWN_IDS else OTHER_VIOLATION
+
+
+def delta(image: Dict[str, Any]) -> Dict[str, float]:
+    """Counters one run (DynamoDB-typed item or stream image) adds to its day's rollup."""
+    d: Dict[str, float] = {"runs": 1}
+    verdict = (_s(image, "verdict") or "").lower()
+    d[f"v_{verdict if verdict in VERDICTS else 'other'}"] = 1
+    conf = _n(image, "confidence")
+    if conf is not None:
+        d["conf_sum"] = conf
+        d["conf_n"] = 1
+    tokens = _n(image, "tokens_estimated")
+    if tokens:
+        d["tokens"] = tokens
+    review_ms = _n(image, "review_ms")
+    if review_ms is not None:
+        k = _BUCKETS.key(review_ms)
+        d[f"{REVIEW_PREFIX}{'z' if k is None else k}"] = 1
+        d["rt_sum"] = review_ms
+    for key in {violation_key(vid) for vid in violations(image)}:
+        d[f"{VIOLATION_PREFIX}{key}"] = 1
+    return d
+
+
+def update_args(d: Dict[str, float], day: str, now_iso: str) -> Dict[str, Any]:
+    """UpdateItem arguments that ADD ``d`` into the day's rollup atomically."""
+    names: Dict[str, str] = {"#day": "day", "#upd": "updated_at"}
+    values: Dict[str, Any] = {":day": {"S": day}, ":upd": {"S": now_iso}}
+    adds = []
+    for i, (k, v) in enumerate(sorted(d.items())):
+        names[f"#a{i}"] = k
+        values[f":a{i}"] = {"N": repr(v) if isinstance(v, float) and not v.is_integer() else str(int(v))}
+        adds.append(f"#a{i} :a{i}")
+    return {
+        "Key": day_key(day),
+        "UpdateExpression": f"SET #day = :day, #upd = :upd ADD {', '.join(adds)}",
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+    }
+
+
+def counters(item: Dict[str, Any]) -> Dict[str, float]:
+    """Numeric counters of a stored rollup item."""
+    out: Dict[str, float] = {}
+    for k, v in item.items():
+        if k in KEY_ATTRS or not isinstance(v, dict) or "N" not in v:
+            continue
+        out[k] = float(v["N"])
+    return out
+
+
+def merge(totals: Dict[str, float], more: Dict[str, float]) -> Dict[str, float]:
+    for k, v in more.items():
+        totals[k] = totals.get(k, 0) + v
+    return totals
+
+
+def summarize(deltas: Iterable[Dict[str, float]]) -> Dict[str, float]:
+    totals: Dict[str, float] = {}
+    for d in deltas:
+        merge(totals, d)
+    return totals
+
+
+def violation_counts(totals: Dict[str, float], capacity: int = TOPK_CAPACITY) -> SpaceSaving:
+    """Heavy-hitter summary of the viol:* counters (fixed size however many IDs appear)."""
+    ss = SpaceSaving(capacity)
+    for name, v in totals.items():
+        if name.startswith(VIOLATION_PREFIX) and v:
+            ss.add(name[len(VIOLATION_PREFIX):], int(v))
+    return ss
+
+
+def top_violations(totals: Dict[str, float], k: int = 10) -> List[Tuple[str, int]]:
+    return [(item, c) for item, c, _ in violation_counts(totals).top(k)]
+
+
+def review_sketch(totals: Dict[str, float]) -> DDSketch:
+    """Review-time sketch for any span of days: the summed rt:* counters are its buckets."""
+    return DDSketch.from_counters(totals, REVIEW_PREFIX)
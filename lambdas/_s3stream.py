@@ -0,0 +1,88 @@
+import os
+from typing import Any, Dict, List
+
+# S3 rejects multipart parts below 5 MiB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+PART_SIZE = max(MIN_PART_SIZE, int(os.environ.get("S3_PART_SIZE", str(8 * 1024 * 1024))))
+
+
+class MultipartWriter:
+    """Write-only file object that uploads to S3 as it fills.
+
+    Bytes are buffered until a part is full, then sent with ``upload_part``, so memory
+    stays at one part however large the object grows. Objects smaller than one part
+    go up with a single ``put_object`` on close. An exception inside the ``with`` block
+    aborts the upload so no orphaned parts are left billed.
+
+        with MultipartWriter(s3, bucket, key, ContentType="application/pdf") as out:
+            render(out)
+    """
+
+    def __init__(self, s3, bucket: str, key: str, part_size: int = PART_SIZE, **extra: Any):
+        self.s3, self.bucket, self.key = s3, bucket, key
+        self.part_size = part_size
+        # ContentType, ServerSideEncryption, ... for put_object / create_multipart_upload
+        self.extra = extra
+        self.upload_id = None
+        self.parts: List[Dict[str, Any]] = []
+        self.bytes_written = 0
+        # Largest the buffer got; tests and logs use it to check the memory bound
+        self.peak_buffer = 0
+        self._buf = bytearray()
+        self.closed = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        if self.closed:
+            raise ValueError("write to closed MultipartWriter")
+        self._buf += data
+        self.bytes_written += len(data)
+        self.peak_buffer = max(self.peak_buffer, len(self._buf))
+        while len(self._buf) >= self.part_size:
+            chunk = bytes(self._buf[:self.part_size])
+            del self._buf[:self.part_size]
+            self._upload(chunk)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def _upload(self, chunk: bytes) -> None:
+        if self.upload_id is None:
+            res = self.s3.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self.extra)
+            self.upload_id = res["UploadId"]
+        n = len(self.parts) + 1
+        res = self.s3.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=n, Body=chunk)
+        self.parts.append({"PartNumber": n, "ETag": res["ETag"]})
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self.upload_id is None:
+            self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buf), **self.extra)
+        else:
+            if self._buf:
+                self._upload(bytes(self._buf))
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts},
+            )
+        self._buf = bytearray()
+
+    def abort(self) -> None:
+        self.closed = True
+        self._buf = bytearray()
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+    def __enter__(self) -> "MultipartWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
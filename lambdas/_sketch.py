@@ -0,0 +1,246 @@
+import base64
+import math
+from typing import Dict, Iterable, Optional
+
+# Quantiles are returned within this relative error of the true value
+RELATIVE_ACCURACY = 0.01
+# Bucket cap; past it the lowest buckets are collapsed (accuracy is kept at the high end)
+MAX_BUCKETS = 2048
+FORMAT_VERSION = 1
+
+
+class DDSketch:
+    """Mergeable quantile sketch with relative-error guarantees (DDSketch).
+
+    Values land in log-spaced buckets ``ceil(log_gamma(x))``; a bucket's count is all
+    that is kept, so two sketches (or two DynamoDB rollup items holding the counts)
+    merge by adding counts bucket-wise and memory is bounded by the value range, not
+    the number of samples. Only positive values are bucketed; zeros and negatives
+    are counted separately and report as 0.
+    """
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY, max_buckets: int = MAX_BUCKETS):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.bins: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    # -- building ----------------------------------------------------------
+    def key(self, value: float) -> Optional[int]:
+        """Bucket index for ``value`` (None for the zero bucket)."""
+        if value <= 0:
+            return None
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def add(self, value: float, n: int = 1) -> "DDSketch":
+        k = self.key(value)
+        if k is None:
+            self.zero += n
+        else:
+            self.bins[k] = self.bins.get(k, 0) + n
+            if len(self.bins) > self.max_buckets:
+                self._collapse()
+        self.count += n
+        self.sum += value * n
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        return self
+
+    def _collapse(self) -> None:
+        keys = sorted(self.bins)
+        extra = len(keys) - self.max_buckets
+        folded = sum(self.bins.pop(k) for k in keys[:extra + 1])
+        self.bins[keys[extra]] = folded
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different accuracy")
+        for k, c in other.bins.items():
+            self.bins[k] = self.bins.get(k, 0) + c
+        while len(self.bins) > self.max_buckets:
+            self._collapse()
+        self.zero += other.zero
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    # -- reading -----------------------------------------------------------
+    def _value(self, k: int) -> float:
+        # Midpoint (in relative terms) of bucket (gamma^(k-1), gamma^k]
+        return 2 * self.gamma ** k / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+        for k in sorted(self.bins):
+            seen += self.bins[k]
+            if rank < seen:
+                v = self._value(k)
+                # Clamp to the exact extremes when they are known
+                return min(max(v, self.min), self.max) if self.max >= self.min else v
+        return self.max if self.max >= self.min else self._value(max(self.bins))
+
+    # -- rollup counters -----------------------------------------------------
+    def to_counters(self, prefix: str) -> Dict[str, int]:
+        """Bucket counts as flat numeric attributes (``<prefix><k>``), ready for DynamoDB ADD."""
+        out = {f"{prefix}{k}": c for k, c in self.bins.items()}
+        if self.zero:
+            out[f"{prefix}z"] = self.zero
+        return out
+
+    @classmethod
+    def from_counters(cls, counters: Dict[str, float], prefix: str, **kw) -> "DDSketch":
+        s = cls(**kw)
+        for name, c in counters.items():
+            if not name.startswith(prefix) or not c:
+                continue
+            k = name[len(prefix):]
+            if k == "z":
+                s.zero += int(c)
+            else:
+                try:
+                    s.bins[int(k)] = s.bins.get(int(k), 0) + int(c)
+                except ValueError:
+                    continue
+        s.count = s.zero + sum(s.bins.values())
+        return s
+
+    # -- compact binary form ------------------------------------------------
+    def to_bytes(self) -> bytes:
+        """Varint-encoded bucket deltas and counts; a few hundred bytes for a quarter of runs."""
+        out = bytearray([FORMAT_VERSION])
+        _varint(out, int(round(self.relative_accuracy * 1e6)))
+        _varint(out, self.zero)
+        _varint(out, len(self.bins))
+        prev = 0
+        for k in sorted(self.bins):
+            _varint(out, _zigzag(k - prev))
+            _varint(out, self.bins[k])
+            prev = k
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DDSketch":
+        if not data or data[0] != FORMAT_VERSION:
+            raise ValueError("unsupported sketch encoding")
+        pos = 1
+        acc, pos = _read_varint(data, pos)
+        s = cls(relative_accuracy=acc / 1e6)
+        s.zero, pos = _read_varint(data, pos)
+        n, pos = _read_varint(data, pos)
+        k = 0
+        for _ in range(n):
+            d, pos = _read_varint(data, pos)
+            c, pos = _read_varint(data, pos)
+            k += _unzigzag(d)
+            s.bins[k] = c
+        s.count = s.zero + sum(s.bins.values())
+        return s
+
+    def to_b64(self) -> str:
+        return base64.b64encode(self.to_bytes()).decode("ascii")
+
+
+def sketch_of(values: Iterable[float], **kw) -> DDSketch:
+    s = DDSketch(**kw)
+    for v in values:
+        s.add(v)
+    return s
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _unzigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+def _varint(out: bytearray, n: int) -> None:
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return
+
+
+def _read_varint(data: bytes, pos: int):
+    shift = result = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+class SpaceSaving:
+    """Approximate top-K counter with a fixed number of slots (Metwally et al.'s Space-Saving).
+
+    Memory is ``capacity`` entries however many distinct items are seen. Any item whose
+    true count exceeds total/capacity is guaranteed to be tracked; a tracked count
+    overestimates by at most its recorded ``error``.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.total = 0
+
+    def add(self, item: str, n: int = 1) -> "SpaceSaving":
+        self.total += n
+        if item in self.counts:
+            self.counts[item] += n
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = n
+            self.errors[item] = 0
+        else:
+            # Evict the smallest slot; the newcomer inherits its count as error bound
+            victim = min(self.counts, key=lambda k: (self.counts[k], k))
+            floor = self.counts.pop(victim)
+            self.errors.pop(victim, None)
+            self.counts[item] = floor + n
+            self.errors[item] = floor
+        return self
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        for item, c in other.counts.items():
+            self.add(item, c)
+            self.errors[item] = self.errors.get(item, 0) + other.errors.get(item, 0)
+        # add() already counted other's tracked mass; account for what it had evicted
+        self.total += other.total - sum(other.counts.values())
+        return self
+
+    def top(self, k: int = 10):
+        """[(item, count, max_overcount)] ranked by count."""
+        ranked = sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))[:k]
+        return [(item, c, self.errors.get(item, 0)) for item, c in ranked]
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"c": self.capacity, "t": self.total, "i": [[k, c, e] for k, c, e in self.top(self.capacity)]}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, object]) -> "SpaceSaving":
+        s = cls(int(d.get("c") or 64))
+        for k, c, e in d.get("i") or []:
+            s.counts[k] = int(c)
+            s.errors[k] = int(e)
+        s.total = int(d.get("t") or sum(s.counts.values()))
+        return s
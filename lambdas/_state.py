@@ -0,0 +1,12 @@
+from typing import Any, Dict
+
+
+def payload(v: Any) -> Dict[str, Any]:
+    """A prior stage's result as stored in the Step Functions state.
+
+    lambda:invoke tasks leave it wrapped as ``{"Payload": ...}``; Pass states and
+    in-process callers hand it over bare. Missing results read as ``{}``.
+    """
+    if isinstance(v, dict) and isinstance(v.get("Payload"), dict):
+        return v["Payload"]
+    return v or {}
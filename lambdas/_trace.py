@@ -0,0 +1,126 @@
+import functools
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from lambdas._log import log
+
+# Set TRACE_ENABLED=0 to turn spans into no-ops
+ENABLED = os.environ.get("TRACE_ENABLED", "1") != "0"
+SPAN_MESSAGE = "trace.span"
+
+_local = threading.local()
+# Trace of the current invocation; worker threads fall back to its root as parent
+_current: Dict[str, Optional[str]] = {"trace_id": None, "root": None, "stage": None}
+_cold = True
+
+
+def _stack() -> List["Span"]:
+    st = getattr(_local, "stack", None)
+    if st is None:
+        st = _local.stack = []
+    return st
+
+
+class Span:
+    """Timed section of work. Emitted as one ``trace.span`` log record when it ends.
+
+    Records carry run_id (the trace), span/parent ids, stage, start (epoch ms) and
+    duration, so tools/trace_view.py can rebuild each run's waterfall across lambdas.
+    """
+
+    __slots__ = ("name", "attrs", "span_id", "parent_id", "start_ms", "_t0")
+
+    def __init__(self, name: str, **attrs: Any):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs: Any) -> "Span":
+        """Attach attributes discovered while the span runs (bytes read, item counts, ...)."""
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self) -> "Span":
+        st = _stack()
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = st[-1].span_id if st else _current["root"]
+        self.start_ms = time.time() * 1000.0
+        self._t0 = time.perf_counter()
+        st.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        dur_ms = (time.perf_counter() - self._t0) * 1000.0
+        st = _stack()
+        if st and st[-1] is self:
+            st.pop()
+        fields = dict(self.attrs)
+        if exc_type is not None:
+            fields["error"] = exc_type.__name__
+        log("INFO", SPAN_MESSAGE, {"run_id": _current["trace_id"]},
+            span=self.name, span_id=self.span_id, parent_id=self.parent_id, stage=_current["stage"],
+            start_ms=round(self.start_ms, 3), dur_ms=round(dur_ms, 3), **fields)
+
+
+class _NoSpan:
+    def set(self, **attrs: Any) -> "_NoSpan":
+        return self
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NOOP = _NoSpan()
+
+
+def span(name: str, **attrs: Any):
+    """Context manager: ``with span("s3.get_object", key=key) as s: ...; s.set(bytes=n)``."""
+    return Span(name, **attrs) if ENABLED else _NOOP
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator form of span(); the span is named after the function unless given."""
+    def deco(fn: Callable) -> Callable:
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def trace_handler(fn: Callable) -> Callable:
+    """Handler decorator: opens the invocation's root span, keyed by the event's run_id.
+
+    Falls back to the Lambda request id when the event has no run_id. Handlers called
+    in-process by another handler (publisher) become child spans of the caller's trace.
+    """
+    stage = fn.__module__.rsplit(".", 1)[-1]
+
+    @functools.wraps(fn)
+    def wrapper(event: Any, context: Any = None, *args: Any, **kwargs: Any) -> Any:
+        global _cold
+        if not ENABLED:
+            return fn(event, context, *args, **kwargs)
+        if _current["trace_id"] is not None:
+            with span(stage, handler=True):
+                return fn(event, context, *args, **kwargs)
+        e = event if isinstance(event, dict) else {}
+        trace_id = e.get("run_id") or getattr(context, "aws_request_id", None) or uuid.uuid4().hex
+        cold, _cold = _cold, False
+        root = Span(stage, handler=True, cold_start=cold)
+        _current.update(trace_id=str(trace_id), stage=stage)
+        try:
+            with root:
+                _current["root"] = root.span_id
+                return fn(event, context, *args, **kwargs)
+        finally:
+            _current.update(trace_id=None, root=None, stage=None)
+    return wrapper
@@ -0,0 +1,45 @@
+import hashlib
+import re
+from typing import Any, Dict, Iterable, List
+from lambdas._claim import payload as _payload
+
+# Stable IDs for the rule messages emitted by iam_lint and policies/iam.rego.
+# Checked in order; the first matching pattern wins.
+KNOWN = (
+    (re.compile(r"^action:\*"), "iam.wildcard-action"),
+    (re.compile(r"^iam:passrole must be scoped"), "iam.passrole-unscoped"),
+    (re.compile(r"^sts:assumerolewithwebidentity on \*"), "sts.assume-role-web-identity-unscoped"),
+    (re.compile(r"^sts:assumerole on \*"), "sts.assume-role-unscoped"),
+    (re.compile(r"^s3:putobject must enforce sse"), "s3.put-object-no-sse"),
+    (re.compile(r"^external principal without externalid"), "trust.external-principal-no-external-id"),
+    (re.compile(r"^resource missing required tags"), "tags.missing-required"),
+)
+KNOWN_IDS = frozenset(vid for _, vid in KNOWN)
+MAX_ID_LEN = 64
+# Run-specific noise stripped before slugging unknown messages
+_NOISE = re.compile(r"arn:[^\s\"']+|\b\d+\b|\"[^\"]*\"|'[^']*'")
+
+
+def normalize(message: Any) -> str:
+    """Stable identifier for a lint violation / OPA deny message."""
+    text = str(message or "").strip().lower()
+    for rx, vid in KNOWN:
+        if rx.search(text):
+            return vid
+    slug = re.sub(r"[^a-z0-9]+", "-", _NOISE.sub(" ", text)).strip("-")
+    if not slug:
+        return "other.unknown"
+    if len(slug) > MAX_ID_LEN - len("other."):
+        digest = hashlib.sha256(slug.encode("utf-8")).hexdigest()[:8]
+        slug = slug[:MAX_ID_LEN - len("other.") - 9] + "-" + digest
+    return f"other.{slug}"
+
+
+def _messages(event: Dict[str, Any]) -> Iterable[Any]:
+    yield from _payload(event.get("lint")).get("violations") or []
+    yield from _payload(event.get("opa")).get("deny") or []
+
+
+def run_violations(event: Dict[str, Any]) -> List[str]:
+    """Distinct normalized violation IDs for one run (lint violations + OPA denies)."""
+    return sorted({normalize(m) for m in _messages(event) if m})
@@ -1,14 +1,20 @@
 import json
 import os
+import time
 import uuid
-import boto3
 from botocore.exceptions import BotoCoreError, ClientError
-from lambdas._log import log
+from lambdas._log import log, buffered, stage_metric
+from lambdas._trace import trace_handler, span
+from lambdas._budget import Budget
+from lambdas._claim import claim_check, payload as _payload
 
 
 AGENT_ID = os.environ.get("AGENT_ID")
 AGENT_ALIAS_ID = os.environ.get("AGENT_ALIAS_ID", "default")
-TABLE_NAME = os.environ.get("TABLE_NAME")
+# Below this much remaining budget the agent call is not worth starting
+MIN_AGENT_MS = int(os.environ.get("MIN_AGENT_MS", "5000"))
+# Stop consuming the stream once less than this is left, keeping what we have
+STREAM_STOP_MS = int(os.environ.get("STREAM_STOP_MS", "1000"))
 
 
 def _session_id(event):
@@ -17,9 +23,9 @@ def _session_id(event):
 
 def _input_text(event):
     # Minimal instruction; Agent tools/KB should drive depth.
-    plan_total = (((event.get("plan") or {}).get("summary") or {}).get("total_resources"))
-    risk = ((event.get("risk") or {}).get("risk"))
-    drift = ((event.get("drift") or {}).get("drift"))
+    plan_total = ((_payload(event.get("plan")).get("summary") or {}).get("total_resources"))
+    risk = _payload(event.get("risk")).get("risk")
+    drift = _payload(event.get("drift")).get("drift")
     return (
         "Review IAM-related Terraform changes and produce a JSON verdict with fields: "
         "verdict (green|amber|red), confidence (0..1), drivers (list of strings), markdown (summary). "
@@ -42,21 +48,33 @@ def _safe_json_block(text: str):
     return None
 
 
+@buffered
+@trace_handler
+@claim_check("verdict")
 def handler(event, context):
     """Invoke Bedrock Agent and return a structured verdict.
 
     Inputs (event): repo, sha, run_id; plus prior stage outputs under keys: plan, lint, risk, drift, impact.
     Environment: AGENT_ID, AGENT_ALIAS_ID
-    Output: { verdict, confidence, drivers, markdown } or raises to trigger SFN fallback.
+    Output: { verdict, confidence, drivers, markdown, tokens_estimated, agent_ms } or raises
+    to trigger SFN fallback. The publisher records the run.
+    When the execution budget runs out mid-stream, the partial verdict (if any) is
+    returned with degraded=true.
     """
     log("INFO", "agent_invoker start", event)
+    budget = Budget.from_context(context, event)
     agent_id = event.get("agent_id") or AGENT_ID
     agent_alias_id = event.get("agent_alias_id") or AGENT_ALIAS_ID
     if not agent_id:
         log("ERROR", "missing AGENT_ID", event)
         raise ValueError("AGENT_ID not set")
 
-    client = boto3.client("bedrock-agent-runtime")
+    if budget.nearly_spent(MIN_AGENT_MS):
+        log("ERROR", "budget too low for agent call", event, remaining_ms=budget.remaining_ms())
+        # Let Step Functions route to the static fallback
+        raise RuntimeError("agent-budget-exhausted")
+
+    client = budget.client("bedrock-agent-runtime", cap=55)
     session_id = _session_id(event)
     input_text = _input_text(event)
 
@@ -66,25 +84,27 @@ def handler(event, context):
         "repo": event.get("repo"),
         "sha": event.get("sha"),
         "run_id": event.get("run_id"),
-        "plan_summary": (event.get("plan") or {}).get("summary"),
-        "lint": {"violations": (event.get("lint") or {}).get("violations", [])},
-        "risk": event.get("risk"),
-        "drift": event.get("drift"),
-        "impact": event.get("impact"),
+        "plan_summary": _payload(event.get("plan")).get("summary"),
+        "lint": {"violations": _payload(event.get("lint")).get("violations", [])},
+        "risk": _payload(event.get("risk")) or None,
+        "drift": _payload(event.get("drift")) or None,
+        "impact": _payload(event.get("impact")) or None,
     }
 
+    agent_t0 = time.monotonic()
     try:
-        resp = client.invoke_agent(
-            agentId=agent_id,
-            agentAliasId=agent_alias_id,
-            sessionId=session_id,
-            inputText=input_text,
-            sessionState={
-                "sessionAttributes": {
-                    "context_json": json.dumps(context_min, separators=(",", ":"))
-                }
-            },
-        )
+        with span("bedrock.invoke_agent"):
+            resp = client.invoke_agent(
+                agentId=agent_id,
+                agentAliasId=agent_alias_id,
+                sessionId=session_id,
+                inputText=input_text,
+                sessionState={
+                    "sessionAttributes": {
+                        "context_json": json.dumps(context_min, separators=(",", ":"))
+                    }
+                },
+            )
     except (ClientError, BotoCoreError) as e:
         log("ERROR", "InvokeAgent failed", event, error=str(e))
         # Let Step Functions retry/catch
@@ -92,6 +112,7 @@ def handler(event, context):
 
     # Collect streaming output text, if any
     text_chunks = []
+    degraded = False
     try:
         if "completion" in resp:
             # Non-streaming (future-proof)
@@ -99,11 +120,17 @@ def handler(event, context):
         elif "responseStream" in resp:
             # Streaming events (preferred)
             stream = resp["responseStream"]
-            for event_part in stream:
-                # Event parts can include: "chunk" with bytes, "trace", "returnControl" etc.
-                chunk = event_part.get("chunk")
-                if chunk and "bytes" in chunk:
-                    text_chunks.append(chunk["bytes"].decode("utf-8", errors="ignore"))
+            with span("bedrock.stream") as sp:
+                for event_part in stream:
+                    if budget.nearly_spent(STREAM_STOP_MS):
+                        degraded = True
+                        log("ERROR", "budget nearly spent; stopping agent stream", event, chunks=len(text_chunks))
+                        break
+                    # Event parts can include: "chunk" with bytes, "trace", "returnControl" etc.
+                    chunk = event_part.get("chunk")
+                    if chunk and "bytes" in chunk:
+                        text_chunks.append(chunk["bytes"].decode("utf-8", errors="ignore"))
+                sp.set(chunks=len(text_chunks))
         else:
             # Unknown shape; try to stringify
             text_chunks.append(json.dumps(resp))
@@ -112,6 +139,7 @@ def handler(event, context):
         # Don't fail the run on decode issues; agent may still have invoked tools that updated state elsewhere
         pass
 
+    agent_ms = int((time.monotonic() - agent_t0) * 1000)
     final_text = "".join(text_chunks)
     parsed = _safe_json_block(final_text)
     if not parsed:
@@ -133,22 +161,10 @@ def handler(event, context):
         "markdown": markdown,
         "agent_session_id": session_id,
         "tokens_estimated": tokens_estimated,
+        "agent_ms": agent_ms,
     }
-    log("INFO", "agent_invoker done", event, verdict=verdict, confidence=confidence)
-    # Optional audit write
-    try:
-        if TABLE_NAME and event.get("run_id"):
-            ddb = boto3.client("dynamodb")
-            item = {
-                "run_id": {"S": str(event.get("run_id"))},
-                "created_at": {"S": context.aws_request_id if hasattr(context, 'aws_request_id') else session_id},
-                "repo": {"S": str(event.get("repo") or '')},
-                "sha": {"S": str(event.get("sha") or '')},
-                "verdict": {"S": str(verdict)},
-                "confidence": {"N": str(confidence)},
-                "tokens_estimated": {"N": str(tokens_estimated)},
-            }
-            ddb.put_item(TableName=TABLE_NAME, Item=item)
-    except Exception as e:
-        log("ERROR", "ddb audit write failed", event, error=str(e))
+    if degraded:
+        out["degraded"] = True
+    log("INFO", "agent_invoker done", event, verdict=verdict, confidence=confidence, degraded=degraded)
+    stage_metric("Degraded", 1 if degraded else 0)
     return out
@@ -0,0 +1,139 @@
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from lambdas._log import log, buffered, stage_metric
+from lambdas._trace import trace_handler
+from lambdas._budget import Budget
+from lambdas import _columnar
+
+TABLE_NAME = os.environ.get("TABLE_NAME", "PRRuns")
+BUCKET_NAME = os.environ.get("BUCKET_NAME")
+RUNS_INDEX = os.environ.get("RUNS_INDEX", "created_month_gsi")
+EXPORT_PREFIX = os.environ.get("EXPORT_PREFIX", _columnar.EXPORT_PREFIX)
+# Runs younger than this are left for the next export (late writers, GSI propagation)
+EXPORT_LAG_S = int(os.environ.get("EXPORT_LAG_S", "300"))
+# "parquet" or "json"; empty picks Parquet when pyarrow is packaged
+EXPORT_FORMAT = os.environ.get("EXPORT_FORMAT", "")
+# Time kept back to write the files and the watermark once reading stops
+WRITE_RESERVE_MS = 10000
+WATERMARK_KEY = {"run_id": {"S": "EXPORT#WATERMARK#prruns"}}
+_TS = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+def _ddb(budget: Budget):
+    return budget.client("dynamodb", cap=10)
+
+
+def _s3(budget: Budget):
+    return budget.client("s3", cap=20)
+
+
+def _months(start: str, end: str) -> List[str]:
+    """YYYY-MM buckets from the month of ``start`` to the month of ``end``, inclusive."""
+    y, m = int(start[:4]), int(start[5:7])
+    out = []
+    while f"{y}-{m:02d}" <= end[:7]:
+        out.append(f"{y}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+
+def read_watermark(ddb, table: str) -> Optional[str]:
+    item = ddb.get_item(TableName=table, Key=WATERMARK_KEY, ConsistentRead=True).get("Item") or {}
+    return (item.get("hwm") or {}).get("S")
+
+
+def _since_default(now: datetime) -> str:
+    # First export: start from the beginning of the previous month
+    first = (now.replace(day=1) - timedelta(days=1)).replace(day=1)
+    return first.strftime("%Y-%m-01T00:00:00.000000Z")
+
+
+def read_new_runs(ddb, table: str, since: str, upto: str, budget: Budget):
+    """Runs with since < created_at <= upto, oldest first: (items, degraded).
+
+    One Query per month bucket on the created_month GSI, taken in order, so a read cut
+    short by the budget still covers a contiguous prefix and the watermark can move to
+    its last item.
+    """
+    items: List[Dict[str, Any]] = []
+    for month in _months(since, upto):
+        pages = ddb.get_paginator("query").paginate(
+            TableName=table,
+            IndexName=RUNS_INDEX,
+            KeyConditionExpression="created_month = :m AND created_at BETWEEN :a AND :b",
+            ExpressionAttributeValues={":m": {"S": month}, ":a": {"S": since}, ":b": {"S": upto}},
+        )
+        for page in pages:
+            # BETWEEN is inclusive; the watermark itself was exported last time
+            items.extend(it for it in page.get("Items", []) if it["created_at"]["S"] > since)
+            if budget.nearly_spent(WRITE_RESERVE_MS):
+                return items, True
+    return items, False
+
+
+def export(ddb, s3, table: str, bucket: str, prefix: str = EXPORT_PREFIX, lag_s: int = EXPORT_LAG_S,
+           fmt: str = EXPORT_FORMAT, budget: Optional[Budget] = None, since: Optional[str] = None,
+           now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Append runs newer than the watermark to date-partitioned columnar files, then advance it.
+
+    Files are ``<prefix>dt=<YYYY-MM-DD>/part-<watermark>.<ext>``. The part name comes from the
+    watermark the export started at, so a retry after a failed watermark write rewrites the
+    same objects (with a superset of rows) instead of adding duplicates.
+    """
+    budget = budget or Budget()
+    now = now or datetime.utcnow()
+    start = since or read_watermark(ddb, table) or _since_default(now)
+    upto = (now - timedelta(seconds=lag_s)).strftime(_TS)
+    out: Dict[str, Any] = {"exported": 0, "files": [], "watermark": start}
+    if upto <= start:
+        return out
+    items, degraded = read_new_runs(ddb, table, start, upto, budget)
+    by_day: Dict[str, List[Dict[str, Any]]] = {}
+    for it in items:
+        by_day.setdefault(it["created_at"]["S"][:10], []).append(it)
+    tag = "".join(ch for ch in start if ch.isdigit())
+    for day, rows in sorted(by_day.items()):
+        body, ext = _columnar.encode(_columnar.columns_from_items(rows), fmt)
+        key = _columnar.part_key(prefix, day, tag, ext)
+        s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType=_columnar.CONTENT_TYPES[ext])
+        out["files"].append(key)
+    # Degraded reads stop at a page boundary: move only as far as what was written
+    hwm = max((it["created_at"]["S"] for it in items), default=start) if degraded else upto
+    ddb.put_item(TableName=table, Item={
+        **WATERMARK_KEY,
+        "hwm": {"S": hwm},
+        "exported": {"N": str(len(items))},
+        "updated_at": {"S": now.strftime(_TS)},
+    })
+    out.update(exported=len(items), watermark=hwm)
+    if degraded:
+        out["degraded"] = True
+    return out
+
+
+@buffered
+@trace_handler
+def handler(event, context):
+    """Export new PRRuns items to the artifacts bucket as compressed columnar files.
+
+    Inputs (all optional): bucket, table, since (ISO created_at to restart from instead of
+    the stored watermark), format ("parquet" | "json").
+    Output: { exported, files, watermark[, degraded] }
+    """
+    log("INFO", "audit_exporter start", event)
+    budget = Budget.from_context(context, event)
+    bucket = event.get("bucket") or BUCKET_NAME
+    if not bucket:
+        log("ERROR", "missing bucket", event)
+        return {"error": "bucket is required"}
+    try:
+        out = export(_ddb(budget), _s3(budget), event.get("table") or TABLE_NAME, bucket,
+                     fmt=event.get("format") or EXPORT_FORMAT, budget=budget, since=event.get("since"))
+    except Exception as e:
+        log("ERROR", "audit export failed", event, error=str(e))
+        return {"error": "audit export failed"}
+    log("INFO", "audit_exporter done", event, exported=out["exported"], files=len(out["files"]), watermark=out["watermark"])
+    stage_metric("ItemsProcessed", out["exported"])
+    return out
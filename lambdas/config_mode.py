@@ -1,23 +1,20 @@
-import os
-from lambdas._log import log
-import boto3
-
-SSM_PARAM = os.environ.get("MODE_PARAM", "pr-review/mode")
+from lambdas._log import log, buffered
+from lambdas._trace import trace_handler
+from lambdas._budget import Budget
+from lambdas import _config_cache
 
 
+@buffered
+@trace_handler
 def handler(event, context):
-    """Load mode from SSM Parameter pr-review/mode or fallback to 'comment_only'.
-    Output: { mode }
+    """Resolve pipeline configuration in one call, cached per warm container.
+
+    - mode: SSM Parameter pr-review/mode (fallback 'comment_only'), overridden by the repo's settings.mode
+    - bundle: governance check for BUNDLE_HASH (or event["bundle_hash"]), same contract as bundle_guard
+    - settings: per-repo overrides (CONFIG#REPO#<repo>)
+    Output: { mode, bundle: { approved, hash, reason }, settings }
     """
     log("INFO", "config_mode start", event)
-    ssm = boto3.client("ssm")
-    mode = "comment_only"
-    try:
-        resp = ssm.get_parameter(Name=SSM_PARAM)
-        val = (resp.get("Parameter") or {}).get("Value")
-        if val:
-            mode = val.strip()
-    except Exception as e:
-        log("ERROR", "ssm get failed", event, error=str(e))
-    log("INFO", "config_mode done", event, mode=mode)
-    return {"mode": mode}
+    out = _config_cache.resolve(event if isinstance(event, dict) else {}, Budget.from_context(context, event))
+    log("INFO", "config_mode done", event, mode=out["mode"], approved=out["bundle"]["approved"])
+    return out
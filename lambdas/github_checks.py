@@ -1,26 +1,33 @@
 import os
-import json
-import urllib.request
-from datetime import datetime
+import posixpath
+import re
+from datetime import datetime, timezone
 import boto3
-from lambdas._log import log
+from lambdas._log import log, buffered, metric, stage_metric
+from lambdas._trace import trace_handler
+from lambdas._budget import Budget
+from lambdas._claim import payload as _payload
+from lambdas import _github
 
 
-API = "https://api.github.com"
-CWM = boto3.client("cloudwatch")
+HTTP_TIMEOUT_S = _github.HTTP_TIMEOUT_S
+CHECK_NAME = "IAM PR Review"
+# GitHub accepts at most 50 annotations per create/update request
+ANNOTATION_BATCH = 50
+# Bound the number of update calls per PR regardless of how noisy a plan is
+MAX_ANNOTATIONS = int(os.environ.get("CHECK_MAX_ANNOTATIONS", "500"))
+# Plan addresses carry no file or line: a finding on a resource is anchored to this file in
+# its module's directory (under CHECK_TF_ROOT, the Terraform working directory in the repo)
+TF_FILE = os.environ.get("CHECK_TF_FILE", "main.tf")
+TF_ROOT = os.environ.get("CHECK_TF_ROOT", "")
+# Findings without an address (OPA messages, plain lint strings) go on this file, default
+# TF_FILE at TF_ROOT (annotations must name a file, not a directory); an event's
+# annotation_path (e.g. the workflow file that ran the plan) takes precedence
+ANNOTATION_PATH = os.environ.get("CHECK_ANNOTATION_PATH")
+_MODULE = re.compile(r"module\.([^.\[]+)(?:\[[^\]]*\])?\.")
 S3 = boto3.client("s3")
 
 
-def _post(url: str, token: str, body: dict):
-    data = json.dumps(body).encode("utf-8")
-    req = urllib.request.Request(url, data=data, method="POST")
-    req.add_header("Authorization", f"Bearer {token}")
-    req.add_header("Accept", "application/vnd.github+json")
-    req.add_header("Content-Type", "application/json")
-    with urllib.request.urlopen(req) as resp:
-        return json.loads(resp.read().decode("utf-8"))
-
-
 def _conclusion(verdict: str) -> str:
     # Map our verdict to GitHub Checks conclusions
     v = (verdict or "").lower()
@@ -43,96 +50,199 @@ def _signed_url(bucket: str, key: str, expires: int = 3600) -> str:
 
 
 def _emit_metrics(verdict: dict, start_ts: str | None):
+    # Embedded Metric Format through the logger: no CloudWatch API call on the request path
     try:
-        v = (verdict.get("verdict") or "").upper()
-        conf = float(verdict.get("confidence") or 0.0)
-        dims = [{"Name": "Verdict", "Value": v or "UNKNOWN"}]
-        metrics = [
-            {
-                "MetricName": "VerdictCount",
-                "Dimensions": dims,
-                "Unit": "Count",
-                "Value": 1.0,
-            },
-            {
-                "MetricName": "Confidence",
-                "Dimensions": dims,
-                "Unit": "None",
-                "Value": conf,
-            },
-        ]
+        v = (verdict.get("verdict") or "").upper() or "UNKNOWN"
+        metric("VerdictCount", 1, "Count", Verdict=v)
+        metric("Confidence", float(verdict.get("confidence") or 0.0), "None", Verdict=v)
         if start_ts:
             try:
                 # allow ISO8601 or epoch millis
                 if start_ts.isdigit():
                     ms = int(start_ts)
-                    start = datetime.fromtimestamp(ms / 1000)
+                    start = datetime.fromtimestamp(ms / 1000, timezone.utc)
                 else:
                     start = datetime.fromisoformat(start_ts.replace("Z", "+00:00"))
-                now = datetime.utcnow()
-                dur_ms = max(0, int((now - start).total_seconds() * 1000))
-                metrics.append(
-                    {
-                        "MetricName": "ReviewTimeMs",
-                        "Dimensions": [],
-                        "Unit": "Milliseconds",
-                        "Value": float(dur_ms),
-                    }
-                )
+                now = datetime.now(timezone.utc)
+                metric("ReviewTimeMs", max(0, int((now - start).total_seconds() * 1000)), "Milliseconds")
             except Exception:
                 pass
-        CWM.put_metric_data(Namespace="PRReview", MetricData=metrics)
     except Exception:
         pass
 
 
+def _annotation(message: str, level: str, title: str, path: str, line: int = 1) -> dict:
+    return {
+        "path": path,
+        "start_line": line,
+        "end_line": line,
+        "annotation_level": level,
+        "title": title[:255],
+        "message": message[:64000],
+    }
+
+
+def _tf_path(address: str, module_dirs: dict, fallback: str) -> str:
+    """Repo file for a resource address: TF_FILE in its module's directory, else ``fallback``."""
+    if not address or address == "?":
+        return fallback
+    key, pos, dirs = "", 0, [""]
+    # module.a[0].module.b.aws_iam_policy.p -> module.a, module.a.module.b
+    while True:
+        m = _MODULE.match(address, pos)
+        if not m:
+            break
+        key = f"{key}.module.{m.group(1)}" if key else f"module.{m.group(1)}"
+        pos = m.end()
+        if key not in module_dirs:
+            # Not in the plan's configuration block: stay with the nearest known module
+            break
+        dirs.append(module_dirs[key])
+    return posixpath.normpath(posixpath.join(TF_ROOT, dirs[-1], TF_FILE))
+
+
+def _annotations(event: dict) -> list:
+    """Turn lint/OPA findings into check annotations (deduplicated, capped at MAX_ANNOTATIONS)."""
+    out = []
+    seen = set()
+    fallback = event.get("annotation_path") or ANNOTATION_PATH or posixpath.normpath(posixpath.join(TF_ROOT, TF_FILE))
+
+    def add(a):
+        k = (a["path"], a["title"], a["message"])
+        if k not in seen:
+            seen.add(k)
+            out.append(a)
+
+    summary = _payload(event.get("plan")).get("summary") or {}
+    module_dirs = summary.get("module_dirs") or {}
+    for w in (summary.get("iam") or {}).get("wildcard_actions") or []:
+        if isinstance(w, dict):
+            addr = w.get("address") or "?"
+            add(_annotation(f"{addr} statement {w.get('statement')}: {w.get('reason')}", "failure", f"Wildcard action in {addr}",
+                            _tf_path(addr, module_dirs, fallback)))
+    opa = _payload(event.get("opa"))
+    for d in opa.get("deny") or []:
+        add(_annotation(str(d), "failure", "OPA deny", fallback))
+    for w in opa.get("warn") or []:
+        add(_annotation(str(w), "warning", "OPA warn", fallback))
+    lint = _payload(event.get("lint"))
+    for v in lint.get("violations") or []:
+        if isinstance(v, dict):
+            path = v.get("path") or _tf_path(v.get("address"), module_dirs, fallback)
+            add(_annotation(v.get("message") or str(v), "failure", v.get("title") or "IAM lint", path, int(v.get("line") or 1)))
+        else:
+            add(_annotation(str(v), "failure", "IAM lint", fallback))
+    for w in lint.get("warnings") or []:
+        add(_annotation(str(w), "warning", "IAM lint warning", fallback))
+    return out[:MAX_ANNOTATIONS]
+
+
+def _check_run_id(event: dict):
+    if event.get("check_run_id"):
+        return event["check_run_id"]
+    return _payload(event.get("check_start")).get("id")
+
+
+def _start(event: dict, repo: str, sha: str, token: str, budget: Budget) -> dict:
+    rk = _github.rate_key(event.get("installation_id"))
+    body = {
+        "name": CHECK_NAME,
+        "head_sha": sha,
+        "status": "in_progress",
+        "started_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "output": {"title": "Review in progress", "summary": "Deterministic gates and agent review are running."},
+    }
+    if event.get("run_id"):
+        body["external_id"] = str(event["run_id"])
+    res = _github.client().post(f"/repos/{repo}/check-runs", token, body, timeout=budget.timeout(HTTP_TIMEOUT_S), rate_key=rk)
+    log("INFO", "check started", event, id=res.get("id"))
+    return {"status": "check-started", "id": res.get("id")}
+
+
+def _complete(event: dict, repo: str, sha: str, token: str, budget: Budget) -> dict:
+    rk = _github.rate_key(event.get("installation_id"))
+    verdict = _payload(event.get("verdict"))
+    conclusion = _conclusion(verdict.get("verdict"))
+    summary = verdict.get("markdown") or "Automated review completed."
+    title = f"{(verdict.get('verdict') or '-').upper()} (confidence {float(verdict.get('confidence') or 0):.2f})"
+    # Optional artifact link
+    artifact_url = event.get("artifact_url")
+    if not artifact_url and event.get("artifact_key"):
+        bucket = event.get("bucket") or os.environ.get("BUCKET_NAME")
+        if bucket:
+            artifact_url = _signed_url(bucket, event["artifact_key"]) or None
+
+    annotations = _annotations(event)
+    batches = [annotations[i:i + ANNOTATION_BATCH] for i in range(0, len(annotations), ANNOTATION_BATCH)] or [[]]
+    output = {"title": title, "summary": summary[:65535]}
+    if artifact_url:
+        output["text"] = f"Artifacts: {artifact_url}"
+
+    gh = _github.client()
+    check_id = _check_run_id(event)
+    first = {
+        "name": CHECK_NAME,
+        "status": "completed",
+        "conclusion": conclusion,
+        "completed_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "output": dict(output, annotations=batches[0]),
+    }
+    if check_id:
+        res = gh.patch(f"/repos/{repo}/check-runs/{check_id}", token, first, timeout=budget.timeout(HTTP_TIMEOUT_S), rate_key=rk)
+    else:
+        # No in_progress run was started (older orchestration); create it completed
+        res = gh.post(f"/repos/{repo}/check-runs", token, dict(first, head_sha=sha), timeout=budget.timeout(HTTP_TIMEOUT_S), rate_key=rk)
+        check_id = res.get("id")
+    sent = len(batches[0])
+    # Further batches are appended by updating the run; output title/summary are required each time
+    for batch in batches[1:]:
+        if budget.nearly_spent():
+            log("ERROR", "budget nearly spent; annotations truncated", event, sent=sent, total=len(annotations))
+            break
+        gh.patch(f"/repos/{repo}/check-runs/{check_id}", token, {"output": dict(output, annotations=batch)}, timeout=budget.timeout(HTTP_TIMEOUT_S), rate_key=rk)
+        sent += len(batch)
+    log("INFO", "check completed", event, id=check_id, conclusion=conclusion, annotations=sent)
+    stage_metric("ItemsProcessed", sent)
+    _emit_metrics(verdict, event.get("start_ts") or (event.get("timing") or {}).get("start_ts"))
+    out = {"status": "check-completed", "id": check_id, "annotations": sent}
+    if sent < len(annotations):
+        out["degraded"] = True
+    return out
+
+
+@buffered
+@trace_handler
 def handler(event, context):
-    """Create a GitHub Check Run for the PR SHA.
+    """Drive the GitHub Check Run for the PR SHA through its lifecycle.
+
+    action=start: create the run in_progress at pipeline start; returns { id }.
+    default (complete): patch that run (check_run_id or check_start.Payload.id) with the
+    conclusion, sending lint/OPA findings as annotations in batches of 50. Without a
+    started run a completed one is created instead.
 
     Inputs:
       - repo (org/repo)
       - sha (commit SHA to attach check to)
       - verdict { verdict, confidence, drivers, markdown }
+      - plan/opa/lint stage outputs (findings become annotations, anchored to the module's
+        TF_FILE for resource findings)
+      - annotation_path (optional): file for findings without an address, e.g. the workflow
+        file; default env CHECK_ANNOTATION_PATH, else TF_FILE at CHECK_TF_ROOT
       - token (optional) else env GITHUB_TOKEN (installation token recommended)
+      - installation_id (optional): keys the rate-limit window (github_app_token output)
     """
     log("INFO", "github_checks start", event)
+    budget = Budget.from_context(context, event)
     repo = event.get("repo")
     sha = event.get("sha")
-    verdict = (event.get("verdict") or {})
     token = event.get("token") or os.environ.get("GITHUB_TOKEN")
     if not (repo and sha and token):
         log("ERROR", "missing repo/sha/token", event)
         return {"error": "missing-repo-sha-or-token"}
-
-    name = "IAM PR Review"
-    conclusion = _conclusion(verdict.get("verdict"))
-    summary = verdict.get("markdown") or "Automated review completed."
-    title = f"{verdict.get('verdict','-').upper()} (confidence {verdict.get('confidence',0):.2f})"
-    # Optional artifact link
-    artifact_url = event.get("artifact_url")
-    if not artifact_url and event.get("artifact_key"):
-        bucket = event.get("bucket") or os.environ.get("BUCKET_NAME")
-        if bucket:
-            artifact_url = _signed_url(bucket, event["artifact_key"]) or None
-
-    body = {
-        "name": name,
-        "head_sha": sha,
-        "status": "completed",
-        "conclusion": conclusion,
-        "output": {
-            "title": title,
-            "summary": summary[:65535],
-        },
-    }
-    if artifact_url:
-        body["output"]["text"] = f"Artifacts: {artifact_url}"
-    base = f"{API}/repos/{repo}/check-runs"
     try:
-        res = _post(base, token, body)
-        log("INFO", "check created", event, id=res.get("id"))
-        _emit_metrics(verdict, event.get("start_ts"))
-        return {"status": "check-created", "id": res.get("id")}
+        if event.get("action") == "start":
+            return _start(event, repo, sha, token, budget)
+        return _complete(event, repo, sha, token, budget)
     except Exception as e:
-        log("ERROR", "create check failed", event, error=str(e))
+        log("ERROR", "check run update failed", event, error=str(e))
         return {"error": str(e)}
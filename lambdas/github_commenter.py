@@ -1,49 +1,199 @@
 import os
-import json
-import urllib.request
-from lambdas._log import log
-
-def _post(url: str, token: str, body: dict):
-    data = json.dumps(body).encode("utf-8")
-    req = urllib.request.Request(url, data=data, method="POST")
-    req.add_header("Authorization", f"Bearer {token}")
-    req.add_header("Accept", "application/vnd.github+json")
-    req.add_header("Content-Type", "application/json")
-    with urllib.request.urlopen(req) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+import re
+import threading
+import time
+from lambdas._log import log, buffered
+from lambdas._trace import trace_handler
+from lambdas._budget import Budget
+from lambdas._claim import payload as _payload
+from lambdas import _github
 
+HTTP_TIMEOUT_S = _github.HTTP_TIMEOUT_S
+# upsert keeps one sticky bot comment per PR; append posts a new comment every call
+COMMENT_MODE = os.environ.get("COMMENT_MODE", "append")
+# Optional shared tier for the repo+PR -> comment ID mapping; items share the runs table
+# (hash key run_id) and expire through its ttl attribute once the PR has gone quiet
+COMMENT_CACHE_TABLE = os.environ.get("COMMENT_CACHE_TABLE")
+COMMENT_CACHE_TTL_S = int(os.environ.get("COMMENT_CACHE_TTL_S", str(30 * 86400)))
+CACHE_PREFIX = "CACHE#COMMENT#"
+MARKER = "<!-- pr-review-bot -->"
+# The sticky comment must be ours, not one where someone pasted the marker: it has to come
+# from this login (e.g. "my-app[bot]"), or from any Bot account when unset
+BOT_LOGIN = os.environ.get("COMMENT_BOT_LOGIN")
+GITHUB_APP_ID = os.environ.get("GITHUB_APP_ID")
+DEFAULT_SECTION = "review"
+MAX_LIST_PAGES = 10
+
+_COMMENT_IDS = {}
+_lock = threading.Lock()
+
+
+def _section_re(name: str):
+    return re.compile(
+        rf"<!-- pr-review:section:{re.escape(name)} -->\n.*?\n<!-- /pr-review:section:{re.escape(name)} -->",
+        re.DOTALL,
+    )
+
+
+def merge_body(existing: str, section: str, markdown: str) -> str:
+    """Replace (or append) one named section of the sticky comment, keeping the others."""
+    block = f"<!-- pr-review:section:{section} -->\n{markdown}\n<!-- /pr-review:section:{section} -->"
+    body = existing if existing and MARKER in existing else MARKER
+    rx = _section_re(section)
+    if rx.search(body):
+        return rx.sub(lambda _: block, body, count=1)
+    return f"{body}\n{block}"
+
+
+def _cache_key(repo: str, pr_number) -> str:
+    return f"{repo}#{pr_number}"
+
+
+def _cached_id(key: str, budget: Budget):
+    cid = _COMMENT_IDS.get(key)
+    if cid or not COMMENT_CACHE_TABLE:
+        return cid
+    try:
+        item = budget.client("dynamodb", cap=2).get_item(
+            TableName=COMMENT_CACHE_TABLE, Key={"run_id": {"S": f"{CACHE_PREFIX}{key}"}}
+        ).get("Item") or {}
+        cid = int((item.get("comment_id") or {}).get("N") or 0) or None
+    except Exception:
+        cid = None
+    if cid:
+        with _lock:
+            _COMMENT_IDS[key] = cid
+    return cid
+
+
+def _remember(key: str, cid: int, budget: Budget) -> None:
+    with _lock:
+        _COMMENT_IDS[key] = cid
+    if COMMENT_CACHE_TABLE:
+        try:
+            budget.client("dynamodb", cap=2).put_item(
+                TableName=COMMENT_CACHE_TABLE,
+                Item={
+                    "run_id": {"S": f"{CACHE_PREFIX}{key}"},
+                    "comment_id": {"N": str(cid)},
+                    "ttl": {"N": str(int(time.time()) + COMMENT_CACHE_TTL_S)},
+                },
+            )
+        except Exception:
+            pass
+
+
+def _authored_by_bot(c: dict) -> bool:
+    app = c.get("performed_via_github_app") or {}
+    if GITHUB_APP_ID and app.get("id") is not None:
+        return str(app["id"]) == str(GITHUB_APP_ID)
+    user = c.get("user") or {}
+    if BOT_LOGIN:
+        return user.get("login") == BOT_LOGIN
+    return user.get("type") == "Bot"
+
+
+def _find_sticky(gh, repo: str, pr_number, token: str, timeout: float, rate_key=None):
+    """Scan the PR's comments for the bot's marker; returns (id, body) of the newest match."""
+    found = None
+    for page in range(1, MAX_LIST_PAGES + 1):
+        items = gh.get(f"/repos/{repo}/issues/{pr_number}/comments?per_page=100&page={page}", token, timeout=timeout, priority=_github.LOW, rate_key=rate_key) or []
+        for c in items:
+            if MARKER in (c.get("body") or "") and _authored_by_bot(c):
+                found = (c.get("id"), c.get("body"))
+        if len(items) < 100:
+            break
+    return found
+
+
+def _upsert(gh, repo: str, pr_number, token: str, section: str, markdown: str, budget: Budget, event) -> dict:
+    key = _cache_key(repo, pr_number)
+    rk = _github.rate_key(event.get("installation_id"))
+    timeout = budget.timeout(HTTP_TIMEOUT_S)
+    current = None
+    cid = _cached_id(key, budget)
+    if cid:
+        try:
+            # Conditional GET: unchanged comments come back as a cheap 304
+            c = gh.get(f"/repos/{repo}/issues/comments/{cid}", token, timeout=timeout, priority=_github.LOW, rate_key=rk)
+            current = (cid, c.get("body") or "")
+        except _github.GitHubError as e:
+            if e.status != 404:
+                raise
+            with _lock:
+                _COMMENT_IDS.pop(key, None)
+    if current is None:
+        current = _find_sticky(gh, repo, pr_number, token, timeout, rk)
+
+    if current is None:
+        res = gh.post(f"/repos/{repo}/issues/{pr_number}/comments", token, {"body": merge_body("", section, markdown)}, timeout=timeout, priority=_github.LOW, rate_key=rk)
+        _remember(key, res.get("id"), budget)
+        log("INFO", "sticky comment created", event, id=res.get("id"), section=section)
+        return {"status": "comment-posted", "id": res.get("id")}
+
+    cid, body = current
+    merged = merge_body(body, section, markdown)
+    if cid != _COMMENT_IDS.get(key):
+        _remember(key, cid, budget)
+    if merged == body:
+        log("INFO", "sticky comment unchanged", event, id=cid, section=section)
+        return {"status": "comment-unchanged", "id": cid}
+    gh.patch(f"/repos/{repo}/issues/comments/{cid}", token, {"body": merged}, timeout=timeout, priority=_github.LOW, rate_key=rk)
+    log("INFO", "sticky comment updated", event, id=cid, section=section)
+    return {"status": "comment-updated", "id": cid}
+
+
+@buffered
+@trace_handler
 def handler(event, context):
-    """Post a GitHub PR comment.
+    """Post a GitHub PR comment, or upsert the bot's sticky comment.
 
     Inputs:
       - repo (org/repo)
       - pr_number OR commit_sha + pr_url fallback
-      - markdown (comment body)
+      - markdown (comment body; defaults to verdict.markdown)
       - token (optional, otherwise from env GITHUB_TOKEN)
+      - installation_id (optional): keys the rate-limit window (github_app_token output)
+      - upsert (optional, default from env COMMENT_MODE=upsert): PATCH the bot's existing
+        comment (found via a hidden marker on a comment by COMMENT_BOT_LOGIN, ID cached per
+        repo+PR) instead of posting a new one
+      - section (optional, default "review"): named block of the sticky comment to replace
     """
     log("INFO", "github_commenter start", event)
+    budget = Budget.from_context(context, event)
     repo = event.get("repo")
     pr_number = event.get("pr_number")
-    markdown = event.get("markdown") or "(no content)"
+    markdown = event.get("markdown") or _payload(event.get("verdict")).get("markdown") or "(no content)"
     token = event.get("token") or os.environ.get("GITHUB_TOKEN")
+    upsert = event.get("upsert")
+    if upsert is None:
+        upsert = COMMENT_MODE == "upsert"
     if not (repo and token):
         log("ERROR", "missing repo or token", event)
         return {"error": "missing-repo-or-token"}
 
-    base = f"https://api.github.com/repos/{repo}"
+    gh = _github.client()
+    rk = _github.rate_key(event.get("installation_id"))
+    base = f"/repos/{repo}"
     try:
+        if pr_number and upsert:
+            return _upsert(gh, repo, pr_number, token, event.get("section") or DEFAULT_SECTION, markdown, budget, event)
         if pr_number:
             url = f"{base}/issues/{pr_number}/comments"
-            res = _post(url, token, {"body": markdown})
+            res = gh.post(url, token, {"body": markdown}, timeout=budget.timeout(HTTP_TIMEOUT_S), priority=_github.LOW, rate_key=rk)
         else:
             # fallback to a commit comment if only sha provided
             sha = event.get("sha")
             if not sha:
                 return {"error": "missing-pr_number-and-sha"}
             url = f"{base}/commits/{sha}/comments"
-            res = _post(url, token, {"body": markdown})
+            res = gh.post(url, token, {"body": markdown}, timeout=budget.timeout(HTTP_TIMEOUT_S), priority=_github.LOW, rate_key=rk)
         log("INFO", "github comment posted", event, id=res.get("id"))
         return {"status": "comment-posted", "id": res.get("id")}
+    except _github.RateLimitDeferred as e:
+        # Comments are low priority; keep the remaining budget for check runs and merges
+        log("ERROR", "github comment deferred", event, reason=e.reason, retry_in_s=int(e.wait_s))
+        return {"status": "deferred", "reason": e.reason, "retry_in_s": int(e.wait_s)}
     except Exception as e:
         log("ERROR", "github comment failed", event, error=str(e))
         return {"error": str(e)}
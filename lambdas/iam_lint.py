@@ -1,5 +1,7 @@
 import json
-from lambdas._log import log
+from lambdas._log import log, buffered, stage_metric
+from lambdas._trace import trace_handler
+from lambdas._claim import claim_check
 
 REQUIRED_TAGS = {"Owner", "CostCenter"}
 
@@ -58,6 +60,9 @@ def lint_metadata(md):
         w.append("Resource missing required tags (Owner, CostCenter)")
     return w
 
+@buffered
+@trace_handler
+@claim_check("lint")
 def handler(event, context):
     """Run IAM policy lint rules and trust checks.
     Expect event to contain keys: policy (dict), trust (dict), metadata (optional)
@@ -73,4 +78,5 @@ def handler(event, context):
     warnings += lint_metadata(metadata)
     out = {"violations": violations, "warnings": warnings, "valid": len(violations) == 0}
     log("INFO", "iam_lint done", event, violations=len(violations), warnings=len(warnings))
+    stage_metric("Violations", len(violations))
     return out
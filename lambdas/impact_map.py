@@ -1,14 +1,20 @@
 from typing import Dict, Any, List
-from lambdas._log import log
+from lambdas._log import log, buffered
+from lambdas._trace import trace_handler
+from lambdas._claim import claim_check, payload as _payload
 
 def _unique(seq: List[str]) -> List[str]:
     return sorted({str(x) for x in seq if x})
 
+@buffered
+@trace_handler
+@claim_check("impact")
 def handler(event, context):
     """Map modules→accounts and summarize blast radius.
 
     Inputs:
       - event.summary (from tf_plan_parser) with keys: modules, accounts
+      - or plan.summary (the tf_plan_parser result in Step Functions state)
       - or event.modules/accounts directly as fallback
 
     Output:
@@ -16,7 +22,7 @@ def handler(event, context):
       - modules: unique list of module addresses involved in the change
       - blast_radius: naive classification small/medium/large based on counts
     """
-    summary = (event or {}).get("summary", {})
+    summary = (event or {}).get("summary") or _payload(event.get("plan")).get("summary") or {}
     modules = summary.get("modules") or event.get("modules") or []
     accounts = summary.get("accounts") or event.get("accounts") or []
     modules = _unique(modules)
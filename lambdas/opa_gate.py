@@ -2,7 +2,16 @@ import json
 import os
 import subprocess
 from typing import Any, Dict, List
-from lambdas._log import log
+from lambdas._log import log, buffered, stage_metric
+from lambdas._trace import trace_handler, span
+from lambdas._profile import profiled
+from lambdas._budget import Budget
+from lambdas._claim import claim_check, payload as _payload
+
+# Upper bound for a single OPA evaluation; the invocation budget may shrink it further
+OPA_TIMEOUT_S = float(os.environ.get("OPA_TIMEOUT_S", "10"))
+# Deny reason when the evaluation was cut short: an unfinished policy check never allows
+TIMEOUT_DENY = "OPA evaluation did not finish within the execution budget"
 
 
 def _deny_from_plan(summary: Dict[str, Any]) -> List[str]:
@@ -19,9 +28,9 @@ def _opa_cli_available() -> bool:
     return os.path.exists(os.path.join(os.getcwd(), "opa"))
 
 
-def _opa_eval(input_obj: Dict[str, Any]) -> Dict[str, Any]:
+def _opa_eval(input_obj: Dict[str, Any], timeout: float = OPA_TIMEOUT_S) -> Dict[str, Any]:
     """Evaluate policies/iam.rego using bundled OPA CLI.
-    Returns dict with keys deny (list) and warn (list).
+    Returns dict with keys deny (list) and warn (list); timed_out=True if the CLI was killed.
     """
     opa_path = os.path.join(os.getcwd(), "opa")
     wasm_path = os.path.join(os.getcwd(), "policies", "policy.wasm")
@@ -62,7 +71,8 @@ def _opa_eval(input_obj: Dict[str, Any]) -> Dict[str, Any]:
             "data.iam.rules",
         ]
     try:
-        res = subprocess.run(cmd, capture_output=True, check=True)
+        with span("opa.eval", wasm=has_wasm):
+            res = subprocess.run(cmd, capture_output=True, check=True, timeout=timeout)
         out = json.loads(res.stdout.decode("utf-8"))
         # OPA eval JSON format: result[0].expressions[0].value.{deny,warn}
         result = (((out.get("result") or [{}])[0]).get("expressions") or [{}])[0].get("value") or {}
@@ -72,20 +82,28 @@ def _opa_eval(input_obj: Dict[str, Any]) -> Dict[str, Any]:
         deny = [str(x) for x in deny]
         warn = [str(x) for x in warn]
         return {"deny": deny, "warn": warn}
+    except subprocess.TimeoutExpired:
+        return {"deny": [], "warn": ["opa_eval_timeout"], "timed_out": True}
     except Exception as e:
         # On any failure, degrade silently – upstream fallback will decide
         return {"deny": [], "warn": [f"opa_eval_error:{e}"]}
 
 
+@buffered
+@trace_handler
+@claim_check("opa")
+@profiled
 def handler(event, context):
     """OPA/Conftest gate placeholder.
 
     If explicit policy/trust/metadata are provided, delegate to deterministic checks later.
     Otherwise, derive minimal deny rules from plan summary (e.g., wildcard actions).
-    Output contract: { deny: [..], warn: [..], allow: bool }
+    Output contract: { deny: [..], warn: [..], allow: bool }; an evaluation that times out
+    is a deny (allow=false, degraded=true).
     """
     log("INFO", "opa_gate start", event)
-    summary = ((event.get("plan") or {}).get("summary")) or event.get("summary") or {}
+    budget = Budget.from_context(context, event)
+    summary = _payload(event.get("plan")).get("summary") or event.get("summary") or {}
     deny: List[str] = []
     warn: List[str] = []
 
@@ -96,14 +114,22 @@ def handler(event, context):
         "metadata": (event.get("metadata") or {}),
         "summary": summary or {},
     }
+    degraded = False
     if _opa_cli_available():
-        eva = _opa_eval(input_obj)
+        eva = _opa_eval(input_obj, timeout=budget.timeout(OPA_TIMEOUT_S))
         deny = eva.get("deny", [])
         warn = eva.get("warn", [])
+        degraded = bool(eva.get("timed_out"))
     if not deny:
         # Heuristic checks if OPA produced nothing or CLI missing
         deny = _deny_from_plan(summary)
+    if degraded:
+        # Fail closed: the heuristic alone must not stand in for a policy evaluation
+        deny = deny + [TIMEOUT_DENY]
     allow = len(deny) == 0
     out = {"deny": deny, "warn": warn, "allow": allow}
-    log("INFO", "opa_gate done", event, allow=allow, deny=len(deny))
+    if degraded:
+        out["degraded"] = True
+    log("INFO", "opa_gate done", event, allow=allow, deny=len(deny), degraded=degraded)
+    stage_metric("Violations", len(deny))
     return out
@@ -0,0 +1,56 @@
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from lambdas._log import log, buffered
+from lambdas._trace import trace_handler
+from lambdas._budget import Budget
+from lambdas import _claim
+from lambdas import tf_plan_parser, opa_gate, iam_lint, impact_map, risk_score
+
+# Deterministic stages in state-machine order: (result key, handler, input view).
+# Each handler sees the pipeline state with earlier results already unwrapped, so
+# parsed objects are handed along as-is instead of round-tripping through JSON.
+STAGES: List[Tuple[str, Callable, Callable[[Dict[str, Any]], Dict[str, Any]]]] = [
+    ("plan", tf_plan_parser.handler, lambda s: s),
+    ("opa", opa_gate.handler, lambda s: s),
+    ("lint", iam_lint.handler, lambda s: s),
+    # impact_map reads the plan summary at the top level
+    ("impact", impact_map.handler, lambda s: {**s, "summary": (s.get("plan") or {}).get("summary") or {}}),
+    ("risk", risk_score.handler, lambda s: s),
+]
+
+
+def run(event: Dict[str, Any], context: Any = None) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """Run STAGES in-process; returns (stage outputs by key, per-stage milliseconds)."""
+    state = dict(event)
+    outputs: Dict[str, Any] = {}
+    timings: Dict[str, float] = {}
+    # Results stay in memory between stages; only the handler's output is claim-checked
+    with _claim.inline():
+        for key, fn, view in STAGES:
+            t0 = time.perf_counter()
+            out = fn(view(state), context)
+            timings[key] = round((time.perf_counter() - t0) * 1000.0, 3)
+            state[key] = outputs[key] = out
+    return outputs, timings
+
+
+@buffered
+@trace_handler
+def handler(event, context):
+    """ParsePlan, OPAGate, StaticGate, impact map and RiskScore in one invocation.
+
+    Input: the pipeline state (bucket, plan_key, policy/trust/metadata, ...).
+    Output: the input state plus each stage's result under the key and shape the
+    individual Lambda tasks leave behind (``plan``, ``opa``, ``lint``, ``impact``, ``risk``,
+    each as ``{"Payload": ...}``, oversized ones as claim-check references) and
+    ``runner.stages_ms``. The state machine task uses
+    OutputPath $.Payload so the following states read the same paths either way.
+    """
+    log("INFO", "pipeline_runner start", event)
+    outputs, timings = run(event, context)
+    out = dict(event)
+    budget = Budget.from_context(context, event)
+    out.update({k: {"Payload": _claim.offload(v, event, k, budget)} for k, v in outputs.items()})
+    out["runner"] = {"stages_ms": timings}
+    log("INFO", "pipeline_runner done", event, stages_ms=timings, allow=(outputs.get("opa") or {}).get("allow"))
+    return out
@@ -0,0 +1,194 @@
+import asyncio
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+from lambdas._log import log, buffered, stage_metric
+from lambdas._trace import trace_handler
+from lambdas._budget import Budget
+from lambdas._claim import payload as _payload
+from lambdas._violations import run_violations
+from lambdas import github_checks, github_commenter, teams_notifier
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+SNS_TOPIC_ARN = os.environ.get("SNS_TOPIC_ARN")
+ALL_SINKS = ("check", "comment", "teams", "sns", "audit")
+# Per-sink ceilings in seconds; each is further capped by the invocation budget
+SINK_TIMEOUTS_S = {"check": 10.0, "comment": 8.0, "teams": 5.0, "sns": 3.0, "audit": 3.0}
+
+
+def _teams_text(event: Dict[str, Any]) -> str:
+    v = _payload(event.get("verdict"))
+    verdict = (v.get("verdict") or "-").upper()
+    return f"PR review {event.get('repo')}#{event.get('pr_number') or event.get('sha')}: {verdict} (confidence {float(v.get('confidence') or 0):.2f})"
+
+
+def _sink_check(event, budget):
+    return github_checks.handler(event, None)
+
+
+def _sink_comment(event, budget):
+    return github_commenter.handler(event, None)
+
+
+def _sink_teams(event, budget):
+    ev = dict(event)
+    ev.setdefault("text", _teams_text(event))
+    return teams_notifier.handler(ev, None)
+
+
+def _sink_sns(event, budget):
+    topic = event.get("sns_topic_arn") or SNS_TOPIC_ARN
+    if not topic:
+        return {"skipped": "no-topic"}
+    v = _payload(event.get("verdict"))
+    msg = {
+        "run_id": event.get("run_id"),
+        "repo": event.get("repo"),
+        "sha": event.get("sha"),
+        "pr_number": event.get("pr_number"),
+        "verdict": v.get("verdict"),
+        "confidence": v.get("confidence"),
+    }
+    res = budget.client("sns", cap=SINK_TIMEOUTS_S["sns"]).publish(
+        TopicArn=topic, Subject="PR review verdict", Message=json.dumps(msg, separators=(",", ":"))
+    )
+    return {"message_id": res.get("MessageId")}
+
+
+def _started_at(event):
+    """Pipeline start (Step Functions execution start time), if the state carries it."""
+    ts = event.get("start_ts") or (event.get("timing") or {}).get("start_ts")
+    if not ts:
+        return None
+    try:
+        if str(ts).isdigit():
+            return datetime.fromtimestamp(int(ts) / 1000, timezone.utc)
+        return datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def run_item(event: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """The PRRuns item for a finished run, whichever path reached Publish (agent, fallback or OPA block)."""
+    v = _payload(event.get("verdict"))
+    verdict = str(v.get("verdict") or "unknown")
+    stamp = now.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    item = {
+        "run_id": {"S": str(event["run_id"])},
+        "created_at": {"S": stamp},
+        # Partition key of the created_month_gsi; reports Query one bucket per month
+        "created_month": {"S": now.strftime("%Y-%m")},
+        "repo": {"S": str(event.get("repo") or '')},
+        "sha": {"S": str(event.get("sha") or '')},
+        "verdict": {"S": verdict},
+        "published_at": {"S": stamp},
+        "published_verdict": {"S": verdict},
+    }
+    if v.get("agent_session_id"):
+        item["request_id"] = {"S": str(v["agent_session_id"])}
+    for k in ("confidence", "tokens_estimated", "agent_ms"):
+        if v.get(k) is not None:
+            item[k] = {"N": str(v[k])}
+    vids = run_violations(event)
+    if vids:
+        # Normalized rule IDs; rollups count runs per ID for the top-offenders ranking
+        item["violations"] = {"SS": vids}
+    started = _started_at(event)
+    if started:
+        # End-to-end review time: pipeline start to publish
+        item["review_ms"] = {"N": str(max(0, int((now - started).total_seconds() * 1000)))}
+    return item
+
+
+def _sink_audit(event, budget):
+    if not (TABLE_NAME and event.get("run_id")):
+        return {"skipped": "no-table-or-run-id"}
+    # One write per run: its INSERT is what runs_rollup counts
+    budget.client("dynamodb", cap=SINK_TIMEOUTS_S["audit"]).put_item(
+        TableName=TABLE_NAME, Item=run_item(event, datetime.now(timezone.utc)))
+    return {"audited": True}
+
+
+SINKS: Dict[str, Callable[[Dict[str, Any], Budget], Dict[str, Any]]] = {
+    "check": _sink_check,
+    "comment": _sink_comment,
+    "teams": _sink_teams,
+    "sns": _sink_sns,
+    "audit": _sink_audit,
+}
+
+
+def _outcome(res: Any) -> str:
+    if not isinstance(res, dict):
+        return "ok"
+    if res.get("skipped"):
+        return "skipped"
+    if res.get("error"):
+        return "skipped" if str(res["error"]).startswith("missing-") else "error"
+    if res.get("status") == "deferred":
+        return "deferred"
+    return "ok"
+
+
+async def _run_sink(name: str, fn, event, budget: Budget, timeout: float, pool: ThreadPoolExecutor) -> Dict[str, Any]:
+    t0 = time.monotonic()
+    # Hand the sink its own deadline so the handler's internal timeouts fit inside it
+    event = dict(event, deadline_ms=int(time.time() * 1000 + timeout * 1000))
+    try:
+        # Sinks are blocking I/O; run each in a worker thread so they overlap. The copied
+        # context carries the log depth, so a sink that outlives its timeout cannot hold
+        # back this invocation's flush
+        loop = asyncio.get_running_loop()
+        call = contextvars.copy_context().run
+        res = await asyncio.wait_for(loop.run_in_executor(pool, call, fn, event, budget), timeout=timeout)
+        out = {"status": _outcome(res), "result": res}
+    except asyncio.TimeoutError:
+        # The worker keeps running in the background; we just stop waiting for it
+        out = {"status": "timeout"}
+    except Exception as e:
+        out = {"status": "error", "error": str(e)}
+    out["ms"] = int((time.monotonic() - t0) * 1000)
+    return out
+
+
+async def publish(event: Dict[str, Any], sinks: List[str], budget: Budget) -> Dict[str, Dict[str, Any]]:
+    names = [s for s in sinks if s in SINKS]
+    # Own pool rather than the loop default: asyncio.run() would join a timed-out worker on exit
+    pool = ThreadPoolExecutor(max_workers=max(1, len(names)), thread_name_prefix="publish")
+    try:
+        tasks = []
+        for n in names:
+            cap = SINK_TIMEOUTS_S.get(n, 5.0)
+            tasks.append(_run_sink(n, SINKS[n], event, budget, min(cap, budget.timeout(cap)), pool))
+        results = await asyncio.gather(*tasks)
+    finally:
+        pool.shutdown(wait=False)
+    return dict(zip(names, results))
+
+
+@buffered
+@trace_handler
+def handler(event, context):
+    """Publish the PR result to every sink concurrently.
+
+    Replaces the serial PostChecks -> CommentPR -> NotifyTeams tail: the GitHub check,
+    PR comment, Teams card, SNS message and audit write run concurrently, each with its
+    own timeout, and each sink's outcome is reported independently.
+
+    Inputs: the full pipeline state (repo, sha, pr_number, run_id, verdict, plan/opa/lint, ...)
+      - sinks (optional): subset of check, comment, teams, sns, audit (default: all)
+    Output: { published: bool, sinks: { name: { status, ms, result|error } } }
+    """
+    log("INFO", "publisher start", event)
+    budget = Budget.from_context(context, event)
+    sinks = event.get("sinks") or list(ALL_SINKS)
+    results = asyncio.run(publish(event, sinks, budget))
+    failed = [n for n, r in results.items() if r["status"] in ("error", "timeout")]
+    log("INFO", "publisher done", event, failed=failed, **{f"{n}_ms": r["ms"] for n, r in results.items()})
+    stage_metric("SinkFailures", len(failed))
+    return {"published": not failed, "sinks": results}
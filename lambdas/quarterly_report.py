@@ -1,130 +1,440 @@
 """
 Quarterly PDF generator Lambda.
-- Scans DDB table PRRuns (sampled) and writes a rich PDF summary to S3 at reports/YYYY-QN.pdf
-- Uses ReportLab for basic styling and charts; falls back to text-only if ReportLab unavailable.
+- Sums the quarter's daily rollup items (ROLLUP#DAY#<date>, maintained by runs_rollup from the
+  PRRuns stream) and writes a rich PDF summary to S3 at reports/YYYY-QN.pdf
+- Days without a rollup item are counted from their own runs (created_at range Queries on
+  the created_month GSI), never from whole months.
+- Without rollups, reads the quarter's runs instead (one Query per month on the created_month
+  GSI, in parallel; parallel segmented Scan filtered on created_at if the index is unavailable).
+- Can instead aggregate the columnar audit export (exports/prruns/dt=<date>/, see audit_exporter).
+- Writes pages with a small built-in PDF writer as sections are generated (render="stream",
+  the default); the output goes up through S3 multipart in parts, so memory is bounded by one part.
+- render="reportlab" uses ReportLab for richer styling; falls back to text-only if ReportLab unavailable.
 """
-import io
-import statistics
+import json
+import os
+import time
 import boto3
-from datetime import datetime as dt
-from lambdas._log import log
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta, datetime as dt
+from botocore.exceptions import ClientError
+from lambdas._log import log, buffered, stage_metric
+from lambdas._trace import trace_handler
+from lambdas._budget import Budget
+from lambdas import _rollup, _columnar
+from lambdas._pdfstream import PdfStream, PageLayout
+from lambdas._s3stream import MultipartWriter
 
 S3 = boto3.client('s3')
-DDB = boto3.client('dynamodb')
+TABLE_NAME = os.environ.get("TABLE_NAME", "PRRuns")
+RUNS_INDEX = os.environ.get("RUNS_INDEX", "created_month_gsi")
+SCAN_SEGMENTS = int(os.environ.get("REPORT_SCAN_SEGMENTS", "4"))
+BUCKET_NAME = os.environ.get("BUCKET_NAME")
+EXPORT_PREFIX = os.environ.get("EXPORT_PREFIX", _columnar.EXPORT_PREFIX)
+# "stream" (default) for the page-at-a-time writer, or "reportlab", which builds the whole
+# file in memory before writing it
+REPORT_RENDER = os.environ.get("REPORT_RENDER", "stream")
+RENDER_RESERVE_MS = 15000
+# Errors meaning the month index can't serve the read (missing/still backfilling)
+_NO_INDEX = ("ValidationException", "ResourceNotFoundException")
 
 def _quarter(date):
     return (date.month - 1)//3 + 1
 
-def _pdf_bytes(title, stats):
+def _previous_quarter(date):
+    q = _quarter(date) - 1
+    return (date.year, q) if q else (date.year - 1, 4)
+
+def _quarter_range(year, q):
+    """(months, start, end): YYYY-MM buckets and the half-open created_at range of the quarter."""
+    months = [f"{year}-{m:02d}" for m in range(3*q - 2, 3*q + 1)]
+    end = f"{year + 1}-01" if q == 4 else f"{year}-{3*q + 1:02d}"
+    return months, f"{months[0]}-01T00:00:00", f"{end}-01T00:00:00"
+
+def _ddb(budget):
+    return budget.client('dynamodb', cap=10)
+
+def _drain(pages, items, budget, state):
+    # Shared by Query and Scan workers; stops every worker once the budget runs low
+    for page in pages:
+        items.extend(page.get('Items', []))
+        if state['degraded'] or budget.nearly_spent(RENDER_RESERVE_MS):
+            state['degraded'] = True
+            return
+
+def _query_month(ddb, table, month, budget, state):
+    items = []
+    pages = ddb.get_paginator('query').paginate(
+        TableName=table,
+        IndexName=RUNS_INDEX,
+        KeyConditionExpression='created_month = :m',
+        ExpressionAttributeValues={':m': {'S': month}},
+    )
+    _drain(pages, items, budget, state)
+    return items
+
+def _query_days(ddb, table, month, first, last, budget, state):
+    # created_at is the index range key, so only the runs of first..last are read
+    items = []
+    pages = ddb.get_paginator('query').paginate(
+        TableName=table,
+        IndexName=RUNS_INDEX,
+        KeyConditionExpression='created_month = :m AND created_at BETWEEN :a AND :b',
+        ExpressionAttributeValues={
+            ':m': {'S': month},
+            ':a': {'S': f"{first}T00:00:00"},
+            ':b': {'S': f"{last}T23:59:59.999999Z"},
+        },
+    )
+    _drain(pages, items, budget, state)
+    return items
+
+def _scan_segment(ddb, table, segment, start, end, budget, state):
+    items = []
+    pages = ddb.get_paginator('scan').paginate(
+        TableName=table,
+        Segment=segment,
+        TotalSegments=SCAN_SEGMENTS,
+        FilterExpression='created_at BETWEEN :s AND :e',
+        ExpressionAttributeValues={':s': {'S': start}, ':e': {'S': end}},
+    )
+    _drain(pages, items, budget, state)
+    # BETWEEN is inclusive; the range end is the first instant of the next quarter
+    return [it for it in items if (it.get('created_at') or {}).get('S', '') < end]
+
+def read_runs(table, year, q, budget, ddb=None, access='query'):
+    """Runs created in ``year`` Q``q``: (items, degraded, access used).
+
+    Read cost follows the quarter's runs: one Query per month bucket, in parallel.
+    Falls back to a parallel segmented Scan when the index can't be queried.
+    """
+    ddb = ddb or _ddb(budget)
+    months, start, end = _quarter_range(year, q)
+    state = {'degraded': False}
+    if access == 'query':
+        try:
+            with ThreadPoolExecutor(max_workers=len(months)) as pool:
+                parts = list(pool.map(lambda m: _query_month(ddb, table, m, budget, state), months))
+            return [it for p in parts for it in p], state['degraded'], 'query'
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in _NO_INDEX:
+                raise
+            log("ERROR", "runs index unavailable; falling back to segmented scan", None, index=RUNS_INDEX, error=str(e))
+    state['degraded'] = False
+    with ThreadPoolExecutor(max_workers=SCAN_SEGMENTS) as pool:
+        parts = list(pool.map(lambda seg: _scan_segment(ddb, table, seg, start, end, budget, state), range(SCAN_SEGMENTS)))
+    return [it for p in parts for it in p], state['degraded'], 'scan'
+
+def _sections(title, stats):
+    """Report content as (kind, payload) items, generated lazily so a renderer holds one section at a time."""
+    yield 'title', title
+    yield 'table', [
+        ["Total runs", stats.get('total', 0)],
+        ["Green", stats.get('green', 0)],
+        ["Amber", stats.get('amber', 0)],
+        ["Red", stats.get('red', 0)],
+        ["Average confidence", stats.get('avg_confidence', '-')],
+        ["Estimated tokens", stats.get('tokens', 0)],
+        ["Median review time (ms)", stats.get('p50_ms', '-')],
+        ["p90 review time (ms)", stats.get('p90_ms', '-')],
+        ["Estimated engineer-hours saved", f"{stats.get('hours_saved', 0):.1f}"],
+    ]
+    # Top offenders, ranked by the number of runs that hit them
+    top = stats.get('top_violations') or []
+    if top:
+        yield 'heading', "Top violations"
+        yield 'table', [["#", "Violation", "Runs"]] + [[i + 1, vid, n] for i, (vid, n) in enumerate(top)]
+    if stats.get('degraded'):
+        yield 'note', "Note: partial data - execution budget ran out while reading runs."
+    if stats.get('backfilled'):
+        yield 'note', f"Note: {len(stats['backfilled'])} day(s) had no rollup and were counted from raw runs."
+
+def _text_lines(title, stats):
+    yield title
+    yield f"Total runs: {stats.get('total', 0)}"
+    yield f"Green/Amber/Red: {stats.get('green', 0)}/{stats.get('amber', 0)}/{stats.get('red', 0)}"
+    yield f"Average confidence: {stats.get('avg_confidence', '-')}; tokens: {stats.get('tokens', 0)}"
+    yield f"Median ms: {stats.get('p50_ms', '-')}; p90 ms: {stats.get('p90_ms', '-')}"
+    yield f"Hours saved: {stats.get('hours_saved', 0):.1f}"
+    yield "Top violations: " + (", ".join(f"{vid} ({n})" for vid, n in stats.get('top_violations', [])) or '-')
+    if stats.get('degraded'):
+        yield "NOTE: partial data - execution budget ran out while reading runs"
+    if stats.get('backfilled'):
+        yield "NOTE: counted from raw runs (no rollup): " + ", ".join(stats['backfilled'])
+
+def _render_reportlab(sections, out):
+    # Lazy import to keep lambda import fast
+    from reportlab.lib.pagesizes import LETTER
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    styles = getSampleStyleSheet()
+    story = []
+    for kind, body in sections:
+        if kind == 'title':
+            story += [Paragraph(body, styles['Title']), Spacer(1, 12)]
+        elif kind == 'heading':
+            story.append(Paragraph(body, styles['Heading2']))
+        elif kind == 'table':
+            tbl = Table(body, hAlign='LEFT')
+            tbl.setStyle(TableStyle([
+                ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+                ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+                ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ]))
+            story += [tbl, Spacer(1, 12)]
+        else:
+            story.append(Paragraph(body, styles['Italic']))
+    # ReportLab assembles the whole file before writing it out
+    SimpleDocTemplate(out, pagesize=LETTER).build(story)
+
+def _render_stream(sections, out):
+    # Pages are written (and uploaded part by part) as soon as they fill
+    layout = PageLayout(PdfStream(out))
+    for kind, body in sections:
+        if kind == 'title':
+            layout.text(body, 'title')
+            layout.space(12)
+        elif kind == 'heading':
+            layout.text(body, 'heading')
+        elif kind == 'table':
+            cols = max(len(r) for r in body)
+            widths = [220, 250] if cols == 2 else [30, 380, 60][:cols]
+            layout.table(body, widths, header=cols > 2)
+            layout.space(12)
+        else:
+            layout.text(body, 'note')
+    layout.close()
+
+def _render_text(title, stats, out):
+    for i, line in enumerate(_text_lines(title, stats)):
+        out.write((("\n" if i else "") + line).encode('utf-8'))
+
+def render_report(title, stats, out, mode=None):
+    """Write the report to ``out`` (a MultipartWriter); returns the renderer used.
+
+    "stream" (the default) writes page by page with the built-in writer, so memory stays at
+    one page plus one upload part however long the report gets. "reportlab" builds the file
+    in memory, falling back to plain text (also written line by line) if it is unavailable.
+    """
+    mode = mode or REPORT_RENDER
+    if mode == 'stream':
+        _render_stream(_sections(title, stats), out)
+        return 'stream'
     try:
-        # Lazy import to keep lambda import fast
-        from reportlab.lib.pagesizes import LETTER
-        from reportlab.lib import colors
-        from reportlab.pdfgen import canvas
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-        from reportlab.lib.styles import getSampleStyleSheet
-
-        buf = io.BytesIO()
-        doc = SimpleDocTemplate(buf, pagesize=LETTER)
-        styles = getSampleStyleSheet()
-        story = []
-        story.append(Paragraph(title, styles['Title']))
-        story.append(Spacer(1, 12))
-
-        # Summary table
-        data = [
-            ["Total runs", stats.get('total', 0)],
-            ["Green", stats.get('green', 0)],
-            ["Amber", stats.get('amber', 0)],
-            ["Red", stats.get('red', 0)],
-            ["Median review time (ms)", stats.get('p50_ms', '-')],
-            ["p90 review time (ms)", stats.get('p90_ms', '-')],
-            ["Estimated engineer-hours saved", f"{stats.get('hours_saved', 0):.1f}"],
-            ["Top violations", ", ".join(stats.get('top_violations', [])[:5]) or '-'],
-        ]
-        tbl = Table(data, hAlign='LEFT')
-        tbl.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ]))
-        story.append(tbl)
-        story.append(Spacer(1, 12))
-
-        doc.build(story)
-        pdf = buf.getvalue()
-        buf.close()
-        return pdf
+        _render_reportlab(_sections(title, stats), out)
+        return 'reportlab'
     except Exception:
-        # Fallback to plain text if ReportLab not present
-        content = [
-            title,
-            f"Total runs: {stats.get('total', 0)}",
-            f"Green/Amber/Red: {stats.get('green', 0)}/{stats.get('amber', 0)}/{stats.get('red', 0)}",
-            f"Median ms: {stats.get('p50_ms', '-')}; p90 ms: {stats.get('p90_ms', '-')}",
-            f"Hours saved: {stats.get('hours_saved', 0):.1f}",
-            f"Top violations: {', '.join(stats.get('top_violations', []))}",
-        ]
-        return ("\n".join(content)).encode('utf-8')
+        # Fallback to plain text if ReportLab not present (or failed before writing anything)
+        if out.bytes_written:
+            raise
+    _render_text(title, stats, out)
+    return 'text'
 
-def handler(event, context):
-    log("INFO", "quarterly_report start", event)
-    bucket = event.get('bucket')
-    if not bucket:
-        log("ERROR", "missing bucket", event)
-        raise ValueError("bucket is required")
-    table = event.get('table', 'PRRuns')
-    today = dt.utcnow().date()
-    q = _quarter(today)
-    year = today.year
-    title = f"PR Review Quarterly Report {year} Q{q}"
-    items = []
-    paginator = DDB.get_paginator('scan')
-    for page in paginator.paginate(TableName=table, PaginationConfig={'MaxItems': 500}):
-        items.extend(page.get('Items', []))
-    total = len(items)
-    # Simple aggregations by attributes commonly written in audit traces
-    def _sval(it, k):
-        v = it.get(k)
-        if isinstance(v, dict):
-            return v.get('S') or v.get('s')
-        return None
-    def _nval(it, k):
-        v = it.get(k)
-        if isinstance(v, dict):
-            try:
-                return float(v.get('N') or v.get('n'))
-            except Exception:
-                return None
-        return None
-    greens = sum(1 for it in items if (_sval(it, 'verdict') or '').lower() == 'green')
-    ambers = sum(1 for it in items if (_sval(it, 'verdict') or '').lower() == 'amber')
-    reds = sum(1 for it in items if (_sval(it, 'verdict') or '').lower() == 'red')
-    confs = [(_nval(it,'confidence') or 0.0) for it in items]
-    times = [(_nval(it,'review_ms') or 0.0) for it in items if _nval(it,'review_ms')]
-    p50 = statistics.median(times) if times else None
-    p90 = statistics.quantiles(times, n=10)[8] if len(times) >= 10 else None
-    # Heuristic time-saved: assume 5 minutes saved for green, 2 minutes for amber, 0 for red
-    hours_saved = ((greens*5 + ambers*2)/60.0)
-    # Simple top violations aggregation if present
-    violations = []
+def _days(year, q):
+    d = date(year, 3*q - 2, 1)
+    end = date(year + 1, 1, 1) if q == 4 else date(year, 3*q + 1, 1)
+    while d < end:
+        yield d.isoformat()
+        d += timedelta(days=1)
+
+def read_rollups(table, year, q, budget, ddb=None):
+    """The quarter's ROLLUP#DAY items (~90 small items, BatchGet in chunks of 100)."""
+    ddb = ddb or _ddb(budget)
+    keys = [_rollup.day_key(d) for d in _days(year, q)]
+    out = []
+    for i in range(0, len(keys), 100):
+        req = {table: {'Keys': keys[i:i + 100]}}
+        attempt = 0
+        while req:
+            res = ddb.batch_get_item(RequestItems=req)
+            out.extend(res.get('Responses', {}).get(table, []))
+            req = res.get('UnprocessedKeys') or {}
+            if req:
+                attempt += 1
+                time.sleep(min(1.0, 0.05 * 2 ** attempt))
+    return out
+
+def missing_days(rollups, year, q, today):
+    """Days of the quarter, up to ``today``, that have no ROLLUP#DAY item."""
+    have = {r['run_id']['S'][len(_rollup.DAY_PREFIX):] for r in rollups}
+    return [d for d in _days(year, q) if d <= today and d not in have]
+
+def _day_ranges(days):
+    """Sorted ``days`` as (month, first, last) runs of consecutive days within one month bucket."""
+    ranges = []
+    for d in sorted(days):
+        if ranges and ranges[-1][0] == d[:7] and date.fromisoformat(ranges[-1][2]) + timedelta(days=1) == date.fromisoformat(d):
+            ranges[-1] = (ranges[-1][0], ranges[-1][1], d)
+        else:
+            ranges.append((d[:7], d, d))
+    return ranges
+
+def backfill(table, year, q, days, budget, access='query', ddb=None):
+    """Counters of raw runs on ``days``: (totals, days that had runs, degraded).
+
+    Reads only those days: one Query per run of consecutive days on the created_at range
+    of the month index, in parallel, so days that have a rollup are never re-read and
+    days without runs cost only an empty Query. Falls back to a segmented Scan over the
+    days' span when the index can't be queried.
+    """
+    ddb = ddb or _ddb(budget)
+    wanted = set(days)
+    ranges = _day_ranges(wanted)
+    state, items = {'degraded': False}, None
+    if access == 'query':
+        try:
+            with ThreadPoolExecutor(max_workers=min(len(ranges), 8)) as pool:
+                parts = list(pool.map(lambda r: _query_days(ddb, table, *r, budget, state), ranges))
+            items = [it for p in parts for it in p]
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in _NO_INDEX:
+                raise
+            log("ERROR", "runs index unavailable; falling back to segmented scan", None, index=RUNS_INDEX, error=str(e))
+    if items is None:
+        state['degraded'] = False
+        start = f"{ranges[0][1]}T00:00:00"
+        end = f"{date.fromisoformat(ranges[-1][2]) + timedelta(days=1)}T00:00:00"
+        with ThreadPoolExecutor(max_workers=SCAN_SEGMENTS) as pool:
+            parts = list(pool.map(lambda seg: _scan_segment(ddb, table, seg, start, end, budget, state), range(SCAN_SEGMENTS)))
+        items = [it for p in parts for it in p]
+    degraded = state['degraded']
+    totals, found = {}, set()
     for it in items:
-        v = _sval(it, 'violation')
-        if v:
-            violations.append(v)
-    top_violations = sorted(set(violations))
-    stats = {
-        'total': total,
+        day = _rollup.run_day(it)
+        if day in wanted:
+            _rollup.merge(totals, _rollup.delta(it))
+            found.add(day)
+    return totals, sorted(found), degraded
+
+def read_export(bucket, year, q, s3=None, prefix=EXPORT_PREFIX):
+    """Totals from the quarter's exported columnar files (audit_exporter): (totals, files read).
+
+    Lists one dt=YYYY-MM- prefix per month and aggregates each file column-wise (Arrow
+    compute when pyarrow is packaged), so only one file is held in memory at a time.
+    """
+    s3 = s3 or S3
+    months, _, _ = _quarter_range(year, q)
+    totals, files = {}, 0
+    for month in months:
+        for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=f"{prefix}dt={month}-"):
+            for obj in page.get('Contents', []):
+                ext = _columnar.key_ext(obj['Key'])
+                if not ext:
+                    continue
+                data = s3.get_object(Bucket=bucket, Key=obj['Key'])['Body'].read()
+                _rollup.merge(totals, _columnar.aggregate(_columnar.decode(data, ext)))
+                files += 1
+    return totals, files
+
+def _save_quarter(table, year, q, totals, stats, budget):
+    """Keep the quarter's aggregate (compact review-time sketch, top-K violations) for dashboards and later merges."""
+    try:
+        _ddb(budget).put_item(TableName=table, Item={
+            'run_id': {'S': f"{_rollup.QUARTER_PREFIX}{year}-Q{q}"},
+            'runs': {'N': str(stats['total'])},
+            'green': {'N': str(stats['green'])},
+            'amber': {'N': str(stats['amber'])},
+            'red': {'N': str(stats['red'])},
+            'review_sketch': {'B': _rollup.review_sketch(totals).to_bytes()},
+            'top_violations': {'S': json.dumps(_rollup.violation_counts(totals).to_dict(), separators=(',', ':'))},
+            'updated_at': {'S': dt.utcnow().isoformat() + 'Z'},
+        })
+    except Exception as e:
+        log("ERROR", "quarter aggregate write failed", None, error=str(e))
+
+def _stats(totals):
+    """Report figures from summed rollup counters; percentiles come from the merged review-time sketch."""
+    greens, ambers, reds = (int(totals.get(f'v_{v}', 0)) for v in _rollup.VERDICTS)
+    sketch = _rollup.review_sketch(totals)
+    p50, p90 = sketch.quantile(0.5), sketch.quantile(0.9)
+    conf_n = totals.get('conf_n') or 0
+    return {
+        'total': int(totals.get('runs', 0)),
         'green': greens,
         'amber': ambers,
         'red': reds,
+        'avg_confidence': round(totals['conf_sum'] / conf_n, 3) if conf_n else '-',
+        'tokens': int(totals.get('tokens', 0)),
         'p50_ms': int(p50) if p50 else '-',
         'p90_ms': int(p90) if p90 else '-',
-        'hours_saved': hours_saved,
-        'top_violations': top_violations,
+        # Heuristic time-saved: assume 5 minutes saved for green, 2 minutes for amber, 0 for red
+        'hours_saved': (greens*5 + ambers*2)/60.0,
+        'top_violations': _rollup.top_violations(totals),
     }
-    pdf = _pdf_bytes(title, stats)
+
+@buffered
+@trace_handler
+def handler(event, context):
+    """Build the quarterly PDF.
+
+    Inputs:
+      - bucket (optional, default env BUCKET_NAME): destination for reports/YYYY-QN.pdf
+      - table (optional, default env TABLE_NAME or PRRuns)
+      - year, quarter (optional): defaults to the last completed quarter, since the
+        schedule fires on the first day of the next one
+      - source (optional): "rollup" (default) reads the daily rollups, "export" aggregates the
+        columnar files written by audit_exporter, "runs" aggregates raw runs; raw runs are
+        also used when the quarter has no rollups or exported files, and for the days that
+        have no rollup item (listed in the output as backfilled_days)
+      - access (optional): "query" (default) or "scan" to force the segmented-scan path for raw runs
+      - render (optional): "stream" or "reportlab" (default env REPORT_RENDER, "stream"); the file is
+        uploaded with S3 multipart as it is written either way
+    """
+    log("INFO", "quarterly_report start", event)
+    budget = Budget.from_context(context, event)
+    bucket = event.get('bucket') or BUCKET_NAME
+    if not bucket:
+        log("ERROR", "missing bucket", event)
+        raise ValueError("bucket is required")
+    table = event.get('table') or TABLE_NAME
+    year, q = _previous_quarter(dt.utcnow().date())
+    if event.get('year') or event.get('quarter'):
+        year, q = int(event.get('year') or year), int(event.get('quarter') or q)
+        if not 1 <= q <= 4:
+            raise ValueError("quarter must be 1..4")
+    title = f"PR Review Quarterly Report {year} Q{q}"
+    totals, degraded, access, backfilled = None, False, 'rollup', []
+    source = event.get('source') or 'rollup'
+    if source == 'rollup':
+        rollups = read_rollups(table, year, q, budget)
+        if rollups:
+            totals = _rollup.summarize(_rollup.counters(r) for r in rollups)
+            # A day without an item may have had no runs, or its stream records never reached
+            # runs_rollup (consumer disabled, records aged out); count that day's raw runs
+            gaps = missing_days(rollups, year, q, dt.utcnow().date().isoformat())
+            if gaps:
+                raw, backfilled, degraded = backfill(table, year, q, gaps, budget, access=event.get('access') or 'query')
+                _rollup.merge(totals, raw)
+                if backfilled:
+                    log("ERROR", "days missing from rollups; counted raw runs", event, days=backfilled)
+    elif source == 'export':
+        exported, files = read_export(event.get('export_bucket') or bucket, year, q)
+        if files:
+            totals, access = exported, 'export'
+    if totals is None:
+        # No rollups for the quarter (predates the stream consumer, or forced): aggregate raw runs
+        items, degraded, access = read_runs(table, year, q, budget, access=event.get('access') or 'query')
+        if degraded:
+            # Keep enough budget to render and upload whatever was read so far
+            log("ERROR", "budget nearly spent; reporting on partial read", event, items=len(items), access=access)
+        totals = _rollup.summarize(_rollup.delta(it) for it in items)
+    stats = _stats(totals)
+    stats['degraded'] = degraded
+    stats['backfilled'] = backfilled
+    total = stats['total']
     key = f"reports/{year}-Q{q}.pdf"
-    S3.put_object(Bucket=bucket, Key=key, Body=pdf, ContentType='application/pdf')
-    log("INFO", "quarterly_report done", event, key=key, total=total)
-    return {"status":"ok","report_key": key}
+    with MultipartWriter(S3, bucket, key, ContentType='application/pdf') as out:
+        renderer = render_report(title, stats, out, event.get('render'))
+    if access in ('rollup', 'export') and not degraded:
+        _save_quarter(table, year, q, totals, stats, budget)
+    log("INFO", "quarterly_report done", event, key=key, total=total, degraded=degraded, source=access,
+        backfilled=len(backfilled), renderer=renderer, bytes=out.bytes_written, parts=len(out.parts))
+    stage_metric("ItemsProcessed", total)
+    out = {"status":"ok","report_key": key}
+    if degraded:
+        out["degraded"] = True
+    if backfilled:
+        out["backfilled_days"] = backfilled
+    return out
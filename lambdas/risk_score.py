@@ -1,6 +1,10 @@
-from lambdas._log import log
+from lambdas._log import log, buffered
+from lambdas._trace import trace_handler
+from lambdas._claim import payload as _payload
 
 
+@buffered
+@trace_handler
 def handler(event, context):
     """Compute risk category from signals.
 
@@ -15,22 +19,22 @@ def handler(event, context):
     drivers = []
     score = 0
     # base score by violations
-    violations = ((event.get("lint") or {}).get("violations")) or []
+    violations = _payload(event.get("lint")).get("violations") or []
     if violations:
         score += min(3, len(violations))
         drivers.append(f"lint_violations:{len(violations)}")
     # wildcard actions in policies
-    wildcard = ((((event.get("plan") or {}).get("summary") or {}).get("iam") or {}).get("wildcard_actions") or [])
+    wildcard = (((_payload(event.get("plan")).get("summary") or {}).get("iam") or {}).get("wildcard_actions") or [])
     if wildcard:
         score += min(3, len(wildcard))
         drivers.append(f"wildcards:{len(wildcard)}")
     # drift
-    drift = (event.get("drift") or {}).get("drift")
+    drift = _payload(event.get("drift")).get("drift")
     if drift == "suspect":
         score += 2
         drivers.append("drift:suspect")
     # blast radius
-    radius = (event.get("impact") or {}).get("blast_radius")
+    radius = _payload(event.get("impact")).get("blast_radius")
     if radius == "medium":
         score += 1
         drivers.append("radius:medium")
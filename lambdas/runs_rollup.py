@@ -0,0 +1,93 @@
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+from botocore.exceptions import ClientError
+from lambdas._log import log, buffered, stage_metric
+from lambdas._trace import trace_handler
+from lambdas._budget import Budget
+from lambdas import _rollup
+
+TABLE_NAME = os.environ.get("TABLE_NAME")
+# Rollups live beside the runs unless pointed elsewhere
+ROLLUP_TABLE = os.environ.get("ROLLUP_TABLE") or TABLE_NAME
+
+
+def _ddb(budget: Budget):
+    return budget.client("dynamodb", cap=5)
+
+
+def _already_counted(e: ClientError) -> bool:
+    # The marker Put is the first transact item; its condition failing means a redelivered record
+    reasons = e.response.get("CancellationReasons") or []
+    return bool(reasons) and reasons[0].get("Code") == "ConditionalCheckFailed"
+
+
+def apply(image: Dict[str, Any], ddb, table: str) -> str:
+    """Fold one run into its day's rollup exactly once; returns counted, duplicate or ignored."""
+    day = _rollup.run_day(image)
+    if not day:
+        return "ignored"
+    run_id = image["run_id"]["S"]
+    upd = _rollup.update_args(_rollup.delta(image), day, datetime.utcnow().isoformat() + "Z")
+    upd["TableName"] = table
+    try:
+        # Stream delivery is at-least-once; the marker makes the ADD idempotent per run
+        ddb.transact_write_items(TransactItems=[
+            {"Put": {
+                "TableName": table,
+                "Item": {"run_id": {"S": f"{_rollup.SEEN_PREFIX}{run_id}"}, "ttl": {"N": str(int(time.time()) + _rollup.SEEN_TTL_S)}},
+                "ConditionExpression": "attribute_not_exists(run_id)",
+            }},
+            {"Update": upd},
+        ])
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "TransactionCanceledException" and _already_counted(e):
+            return "duplicate"
+        raise
+    return "counted"
+
+
+def records_for(items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Stream-shaped INSERT records for stored run items (local replay, backfills, tests)."""
+    return [
+        {"eventID": str(i), "eventName": "INSERT", "dynamodb": {"NewImage": it, "SequenceNumber": str(i)}}
+        for i, it in enumerate(items)
+    ]
+
+
+def process(records: List[Dict[str, Any]], ddb, table: str) -> Dict[str, Any]:
+    out = {"counted": 0, "duplicate": 0, "ignored": 0, "batchItemFailures": []}
+    for rec in records:
+        image = (rec.get("dynamodb") or {}).get("NewImage") or {}
+        if rec.get("eventName") != "INSERT":
+            out["ignored"] += 1
+            continue
+        try:
+            out[apply(image, ddb, table)] += 1
+        except Exception as e:
+            # Streams retry from the first failed record; everything after it is redelivered too
+            log("ERROR", "rollup update failed", None, run_id=(image.get("run_id") or {}).get("S"), error=str(e))
+            out["batchItemFailures"] = [{"itemIdentifier": (rec.get("dynamodb") or {}).get("SequenceNumber")}]
+            break
+    return out
+
+
+@buffered
+@trace_handler
+def handler(event, context):
+    """Maintain per-day rollups from the PRRuns stream.
+
+    Inputs: DynamoDB stream batch (Records). Only INSERTs of run items count; each run
+    ADDs verdict counts, confidence sum/count, token total and violation tallies into
+    item run_id = ROLLUP#DAY#<YYYY-MM-DD>, so reports read ~90 items per quarter.
+    Output: { counted, duplicate, ignored, batchItemFailures }
+    """
+    budget = Budget.from_context(context, event)
+    records = event.get("Records") or []
+    out = process(records, _ddb(budget), ROLLUP_TABLE)
+    log("INFO", "runs_rollup done", None, records=len(records), counted=out["counted"], duplicate=out["duplicate"])
+    stage_metric("ItemsProcessed", out["counted"])
+    stage_metric("Duplicates", out["duplicate"])
+    return out
@@ -1,16 +1,34 @@
 import os
 import json
-import boto3
+import threading
+import time
 import urllib.request
-from lambdas._log import log
+from typing import Any, Dict, List, Optional
+from lambdas._log import log, buffered, stage_metric
+from lambdas._trace import trace_handler
+from lambdas._budget import Budget
+from lambdas._claim import payload as _payload
 
 SECRETS_ARN = os.environ.get("TEAMS_SECRET_ARN")
+HTTP_TIMEOUT_S = 10
+# immediate posts one card per call; digest buffers cards and posts one per channel per window
+TEAMS_MODE = os.environ.get("TEAMS_MODE", "immediate")
+# Digest buffer; without it a per-container in-memory queue stands in (local runs, tests)
+DIGEST_QUEUE_URL = os.environ.get("TEAMS_DIGEST_QUEUE_URL")
+DIGEST_WINDOW_S = int(os.environ.get("TEAMS_DIGEST_WINDOW_S", "300"))
+DIGEST_MAX_ITEMS = int(os.environ.get("TEAMS_DIGEST_MAX_ITEMS", "20"))
+# Rows rendered per digest card; the rest are summarised as a count
+DIGEST_MAX_ROWS = 25
+# Verdicts/severities that skip the buffer and go out straight away
+URGENT = ("red", "high", "critical")
+DEFAULT_CHANNEL = "default"
 
-def _get_webhook_url(event):
+
+def _get_webhook_url(event, budget=None):
     if event.get("teams_webhook_url"):
         return event["teams_webhook_url"]
     if SECRETS_ARN:
-        sm = boto3.client('secretsmanager')
+        sm = (budget or Budget()).client('secretsmanager', cap=5)
         val = sm.get_secret_value(SecretId=SECRETS_ARN)
         secret = val.get('SecretString')
         if secret:
@@ -21,41 +39,200 @@ def _get_webhook_url(event):
                 return secret
     return None
 
+
+def _card(body: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "type": "message",
+        "attachments": [
+            {
+                "contentType": "application/vnd.microsoft.card.adaptive",
+                "content": {
+                    "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
+                    "type": "AdaptiveCard",
+                    "version": "1.4",
+                    "body": body,
+                }
+            }
+        ]
+    }
+
+
+def _post(url: str, card: Dict[str, Any], timeout: float) -> None:
+    data = json.dumps(card).encode("utf-8")
+    req = urllib.request.Request(url, data=data, method="POST")
+    req.add_header("Content-Type", "application/json")
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        _ = resp.read()
+
+
+def _urgent(event) -> bool:
+    if event.get("urgent"):
+        return True
+    severity = str(event.get("severity") or _payload(event.get("verdict")).get("verdict") or "").lower()
+    return severity in URGENT
+
+
+def digest_card(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One card summarising a window of buffered notifications for a channel."""
+    first = min(i.get("ts") or 0 for i in items)
+    minutes = max(1, int((time.time() - first) / 60)) if first else 0
+    head = f"PR review digest: {len(items)} notification{'s' if len(items) != 1 else ''}"
+    if minutes:
+        head += f" in the last {minutes}m"
+    body = [{"type": "TextBlock", "text": head, "weight": "Bolder", "wrap": True}]
+    for i in items[:DIGEST_MAX_ROWS]:
+        body.append({"type": "TextBlock", "text": f"- {i.get('text')}", "wrap": True, "spacing": "None"})
+    if len(items) > DIGEST_MAX_ROWS:
+        body.append({"type": "TextBlock", "text": f"...and {len(items) - DIGEST_MAX_ROWS} more", "isSubtle": True, "wrap": True})
+    return _card(body)
+
+
+class LocalQueue:
+    """In-memory stand-in for the digest queue.
+
+    Mirrors the SQS event source mapping: a channel is flushed once it holds
+    DIGEST_MAX_ITEMS messages or its oldest message is DIGEST_WINDOW_S old.
+    Only as durable as the container, so it is meant for local runs and tests.
+    """
+
+    def __init__(self):
+        self._items: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, msg: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Buffer ``msg``; returns the channel's batch when that closed its window, else []."""
+        with self._lock:
+            items = self._items.setdefault(msg["channel"], [])
+            items.append(msg)
+            if len(items) >= DIGEST_MAX_ITEMS or time.time() - items[0]["ts"] >= DIGEST_WINDOW_S:
+                return self._items.pop(msg["channel"])
+        return []
+
+    def due(self, force: bool = False) -> List[Dict[str, Any]]:
+        """Pop every channel whose time window has closed (all channels if ``force``)."""
+        now = time.time()
+        out: List[Dict[str, Any]] = []
+        with self._lock:
+            for ch in list(self._items):
+                if force or now - self._items[ch][0]["ts"] >= DIGEST_WINDOW_S:
+                    out.extend(self._items.pop(ch))
+        return out
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(v) for v in self._items.values())
+
+
+_LOCAL = LocalQueue()
+
+
+def _message(event, text: str) -> Dict[str, Any]:
+    v = _payload(event.get("verdict"))
+    msg = {
+        "channel": event.get("teams_channel") or DEFAULT_CHANNEL,
+        "text": text,
+        "repo": event.get("repo"),
+        "pr_number": event.get("pr_number"),
+        "run_id": event.get("run_id"),
+        "verdict": v.get("verdict"),
+        "ts": time.time(),
+    }
+    if event.get("teams_webhook_url"):
+        msg["teams_webhook_url"] = event["teams_webhook_url"]
+    return msg
+
+
+def _flush(items: List[Dict[str, Any]], budget: Budget, event=None) -> Dict[str, Any]:
+    """Send one digest card per channel; returns the channels that failed."""
+    by_channel: Dict[str, List[Dict[str, Any]]] = {}
+    for i in items:
+        by_channel.setdefault(i.get("channel") or DEFAULT_CHANNEL, []).append(i)
+    failed = []
+    for ch, batch in by_channel.items():
+        url = _get_webhook_url(batch[0], budget)
+        if not url:
+            log("ERROR", "missing webhook url", event, channel=ch)
+            failed.append(ch)
+            continue
+        try:
+            _post(url, digest_card(batch), budget.timeout(HTTP_TIMEOUT_S))
+            log("INFO", "teams digest sent", event, channel=ch, items=len(batch))
+        except Exception as e:
+            log("ERROR", "teams digest failed", event, channel=ch, items=len(batch), error=str(e))
+            failed.append(ch)
+    stage_metric("ItemsProcessed", len(items))
+    stage_metric("SinkFailures", len(failed))
+    return {"channels": len(by_channel), "items": len(items), "failed": failed}
+
+
+def _enqueue(event, text: str, budget: Budget) -> Dict[str, Any]:
+    msg = _message(event, text)
+    if DIGEST_QUEUE_URL:
+        budget.client("sqs", cap=5).send_message(QueueUrl=DIGEST_QUEUE_URL, MessageBody=json.dumps(msg))
+        log("INFO", "teams notification buffered", event, channel=msg["channel"])
+        return {"teams": "buffered"}
+    batch = _LOCAL.put(msg) + _LOCAL.due()
+    if not batch:
+        return {"teams": "buffered"}
+    res = _flush(batch, budget, event)
+    return {"teams": "digest-sent" if not res["failed"] else "digest-failed", **res}
+
+
+def _flush_records(records: List[Dict[str, Any]], budget: Budget) -> Dict[str, Any]:
+    # SQS event source mapping: the batch is the closed window (BatchSize / MaximumBatchingWindowInSeconds)
+    items, ids = [], {}
+    for r in records:
+        try:
+            m = json.loads(r.get("body") or "{}")
+        except ValueError:
+            log("ERROR", "teams digest dropped unreadable message", None, message_id=r.get("messageId"))
+            continue
+        items.append(m)
+        ids.setdefault(m.get("channel") or DEFAULT_CHANNEL, []).append(r.get("messageId"))
+    res = _flush(items, budget)
+    # Only the failed channels' messages go back on the queue
+    failures = [{"itemIdentifier": mid} for ch in res["failed"] for mid in ids.get(ch, [])]
+    return {"batchItemFailures": failures, **res}
+
+
+@buffered
+@trace_handler
 def handler(event, context):
-    """Post an Adaptive Card to Teams (incoming webhook).
+    """Post an Adaptive Card to Teams (incoming webhook), or buffer it for a digest.
 
     Inputs:
       - teams_webhook_url (optional if using Secrets)
       - card (dict) or 'text' string to render a simple card
+      - digest (optional, default from env TEAMS_MODE=digest): buffer the notification and
+        post one coalesced card per teams_channel when its time/count window closes.
+        Red verdicts (or severity high/critical, or urgent=true) are always sent immediately.
+      - flush (optional): post every buffered digest now (local queue only)
+      - Records: SQS batch from the digest queue; posts one card per channel and
+        reports failed channels as batchItemFailures
     """
     log("INFO", "teams_notifier start", event)
-    url = _get_webhook_url(event)
+    budget = Budget.from_context(context, event)
+    if "Records" in event:
+        return _flush_records(event["Records"], budget)
+    if event.get("flush"):
+        return _flush(_LOCAL.due(force=True), budget, event)
+
+    card = event.get("card")
+    digest = event.get("digest")
+    if digest is None:
+        digest = TEAMS_MODE == "digest"
+    if digest and not card and not _urgent(event):
+        return _enqueue(event, event.get("text") or "PR Review notification", budget)
+
+    url = _get_webhook_url(event, budget)
     if not url:
         log("ERROR", "missing webhook url", event)
         return {"error": "missing-webhook-url"}
-    card = event.get("card")
     if not card:
         text = event.get("text") or "PR Review notification"
-        card = {
-            "type": "message",
-            "attachments": [
-                {
-                    "contentType": "application/vnd.microsoft.card.adaptive",
-                    "content": {
-                        "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
-                        "type": "AdaptiveCard",
-                        "version": "1.4",
-                        "body": [ { "type": "TextBlock", "text": text, "wrap": True } ]
-                    }
-                }
-            ]
-        }
-    data = json.dumps(card).encode("utf-8")
-    req = urllib.request.Request(url, data=data, method="POST")
-    req.add_header("Content-Type", "application/json")
+        card = _card([{"type": "TextBlock", "text": text, "wrap": True}])
     try:
-        with urllib.request.urlopen(req) as resp:
-            _ = resp.read()
+        _post(url, card, budget.timeout(HTTP_TIMEOUT_S))
         log("INFO", "teams card sent", event)
         return {"teams": "sent"}
     except Exception as e:
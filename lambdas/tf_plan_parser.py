@@ -1,8 +1,12 @@
 import json
 import os
-import boto3
+import posixpath
 from typing import Any, Dict, List, Tuple, Set
-from lambdas._log import log
+from lambdas._log import log, buffered, stage_metric
+from lambdas._trace import trace_handler, span
+from lambdas._profile import profiled
+from lambdas._budget import Budget
+from lambdas._claim import claim_check
 
 IAM_TYPES = {
     "aws_iam_role",
@@ -35,6 +39,25 @@ def _collect_modules(address: str) -> List[str]:
             i += 1
     return modules
 
+def _module_dirs(plan: Dict[str, Any]) -> Dict[str, str]:
+    """Repo-relative directory of each module call (``module.foo.module.bar`` -> ``modules/foo/bar``).
+
+    Taken from the plan's configuration block. Local sources resolve against the calling
+    module's directory; registry/git modules are not in the repo, so they map to the caller's.
+    """
+    dirs: Dict[str, str] = {}
+
+    def walk(mod: Dict[str, Any], prefix: str, here: str) -> None:
+        for name, call in (mod.get("module_calls") or {}).items():
+            src = str(call.get("source") or "")
+            path = posixpath.normpath(posixpath.join(here, src)) if src.startswith(("./", "../")) else here
+            key = f"{prefix}module.{name}"
+            dirs[key] = "" if path == "." else path
+            walk(call.get("module") or {}, key + ".", path)
+
+    walk((plan.get("configuration") or {}).get("root_module") or {}, "", ".")
+    return dirs
+
 def _scan_policy_for_wildcards(policy_doc: Dict[str, Any]) -> List[Dict[str, Any]]:
     findings = []
     if not policy_doc:
@@ -127,35 +150,49 @@ def _parse_changes(plan: Dict[str, Any]) -> Dict[str, Any]:
             "wildcard_actions": wildcard_actions,
         },
         "modules": sorted(modules_set),
+        # Lets findings on a resource address be anchored to that module's files
+        "module_dirs": _module_dirs(plan),
         "accounts": sorted(accounts_from_tags),
     }
 
+def _s3(budget: Budget):
+    return budget.client('s3', cap=20)
+
 def summary_from_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
     """Public helper for tests/tools: return summary from a plan dict."""
     try:
         return _parse_changes(plan or {})
     except Exception:
-        return {"total_resources": 0, "iam": {"by_type": {}, "roles_affected": [], "wildcard_actions": []}, "modules": [], "accounts": []}
+        return {"total_resources": 0, "iam": {"by_type": {}, "roles_affected": [], "wildcard_actions": []}, "modules": [], "module_dirs": {}, "accounts": []}
 
+@buffered
+@trace_handler
+@claim_check("plan")
+@profiled
 def handler(event, context):
     """Read plan.json from S3 and emit a compact diff structure."""
     log("INFO", "tf_plan_parser start", event)
-    s3 = boto3.client('s3')
+    s3 = _s3(Budget.from_context(context, event))
     bucket = event.get('bucket')
     key = event.get('plan_key')  # e.g., <run-id>/plan.json
     if not bucket or not key:
         log("ERROR", "missing required inputs", event, missing=[k for k in ["bucket","plan_key"] if not event.get(k)])
         return {"error":"missing bucket/plan_key"}
     try:
-        body = s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+        with span("s3.get_object", key=key) as sp:
+            body = s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+            sp.set(bytes=len(body))
     except Exception as e:
         log("ERROR", "s3 get failed", event, error=str(e), bucket=bucket, key=key)
         return {"error": f"s3-get-failed: {e}"}
     try:
-        plan = json.loads(body)
+        with span("json.loads", bytes=len(body)):
+            plan = json.loads(body)
     except Exception as e:
         log("ERROR", "invalid plan json", event, error=str(e))
         return {"error": f"invalid-plan-json: {e}"}
-    summary = _parse_changes(plan)
+    with span("parse_changes"):
+        summary = _parse_changes(plan)
     log("INFO", "tf_plan_parser done", event, total=summary.get("total_resources"))
+    stage_metric("ItemsProcessed", summary.get("total_resources") or 0)
     return {"status": "ok", "summary": summary}
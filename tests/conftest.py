@@ -0,0 +1,4 @@
+import os
+
+# Several lambdas build boto3 clients at import time; give them a region so they import offline
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
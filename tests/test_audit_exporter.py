@@ -0,0 +1,109 @@
+from datetime import datetime
+
+from lambdas import audit_exporter as mod
+from lambdas import quarterly_report
+from lambdas import _columnar, _rollup
+from tools.fake_dynamodb import FakeDynamoDB
+from tools.fake_s3 import FakeS3
+
+
+def _run(i, created_at, verdict="green", review_ms=30000, violations=None):
+    it = {
+        "run_id": {"S": f"r{i}"},
+        "created_at": {"S": created_at},
+        "created_month": {"S": created_at[:7]},
+        "verdict": {"S": verdict},
+        "confidence": {"N": "0.8"},
+        "tokens_estimated": {"N": "1200"},
+        "review_ms": {"N": str(review_ms)},
+    }
+    if violations:
+        it["violations"] = {"SS": violations}
+    return it
+
+
+def _table(*items):
+    ddb = FakeDynamoDB()
+    for it in items:
+        ddb.put_item(TableName="PRRuns", Item=it)
+    return ddb
+
+
+def _rows(s3, key):
+    ext = _columnar.key_ext(key)
+    return _columnar.decode(s3.objects["artifacts"][key], ext)
+
+
+def test_exports_date_partitions_and_advances_watermark():
+    ddb = _table(
+        _run(1, "2026-08-30T23:00:00.000000Z"),
+        _run(2, "2026-09-01T08:00:00.000000Z", "red", violations=["iam.wildcard-action"]),
+        _run(3, "2026-09-01T09:00:00.000000Z"),
+    )
+    s3 = FakeS3()
+    out = mod.export(ddb, s3, "PRRuns", "artifacts", since="2026-08-01T00:00:00.000000Z", now=datetime(2026, 9, 2))
+    assert out["exported"] == 3 and not out.get("degraded")
+    days = sorted(k.split("/")[2] for k in out["files"])
+    assert days == ["dt=2026-08-30", "dt=2026-09-01"]
+    sept = next(k for k in out["files"] if "dt=2026-09-01" in k)
+    if _columnar.key_ext(sept) == "json.gz":
+        cols = _rows(s3, sept)
+        assert cols["run_id"] == ["r2", "r3"] and cols["violations"] == [["iam.wildcard-action"], None]
+    assert mod.read_watermark(ddb, "PRRuns") == "2026-09-01T23:55:00.000000Z"
+
+
+def test_incremental_export_only_appends_new_runs():
+    ddb = _table(_run(1, "2026-09-01T08:00:00.000000Z"))
+    s3 = FakeS3()
+    mod.export(ddb, s3, "PRRuns", "artifacts", since="2026-09-01T00:00:00.000000Z", now=datetime(2026, 9, 1, 12))
+    ddb.put_item(TableName="PRRuns", Item=_run(2, "2026-09-01T13:00:00.000000Z"))
+    # Still inside the lag window: left for the next run
+    ddb.put_item(TableName="PRRuns", Item=_run(3, "2026-09-01T13:58:00.000000Z"))
+    out = mod.export(ddb, s3, "PRRuns", "artifacts", now=datetime(2026, 9, 1, 14))
+    assert out["exported"] == 1
+    assert len(s3.objects["artifacts"]) == 2
+    again = mod.export(ddb, s3, "PRRuns", "artifacts", now=datetime(2026, 9, 1, 14))
+    assert again == {"exported": 0, "files": [], "watermark": out["watermark"]}
+
+
+def test_watermark_item_is_not_a_run():
+    ddb = _table(_run(1, "2026-09-01T08:00:00.000000Z"))
+    mod.export(ddb, FakeS3(), "PRRuns", "artifacts", since="2026-09-01T00:00:00.000000Z", now=datetime(2026, 9, 2))
+    wm = ddb.tables["PRRuns"]["EXPORT#WATERMARK#prruns"]
+    assert _rollup.run_day(wm) is None and "created_month" not in wm
+
+
+def test_aggregate_matches_rollup_deltas():
+    items = [
+        _run(1, "2026-09-01T08:00:00.000000Z", "green", 42000, ["iam.wildcard-action"]),
+        _run(2, "2026-09-01T09:00:00.000000Z", "amber", 0),
+        _run(3, "2026-09-01T10:00:00.000000Z", "red", 120000, ["iam.wildcard-action", "tags.missing-required"]),
+    ]
+    body, ext = _columnar.encode(_columnar.columns_from_items(items))
+    got = _columnar.aggregate(_columnar.decode(body, ext))
+    want = _rollup.summarize(_rollup.delta(it) for it in items)
+    assert got.keys() == want.keys()
+    for k in want:
+        assert abs(got[k] - want[k]) < 1e-9, k
+
+
+def test_report_reads_exported_files(monkeypatch):
+    ddb = _table(
+        _run(1, "2026-07-02T08:00:00.000000Z", violations=["iam.wildcard-action"]),
+        _run(2, "2026-09-30T09:00:00.000000Z", "red", violations=["iam.wildcard-action"]),
+        _run(3, "2026-10-01T09:00:00.000000Z"),
+    )
+    s3 = FakeS3()
+    mod.export(ddb, s3, "PRRuns", "artifacts", since="2026-07-01T00:00:00.000000Z", now=datetime(2026, 10, 2))
+    monkeypatch.setattr(quarterly_report, "S3", s3)
+    monkeypatch.setattr(quarterly_report, "_ddb", lambda budget: ddb)
+    ddb.calls.clear()
+    out = quarterly_report.handler({"bucket": "artifacts", "year": 2026, "quarter": 3, "source": "export"}, None)
+    assert out == {"status": "ok", "report_key": "reports/2026-Q3.pdf"}
+    # No table reads: only the quarter aggregate is written back
+    assert ddb.calls == ["put_item"]
+    assert ddb.tables["PRRuns"]["ROLLUP#QUARTER#2026-Q3"]["runs"] == {"N": "2"}
+    body = s3.objects["artifacts"]["reports/2026-Q3.pdf"]
+    if body.startswith(b"PR Review"):
+        text = body.decode()
+        assert "Total runs: 2" in text and "iam.wildcard-action (2)" in text
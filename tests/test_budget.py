@@ -0,0 +1,53 @@
+import time
+from lambdas._budget import Budget
+from lambdas import drift_check
+
+
+class _Ctx:
+    def __init__(self, ms):
+        self._ms = ms
+
+    def get_remaining_time_in_millis(self):
+        return self._ms
+
+
+def test_budget_unbounded_without_context():
+    b = Budget.from_context(None, {})
+    assert b.remaining_ms() == float("inf")
+    assert b.timeout(10) == 10
+    assert not b.nearly_spent(1_000_000)
+
+
+def test_budget_from_context_and_event_deadline():
+    b = Budget.from_context(_Ctx(60_000), {}, reserve_ms=1000)
+    assert 58_000 < b.remaining_ms() <= 59_000
+    assert b.timeout(10) == 10
+    # A pipeline deadline earlier than the Lambda's wins
+    ev = {"deadline_ms": int(time.time() * 1000) + 3000}
+    b = Budget.from_context(_Ctx(60_000), ev, reserve_ms=1000)
+    assert b.remaining_ms() <= 2000
+    assert 0.5 <= b.timeout(10) <= 2
+
+
+def test_drift_check_degrades_when_budget_spent():
+    event = {"summary": {"iam": {"roles_affected": ["r1"]}}, "spoke_accounts": ["111", "222"]}
+    out = drift_check.handler(event, _Ctx(100))
+    assert out["degraded"] is True
+    assert out["skipped_accounts"] == ["111", "222"]
+    assert out["drift"] == "suspect"
+
+
+def test_sdk_attempts_fit_inside_the_budget():
+    def cfg(ms, cap=10):
+        c = Budget.from_context(_Ctx(ms), {}, reserve_ms=0).config(cap)
+        return c.retries["total_max_attempts"], c.read_timeout
+
+    assert cfg(60_000) == (2, 10)
+    # Not enough for two full attempts: the remaining time is split between them
+    assert cfg(12_500) == (2, 6)
+    # Too little to split usefully: one attempt gets what is left
+    assert cfg(8_500) == (1, 8)
+    assert cfg(300) == (1, 1)
+    for ms in (60_000, 25_000, 12_500, 9_900, 4_000):
+        attempts, t = cfg(ms)
+        assert attempts * t <= ms / 1000
@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from tools import bundle_hash as bh
+
+GLOBS = ["policies/**/*.rego", "policies/**/*.json", "prompts/**/*"]
+
+
+def _tree(root: Path):
+    (root / "policies").mkdir()
+    (root / "prompts" / "v1").mkdir(parents=True)
+    (root / "policies" / "iam.rego").write_text("package iam\n")
+    (root / "policies" / "data.json").write_text("{}")
+    (root / "prompts" / "v1" / "review.md").write_text("Review the plan.\n")
+    (root / "prompts" / "empty.txt").write_text("")
+
+
+def test_manifest_root_and_changed_leaves(tmp_path):
+    _tree(tmp_path)
+    m1 = bh.manifest(GLOBS, tmp_path, cache_path=None)
+    assert list(m1["files"]) == ["policies/data.json", "policies/iam.rego", "prompts/empty.txt", "prompts/v1/review.md"]
+    assert m1["files"]["prompts/empty.txt"]["sha256"] == hashlib.sha256(b"").hexdigest()
+    assert m1["root"] == bh.manifest(GLOBS, tmp_path, cache_path=None)["root"]
+    (tmp_path / "policies" / "iam.rego").write_text("package iam\ndefault allow := false\n")
+    (tmp_path / "prompts" / "v2.md").write_text("new")
+    (tmp_path / "prompts" / "empty.txt").unlink()
+    m2 = bh.manifest(GLOBS, tmp_path, cache_path=None)
+    assert m2["root"] != m1["root"]
+    assert bh.changed(m2, m1) == {"added": ["prompts/v2.md"], "removed": ["prompts/empty.txt"], "modified": ["policies/iam.rego"]}
+
+
+def test_merkle_binds_paths_and_carries_odd_node():
+    a, b, c = (bh.leaf_hash(p, hashlib.sha256(b"x").hexdigest()) for p in ("a", "b", "c"))
+    assert a != b
+    ab = hashlib.sha256(b"\x01" + a + b).digest()
+    assert bh.merkle_root([a, b, c]) == hashlib.sha256(b"\x01" + ab + c).hexdigest()
+    assert bh.merkle_root([a]) == a.hex()
+
+
+def test_cache_skips_unchanged_files(tmp_path, monkeypatch):
+    _tree(tmp_path)
+    cache = str(tmp_path / "cache.json")
+    first = bh.manifest(GLOBS, tmp_path, cache)
+    read = []
+    real = bh.file_digest
+    monkeypatch.setattr(bh, "file_digest", lambda p: read.append(p.name) or real(p))
+    assert bh.manifest(GLOBS, tmp_path, cache)["root"] == first["root"] and read == []
+    target = tmp_path / "policies" / "iam.rego"
+    target.write_text("package iam2\n")
+    st = target.stat()
+    os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert bh.manifest(GLOBS, tmp_path, cache)["root"] != first["root"] and read == ["iam.rego"]
+    assert json.load(open(cache))["policies/iam.rego"]["size"] == len("package iam2\n")
+
+
+def test_cli_reports_changes(tmp_path, monkeypatch, capsys):
+    _tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    assert bh.main(["--glob", "policies/*", "--manifest", "m1.json", "--no-cache"]) == 0
+    (tmp_path / "policies" / "data.json").write_text('{"x": 1}')
+    capsys.readouterr()
+    bh.main(["--glob", "policies/*", "--previous", "m1.json", "--no-cache"])
+    out = capsys.readouterr()
+    assert "modified: policies/data.json" in out.err
+    assert out.out.strip() == bh.manifest(["policies/*"], tmp_path, None)["root"]
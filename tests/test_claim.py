@@ -0,0 +1,111 @@
+import gzip
+import json
+import pytest
+from lambdas import _claim, _config_cache, opa_gate, pipeline_runner, risk_score, tf_plan_parser
+from lambdas._claim import claim_check, offload, payload, resolve
+from tools.fake_s3 import FakeS3
+from tools.sfn_local import Emulator, LocalAWS, definition, synthetic_plan
+
+BIG = {"allow": False, "deny": ["Action:* detected"], "trace": ["x" * 100] * 50}
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    s3 = FakeS3()
+    monkeypatch.setattr(_claim, "_s3", lambda budget: s3)
+    _claim.clear()
+    yield s3
+    _claim.clear()
+
+
+def test_small_results_stay_inline(s3):
+    assert offload({"allow": True}, {"bucket": "b"}, "opa") == {"allow": True}
+    assert s3.calls == []
+
+
+def test_large_result_becomes_reference_with_routing_fields(s3):
+    ref = offload(BIG, {"bucket": "b", "run_id": "r1"}, "opa", threshold=1024)
+    c = ref["$claim"]
+    assert ref["allow"] is False and ref["deny"] == BIG["deny"] and "trace" not in ref
+    assert c["key"].startswith("claims/r1/opa-") and c["key"].endswith(".json.gz")
+    assert json.loads(gzip.decompress(s3.objects["b"][c["key"]])) == BIG
+    assert len(json.dumps(ref)) < 1024
+    # Content addressed: the same result (a retried task) maps to the same object
+    assert offload(dict(BIG), {"bucket": "b", "run_id": "r1"}, "opa", threshold=1024) == ref
+
+
+def test_resolve_fetches_once_and_checks_digest(s3):
+    ref = offload(BIG, {"bucket": "b", "run_id": "r1"}, "opa", threshold=1024)
+    _claim.clear()
+    assert payload({"Payload": ref}) == BIG
+    assert resolve(ref) == BIG
+    assert s3.calls.count("get_object") == 1
+    _claim.clear()
+    s3.objects["b"][ref["$claim"]["key"]] = gzip.compress(b'{"allow": true}')
+    with pytest.raises(ValueError, match="digest"):
+        resolve(ref)
+
+
+def test_falls_back_to_inline_without_bucket_or_on_put_failure(s3, monkeypatch):
+    assert offload(BIG, {"run_id": "r1"}, "opa", threshold=1024) is BIG
+
+    def broken(budget):
+        raise RuntimeError("s3 down")
+    monkeypatch.setattr(_claim, "_s3", broken)
+    assert offload(BIG, {"bucket": "b"}, "opa", threshold=1024) is BIG
+
+
+def test_only_the_outermost_handler_offloads(s3, monkeypatch):
+    monkeypatch.setattr(_claim, "THRESHOLD_BYTES", 1024)
+    inner = claim_check("opa")(lambda event, context: dict(BIG))
+    outer = claim_check("verdict")(lambda event, context: {"opa": inner(event, context)})
+    out = outer({"bucket": "b", "run_id": "r1"}, None)
+    assert "$claim" in out and s3.calls == ["put_object"]
+    assert resolve(out)["opa"] == BIG
+
+
+def test_downstream_stage_reads_offloaded_result(s3, monkeypatch):
+    monkeypatch.setattr(_claim, "THRESHOLD_BYTES", 64)
+    state = {"run_id": "r1", "bucket": "b", "plan": {"Payload": {"summary": {"iam": {"wildcard_actions": ["*"]}}}}}
+    state["opa"] = {"Payload": opa_gate.handler(state, None)}
+    state["lint"] = {"Payload": {"valid": True, "violations": []}}
+    assert "$claim" in state["opa"]["Payload"]
+    assert risk_score.handler(state, None)["drivers"] == ["wildcards:1"]
+
+
+def test_pipeline_runner_offloads_stage_outputs(s3, monkeypatch):
+    plans = FakeS3()
+    plans.put_object(Bucket="b", Key="r1/plan.json", Body=json.dumps(synthetic_plan(0, resources=200, seed=1)))
+    monkeypatch.setattr(tf_plan_parser, "_s3", lambda budget: plans)
+    monkeypatch.setattr(_claim, "THRESHOLD_BYTES", 512)
+    out = pipeline_runner.handler({"run_id": "r1", "bucket": "b", "plan_key": "r1/plan.json"}, None)
+    plan = out["plan"]["Payload"]
+    assert plan["status"] == "ok" and "summary" not in plan
+    # Stages inside the runner saw the full summary; only the handler's output was offloaded
+    assert [k.split("/")[2].split("-")[0] for k in s3.objects["b"]] == ["plan"]
+    assert payload(out["plan"])["summary"]["total_resources"] == 200
+
+
+def test_state_machine_routes_on_references(monkeypatch):
+    aws = LocalAWS(drift_rate=0.0)
+    for obj, name, value in aws.patches():
+        monkeypatch.setattr(obj, name, value)
+    for k, v in aws.env().items():
+        monkeypatch.setenv(k, v)
+    monkeypatch.setattr(_claim, "THRESHOLD_BYTES", 512)
+    _claim.clear()
+    _config_cache.invalidate()
+    try:
+        res = Emulator(definition()).run(aws.execution_input(1, synthetic_plan(0, resources=60, seed=3)))
+    finally:
+        aws.close()
+        _config_cache.invalidate()
+    assert res["status"] == "SUCCEEDED", res
+    assert any(k.startswith("claims/") for objs in aws.s3.objects.values() for k in objs)
+
+
+def test_resolved_values_are_independent_copies(s3):
+    ref = offload(BIG, {"bucket": "b", "run_id": "r1"}, "opa", threshold=1024)
+    first = resolve(ref)
+    first["deny"].append("mutated by a handler")
+    assert resolve(ref) == BIG and s3.calls.count("get_object") == 0
@@ -0,0 +1,81 @@
+import json
+import pytest
+from lambdas import _config_cache as cc, bundle_guard, config_mode
+from tools.fake_dynamodb import FakeDynamoDB
+from tools import approve_bundle
+
+TABLE = "PRRuns"
+
+
+class FakeSSM:
+    def __init__(self, value="suggest_approve"):
+        self.value = value
+        self.calls = 0
+
+    def get_parameter(self, Name):
+        self.calls += 1
+        if self.value is None:
+            raise RuntimeError("ssm down")
+        return {"Parameter": {"Name": Name, "Value": self.value}}
+
+
+@pytest.fixture
+def env(monkeypatch):
+    ddb, ssm = FakeDynamoDB(), FakeSSM()
+    monkeypatch.setattr(cc, "TABLE_NAME", TABLE)
+    monkeypatch.setattr(cc, "BUNDLE_HASH", "h1")
+    monkeypatch.setattr(cc, "_ddb", lambda budget: ddb)
+    monkeypatch.setattr(cc, "_ssm", lambda budget: ssm)
+    monkeypatch.setattr(cc, "_ENTRIES", {})
+    monkeypatch.setattr(cc, "_EPOCH", {"value": None, "checked": 0.0})
+    return ddb, ssm
+
+
+def test_warm_calls_hit_cache(env):
+    ddb, ssm = env
+    for _ in range(3):
+        assert config_mode.handler({"run_id": "r"}, None)["mode"] == "suggest_approve"
+    assert ssm.calls == 1
+    # One epoch read, one bundle read; the rest are served from the container
+    assert ddb.calls.count("get_item") == 2
+
+
+def test_approval_bumps_epoch_and_invalidates(env, monkeypatch):
+    ddb, _ = env
+    assert bundle_guard.handler({}, None) == {"approved": False, "hash": "h1", "reason": "not-approved"}
+    assert approve_bundle.approve(ddb, TABLE, "h1") == 1
+    # Still inside the epoch check window: the cached answer stands
+    assert bundle_guard.handler({}, None)["approved"] is False
+    monkeypatch.setattr(cc, "EPOCH_CHECK_S", 0.0)
+    assert bundle_guard.handler({}, None) == {"approved": True, "hash": "h1", "reason": "approved"}
+
+
+def test_ttl_expiry_and_failures_not_cached(env, monkeypatch):
+    _, ssm = env
+    ssm.value = None
+    assert cc.mode() == cc.DEFAULT_MODE
+    ssm.value = "auto_approve"
+    assert cc.mode() == "auto_approve"
+    ssm.value = "comment_only"
+    assert cc.mode() == "auto_approve"
+    monkeypatch.setattr(cc, "CONFIG_TTL_S", 0.0)
+    cc.invalidate()
+    assert cc.mode() == "comment_only"
+
+
+def test_repo_settings_override_mode(env):
+    ddb, _ = env
+    ddb.put_item(TableName=TABLE, Item={"run_id": {"S": "CONFIG#REPO#org/a"}, "settings": {"S": json.dumps({"mode": "comment_only", "min_confidence": 0.95})}})
+    out = cc.resolve({"repo": "org/a", "bundle_hash": "h2"})
+    assert out["mode"] == "comment_only" and out["settings"]["min_confidence"] == 0.95
+    assert out["bundle"] == {"approved": False, "hash": "h2", "reason": "not-approved"}
+    assert cc.resolve({"repo": "org/b"})["mode"] == "suggest_approve"
+
+
+def test_missing_table_and_ddb_error(env, monkeypatch):
+    def broken(budget):
+        raise RuntimeError("ddb down")
+    monkeypatch.setattr(cc, "_ddb", broken)
+    assert cc.bundle_status()["reason"] == "ddb-error"
+    monkeypatch.setattr(cc, "TABLE_NAME", None)
+    assert cc.bundle_status()["reason"] == "no-table"
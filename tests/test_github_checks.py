@@ -0,0 +1,61 @@
+import pytest
+from lambdas import _github, _github_ratelimit as rl
+from lambdas import github_checks as mod
+from tools.fake_github import FakeGitHub
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setattr(rl, "_SCHEDULER", rl.Scheduler())
+    monkeypatch.setattr(mod, "_emit_metrics", lambda *a, **k: None)
+    with FakeGitHub() as gh:
+        monkeypatch.setenv("GITHUB_API_URL", gh.url)
+        yield gh
+    _github._CLIENTS.clear()
+
+
+def test_check_run_lifecycle_with_batched_annotations(fake):
+    base = {"repo": "o/r", "sha": "abc", "token": "t", "run_id": "run-1"}
+    started = mod.handler(dict(base, action="start"), None)
+    assert started["status"] == "check-started"
+    assert fake.check_runs[started["id"]]["status"] == "in_progress"
+
+    wildcards = [{"address": f"aws_iam_policy.p{i}", "statement": 0, "reason": "Action:* detected"} for i in range(110)]
+    event = dict(
+        base,
+        check_start={"Payload": started},
+        plan={"Payload": {"summary": {"iam": {"wildcard_actions": wildcards}}}},
+        opa={"Payload": {"deny": ["Action:* detected"], "warn": []}},
+        lint={"Payload": {"violations": ["iam:PassRole must be scoped to specific role ARNs"], "warnings": []}},
+        verdict={"Payload": {"verdict": "red", "confidence": 0.9, "markdown": "blocked"}},
+    )
+    out = mod.handler(event, None)
+    assert out == {"status": "check-completed", "id": started["id"], "annotations": 112}
+    patches = fake.calls("PATCH", r"/check-runs/\d+$")
+    assert [len(p["body"]["output"]["annotations"]) for p in patches] == [50, 50, 12]
+    assert patches[0]["body"]["conclusion"] == "failure"
+    assert len(fake.calls("POST", "/check-runs$")) == 1
+
+
+def test_complete_without_started_run_creates_completed_check(fake):
+    out = mod.handler({"repo": "o/r", "sha": "abc", "token": "t", "verdict": {"verdict": "green", "confidence": 0.95}}, None)
+    assert out["status"] == "check-completed"
+    assert fake.check_runs[out["id"]]["conclusion"] == "success"
+
+
+def test_annotations_anchor_to_the_module_of_the_address(monkeypatch):
+    monkeypatch.setattr(mod, "TF_ROOT", "infra")
+    dirs = {"module.iam": "modules/iam", "module.iam.module.roles": "modules/roles", "module.vendor": "modules/iam"}
+    wildcards = [
+        {"address": "aws_iam_policy.root", "statement": 0, "reason": "Action:* detected"},
+        {"address": 'module.iam["a"].module.roles.aws_iam_policy.p', "statement": 0, "reason": "Action:* detected"},
+        {"address": "module.iam.module.unknown.aws_iam_policy.q", "statement": 1, "reason": "Action:* detected"},
+    ]
+    event = {
+        "plan": {"Payload": {"summary": {"module_dirs": dirs, "iam": {"wildcard_actions": wildcards}}}},
+        "opa": {"Payload": {"deny": ["Action:* detected"]}},
+    }
+    paths = [a["path"] for a in mod._annotations(event)]
+    assert paths == ["infra/main.tf", "infra/modules/roles/main.tf", "infra/modules/iam/main.tf", "infra/main.tf"]
+    event["annotation_path"] = ".github/workflows/plan.yml"
+    assert mod._annotations(event)[-1]["path"] == ".github/workflows/plan.yml"
@@ -0,0 +1,88 @@
+import pytest
+from lambdas import _github
+from lambdas import github_commenter, github_merge
+from tools.fake_github import FakeGitHub
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    with FakeGitHub() as gh:
+        monkeypatch.setenv("GITHUB_API_URL", gh.url)
+        yield gh
+    _github._CLIENTS.clear()
+
+
+def test_client_reuses_connection_and_conditional_get(fake):
+    cli = _github.client()
+    first = cli.request("GET", "/repos/o/r/installation", "jwt")
+    again = cli.request("GET", "/repos/o/r/installation", "jwt")
+    assert first.data == {"id": 42} and not first.cached
+    assert again.cached and again.status == 304 and again.data == {"id": 42}
+    assert fake.calls("GET")[-1]["headers"].get("if-none-match")
+    cli.post("/repos/o/r/check-runs", "t", {"name": "x", "head_sha": "abc"})
+    assert fake.connections == 1
+    assert cli.connections_opened == 1
+
+
+def test_client_raises_github_error(fake):
+    fake.route("POST", r"/repos/o/r/check-runs", lambda m, b, h: (422, {"message": "Invalid"}, {}))
+    with pytest.raises(_github.GitHubError) as e:
+        _github.client().post("/repos/o/r/check-runs", "t", {})
+    assert e.value.status == 422
+
+
+def test_handlers_use_shared_client(fake):
+    out = github_commenter.handler({"repo": "o/r", "pr_number": 7, "markdown": "hi", "token": "t"}, None)
+    assert out["status"] == "comment-posted"
+    out = github_merge.handler({"repo": "o/r", "pr_number": 7, "token": "t"}, None)
+    assert out["status"] == "merged"
+    assert fake.connections == 1
+    assert [r["method"] for r in fake.requests] == ["POST", "PUT"]
+
+
+class _DeadConn:
+    """A pooled keep-alive connection the server has dropped."""
+    sock = None
+
+    def __init__(self, on_request=None, on_response=None):
+        self.on_request, self.on_response = on_request, on_response
+
+    def request(self, *a, **kw):
+        if self.on_request:
+            raise self.on_request
+
+    def getresponse(self):
+        raise self.on_response
+
+    def close(self):
+        pass
+
+
+def test_stale_connection_resends_only_when_safe(fake):
+    import http.client
+    cli = _github.client()
+    # Reset after the request went out: GitHub may have created the comment already
+    cli._release(_DeadConn(on_response=http.client.RemoteDisconnected("closed")))
+    with pytest.raises(http.client.RemoteDisconnected):
+        cli.post("/repos/o/r/issues/7/comments", "t", {"body": "hi"})
+    assert fake.requests == []
+    # A GET is idempotent; a request that never got written is safe for any method
+    cli._release(_DeadConn(on_response=ConnectionResetError()))
+    assert cli.get("/repos/o/r/installation", "jwt") == {"id": 42}
+    cli._release(_DeadConn(on_request=BrokenPipeError()))
+    cli.post("/repos/o/r/issues/7/comments", "t", {"body": "hi"})
+    assert [r["method"] for r in fake.requests] == ["GET", "POST"]
+
+
+def test_idle_connection_is_replaced_before_a_write(monkeypatch):
+    import time
+    monkeypatch.setattr(_github, "IDLE_CLOSE_S", 0.1)
+    with FakeGitHub(idle_timeout=0.2) as gh:
+        cli = _github.GitHubClient(gh.url)
+        cli.post("/repos/o/r/issues/7/comments", "t", {"body": "one"})
+        # The server has closed the keep-alive socket by now (a frozen container, in production)
+        time.sleep(0.4)
+        cli.post("/repos/o/r/issues/7/comments", "t", {"body": "two"})
+        assert [c["body"] for c in gh.comments.values()] == ["one", "two"]
+        assert gh.connections == 2 and cli._pool and len(cli._pool) == 1
+        cli.close()
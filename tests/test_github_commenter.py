@@ -0,0 +1,68 @@
+import pytest
+from lambdas import _budget, _github, _github_ratelimit as rl
+from lambdas import github_commenter as mod
+from tools.fake_dynamodb import FakeDynamoDB
+from tools.fake_github import FakeGitHub
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setattr(rl, "_SCHEDULER", rl.Scheduler())
+    mod._COMMENT_IDS.clear()
+    with FakeGitHub() as gh:
+        monkeypatch.setenv("GITHUB_API_URL", gh.url)
+        yield gh
+    _github._CLIENTS.clear()
+
+
+def test_merge_body_replaces_named_section():
+    body = mod.merge_body("", "review", "first")
+    body = mod.merge_body(body, "suggest", "approve?")
+    body = mod.merge_body(body, "review", "second")
+    assert body.startswith(mod.MARKER)
+    assert "second" in body and "first" not in body and "approve?" in body
+
+
+def test_upsert_keeps_one_sticky_comment(fake):
+    base = {"repo": "o/r", "pr_number": 5, "token": "t", "upsert": True}
+    first = mod.handler(dict(base, section="suggest", markdown="Suggested approve"), None)
+    second = mod.handler(dict(base, verdict={"Payload": {"markdown": "Verdict: green"}}), None)
+    third = mod.handler(dict(base, verdict={"Payload": {"markdown": "Verdict: green"}}), None)
+    assert first["status"] == "comment-posted"
+    assert second == {"status": "comment-updated", "id": first["id"]}
+    assert third == {"status": "comment-unchanged", "id": first["id"]}
+    assert len(fake.comments) == 1
+    body = fake.comments[first["id"]]["body"]
+    assert "Suggested approve" in body and "Verdict: green" in body
+    assert len(fake.calls("POST")) == 1 and len(fake.calls("PATCH")) == 1
+
+
+def test_upsert_finds_existing_comment_on_cold_container(fake):
+    base = {"repo": "o/r", "pr_number": 6, "token": "t", "upsert": True}
+    first = mod.handler(dict(base, markdown="one"), None)
+    mod._COMMENT_IDS.clear()
+    out = mod.handler(dict(base, markdown="two"), None)
+    assert out == {"status": "comment-updated", "id": first["id"]}
+
+
+def test_upsert_ignores_marker_pasted_by_someone_else(fake):
+    fake.comments[900] = {"id": 900, "issue": 7, "body": f"{mod.MARKER}\nquoting the bot", "user": {"login": "mallory", "type": "User"}}
+    out = mod.handler({"repo": "o/r", "pr_number": 7, "token": "t", "upsert": True, "markdown": "Verdict: red"}, None)
+    assert out["status"] == "comment-posted" and out["id"] != 900
+    assert fake.comments[900]["body"] == f"{mod.MARKER}\nquoting the bot"
+    assert not fake.calls("PATCH")
+
+
+def test_comment_id_is_shared_through_the_runs_table(fake, monkeypatch):
+    ddb = FakeDynamoDB()
+    monkeypatch.setattr(mod, "COMMENT_CACHE_TABLE", "PRRuns")
+    monkeypatch.setattr(_budget.Budget, "client", lambda self, service, cap, session=None: ddb)
+    base = {"repo": "o/r", "pr_number": 8, "token": "t", "upsert": True}
+    first = mod.handler(dict(base, markdown="one"), None)
+    item = ddb.tables["PRRuns"]["CACHE#COMMENT#o/r#8"]
+    assert item["comment_id"] == {"N": str(first["id"])} and "ttl" in item
+    # Another container: the ID comes from the table, no comment listing
+    mod._COMMENT_IDS.clear()
+    out = mod.handler(dict(base, markdown="two"), None)
+    assert out == {"status": "comment-updated", "id": first["id"]}
+    assert len(fake.calls("GET", r"/issues/8/comments")) == 1
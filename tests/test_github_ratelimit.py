@@ -0,0 +1,70 @@
+import hashlib
+import time
+import pytest
+from lambdas import _github, _github_ratelimit as rl
+from lambdas import github_checks, github_commenter
+from tools.fake_dynamodb import FakeDynamoDB
+from tools.fake_github import FakeGitHub
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setattr(rl, "_SCHEDULER", rl.Scheduler())
+    with FakeGitHub() as gh:
+        monkeypatch.setenv("GITHUB_API_URL", gh.url)
+        yield gh
+    _github._CLIENTS.clear()
+
+
+def _limited(remaining, status=201, extra=None):
+    headers = {"X-RateLimit-Remaining": remaining, "X-RateLimit-Limit": 5000, "X-RateLimit-Reset": int(time.time()) + 600}
+    headers.update(extra or {})
+    return lambda m, b, h: (status, {"id": 1}, headers)
+
+
+def test_low_priority_deferred_when_headroom_low(fake):
+    fake.route("POST", r"/repos/o/r/check-runs", _limited(100))
+    _github.client().post("/repos/o/r/check-runs", "t", {})
+    assert rl.scheduler().headroom("tok:" + hashlib.sha256(b"t").hexdigest()[:16]) == 0.02
+    out = github_commenter.handler({"repo": "o/r", "pr_number": 1, "markdown": "x", "token": "t"}, None)
+    assert out["status"] == "deferred" and out["reason"] == "low-headroom"
+    assert not fake.calls("POST", "/comments$")
+    # High-priority calls still go through
+    _github.client().post("/repos/o/r/check-runs", "t", {})
+    assert len(fake.calls("POST", "/check-runs$")) == 2
+
+
+def test_high_priority_retries_after_secondary_limit(fake):
+    state = {"n": 0}
+
+    def flaky(m, b, h):
+        state["n"] += 1
+        if state["n"] == 1:
+            return 429, {"message": "secondary rate limit"}, {"Retry-After": 0}
+        return 201, {"id": 9}, {}
+
+    fake.route("POST", r"/repos/o/r/check-runs", flaky)
+    assert _github.client().post("/repos/o/r/check-runs", "t", {})["id"] == 9
+    assert state["n"] == 2
+
+
+def test_low_priority_throttle_defers_instead_of_retrying(fake):
+    fake.route("POST", r"/repos/o/r/issues/1/comments", lambda m, b, h: (429, {"message": "slow down"}, {"Retry-After": 30}))
+    with pytest.raises(_github.RateLimitDeferred):
+        _github.client().post("/repos/o/r/issues/1/comments", "t", {}, priority=_github.LOW)
+    assert len(fake.calls("POST", "/comments$")) == 1
+
+
+def test_installation_window_survives_token_rotation_and_cold_start(fake, monkeypatch):
+    ddb = FakeDynamoDB()
+    monkeypatch.setattr(rl, "RATE_LIMIT_TABLE", "PRRuns")
+    monkeypatch.setattr(rl, "_SCHEDULER", rl.Scheduler(store=ddb))
+    fake.route("POST", r"/repos/o/r/check-runs", _limited(100))
+    base = {"repo": "o/r", "sha": "abc", "installation_id": 42}
+    assert github_checks.handler(dict(base, token="ghs_first", action="start"), None)["status"] == "check-started"
+    assert ddb.tables["PRRuns"]["CACHE#RATELIMIT#inst:42"]["remaining"] == {"N": "100"}
+    # New container, rotated token: same installation, same (nearly spent) window
+    monkeypatch.setattr(rl, "_SCHEDULER", rl.Scheduler(store=ddb))
+    out = github_commenter.handler(dict(base, token="ghs_second", pr_number=1, markdown="x"), None)
+    assert out["status"] == "deferred" and out["reason"] == "low-headroom"
+    assert not fake.calls("POST", "/comments$")
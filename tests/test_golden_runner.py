@@ -0,0 +1,54 @@
+import json
+from tools import golden_runner
+
+PASSING = {"summary": {"total_resources": 1, "iam": {"wildcard_actions": []}}, "expect": {"opa.allow": True}}
+
+
+def _cases(**named):
+    return {name: json.dumps(case).encode() for name, case in named.items()}
+
+
+def test_seed_cases_pass():
+    report = golden_runner.run(golden_runner.load_cases(), workers=0, cache_dir=None, bundle="b")
+    assert report["passed"], [r for r in report["cases"] if not r["passed"]]
+    assert {r["case"] for r in report["cases"]} >= {"noop_plan", "wildcard_action", "malformed_plan"}
+
+
+def test_expectations():
+    out = {"opa": {"allow": False, "deny": ["Action:* detected"]}, "risk": {"drivers": []}}
+    assert golden_runner.check(out, {"opa.allow": False, "opa.deny": {"contains": "Action:*"},
+                                     "risk.drivers": {"nonempty": False}, "opa.allow.x": {"in": [None]}}) == [
+        'opa.allow.x: expected {"in": [null]}, got <missing>']
+    assert golden_runner.check(out, {"opa.allow": True}) == ["opa.allow: expected true, got false"]
+
+
+def test_cache_skips_unchanged_cases_until_bundle_or_case_changes(tmp_path):
+    cache = str(tmp_path)
+    bad = dict(PASSING, expect={"opa.allow": False})
+    first = golden_runner.run(_cases(a=PASSING, b=bad), cache_dir=cache, bundle="h1")
+    assert (first["ran"], first["passed"]) == (2, False)
+    # Only passing results are recorded, so the failing case runs again
+    second = golden_runner.run(_cases(a=PASSING, b=bad), cache_dir=cache, bundle="h1")
+    assert (second["ran"], second["cached"]) == (1, 1)
+    assert [r["cached"] for r in second["cases"]] == [True, False]
+    assert golden_runner.run(_cases(a=PASSING), cache_dir=cache, bundle="h2")["ran"] == 1
+    edited = dict(PASSING, description="edited")
+    assert golden_runner.run(_cases(a=edited), cache_dir=cache, bundle="h1")["ran"] == 1
+
+
+def test_latency_budget_fails_case(monkeypatch):
+    calls = []
+
+    def slow(case):
+        calls.append(1)
+        return {"opa": {"allow": True}}, {"plan": 0.1, "opa": 80.0}
+    monkeypatch.setattr(golden_runner, "execute", slow)
+    res = golden_runner.run_case("slow", json.dumps(dict(PASSING, budget_ms={"opa": 50})).encode())
+    assert not res["passed"] and res["failures"] == ["opa: 80.0ms over budget 50.0ms"]
+    assert len(calls) == 1 + golden_runner.BUDGET_RETRIES
+
+
+def test_parallel_workers_match_in_process():
+    cases = _cases(**{f"c{i}": PASSING for i in range(4)})
+    report = golden_runner.run(cases, workers=2, cache_dir=None, bundle="b")
+    assert report["passed"] and report["ran"] == 4
@@ -0,0 +1,98 @@
+import json
+import pytest
+from lambdas import _log
+
+
+@pytest.fixture(autouse=True)
+def _defaults(monkeypatch):
+    monkeypatch.setattr(_log, "MIN_LEVEL", _log.LEVELS["INFO"])
+    monkeypatch.setattr(_log, "SAMPLE_RATES", {})
+
+
+def _records(capsys):
+    return [json.loads(l) for l in capsys.readouterr().out.splitlines()]
+
+
+def _lines(capsys):
+    # Log records only; EMF metric records carry "_aws"
+    return [r for r in _records(capsys) if "_aws" not in r]
+
+
+def test_level_filter_skips_lazy_fields(capsys):
+    calls = []
+    _log.log("DEBUG", "detail", None, big=lambda: calls.append(1) or "x")
+    assert calls == [] and _lines(capsys) == []
+    _log.log("INFO", "summary", {"run_id": "r1"}, big=lambda: calls.append(1) or "x")
+    (rec,) = _lines(capsys)
+    assert rec["big"] == "x" and rec["run_id"] == "r1" and calls == [1]
+    assert rec["ts"].endswith("Z") and len(rec["ts"]) == 27
+
+
+def test_sampling_never_drops_errors(capsys):
+    _log.set_sample_rate("tick", 0.0)
+    _log.set_sample_rate("boom", 0.0)
+    _log.log("INFO", "tick")
+    _log.log("ERROR", "boom")
+    assert [r["message"] for r in _lines(capsys)] == ["boom"]
+    _log.set_sample_rate("tick", 0.999999)
+    _log.log("INFO", "tick")
+    assert _lines(capsys)[0]["sample_rate"] == 0.999999
+
+
+def test_buffered_handler_writes_once_at_the_end(capsys, monkeypatch):
+    writes = []
+
+    @_log.buffered
+    def inner(event, context):
+        _log.log("INFO", "inner", event)
+        return "ok"
+
+    @_log.buffered
+    def handler(event, context):
+        _log.log("INFO", "start", event)
+        inner(event, context)
+        assert capsys.readouterr().out == ""
+        _log.log("INFO", "done", event)
+        return "ok"
+
+    real = _log._write
+    monkeypatch.setattr(_log, "_write", lambda recs: (writes.append(len(recs)), real(recs)))
+    assert handler({"run_id": "r"}, None) == "ok"
+    assert writes == [3]
+    assert [r["message"] for r in _lines(capsys)] == ["start", "inner", "done"]
+
+
+def test_errors_flush_immediately_and_on_exception(capsys):
+    @_log.buffered
+    def handler(event, context):
+        _log.log("INFO", "start")
+        _log.log("ERROR", "failed")
+        assert [r["message"] for r in _lines(capsys)] == ["start", "failed"]
+        _log.log("INFO", "cleanup")
+        raise RuntimeError("x")
+
+    with pytest.raises(RuntimeError):
+        handler({}, None)
+    assert [r["message"] for r in _lines(capsys)] == ["cleanup"]
+
+
+def test_metrics_aggregate_into_one_emf_record_per_dimension_set(capsys):
+    @_log.buffered
+    def handler(event, context):
+        _log.stage_metric("ItemsProcessed", 3)
+        _log.stage_metric("CacheHits", 1, Cache="etag")
+        _log.stage_metric("CacheHits", 1, Cache="etag")
+        _log.metric("ReviewTimeMs", 1200, "Milliseconds")
+        _log.metric("ReviewTimeMs", 900, "Milliseconds")
+        assert capsys.readouterr().out == ""
+
+    handler({}, None)
+    emf = [r for r in _records(capsys) if "_aws" in r]
+    by_dims = {tuple(r["_aws"]["CloudWatchMetrics"][0]["Dimensions"][0]): r for r in emf}
+    assert set(by_dims) == {("Stage",), ("Cache", "Stage"), ()}
+    stage = by_dims[("Stage",)]
+    assert stage["Stage"] == "test_log" and stage["ItemsProcessed"] == 3.0 and stage["Duration"] >= 0
+    assert [m["Name"] for m in stage["_aws"]["CloudWatchMetrics"][0]["Metrics"]] == ["ItemsProcessed", "Duration"]
+    assert by_dims[("Cache", "Stage")]["CacheHits"] == [1.0, 1.0]
+    assert by_dims[()]["ReviewTimeMs"] == [1200.0, 900.0]
+    assert by_dims[()]["_aws"]["CloudWatchMetrics"][0]["Namespace"] == "PRReview"
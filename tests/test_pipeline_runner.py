@@ -0,0 +1,43 @@
+import json
+import pytest
+from lambdas import pipeline_runner, tf_plan_parser, opa_gate, iam_lint, impact_map, risk_score
+from tools.fake_s3 import FakeS3
+
+PLAN = {"resource_changes": [
+    {"type": "aws_iam_role", "address": "module.auth.aws_iam_role.main",
+     "change": {"actions": ["create"], "after": {"name": "MyRole", "tags": {"AccountId": "111111111111"}}}},
+    {"type": "aws_iam_policy", "address": "module.auth.aws_iam_policy.p",
+     "change": {"actions": ["update"], "after": {"policy": json.dumps({"Statement": [{"Action": "*", "Effect": "Allow", "Resource": "*"}]})}}},
+]}
+
+
+@pytest.fixture
+def state(monkeypatch):
+    s3 = FakeS3()
+    s3.put_object(Bucket="b", Key="r1/plan.json", Body=json.dumps(PLAN))
+    monkeypatch.setattr(tf_plan_parser, "_s3", lambda budget: s3)
+    return {"run_id": "r1", "repo": "org/a", "bucket": "b", "plan_key": "r1/plan.json",
+            "policy": {"Statement": [{"Action": "iam:PassRole", "Resource": "*"}]}}
+
+
+def test_matches_stage_by_stage_outputs(state):
+    out = pipeline_runner.handler(state, None)
+    # The same chain, one handler call per stage as the state machine would run it
+    s = dict(state)
+    s["plan"] = tf_plan_parser.handler(s, None)
+    s["opa"] = opa_gate.handler(s, None)
+    s["lint"] = iam_lint.handler(s, None)
+    s["impact"] = impact_map.handler({**s, "summary": s["plan"]["summary"]}, None)
+    s["risk"] = risk_score.handler(s, None)
+    for key in ("plan", "opa", "lint", "impact", "risk"):
+        assert out[key] == {"Payload": s[key]}, key
+    assert out["opa"]["Payload"]["allow"] is False
+    assert out["risk"]["Payload"]["drivers"] == ["lint_violations:1", "wildcards:1"]
+    assert out["bucket"] == "b" and set(out["runner"]["stages_ms"]) == {"plan", "opa", "lint", "impact", "risk"}
+
+
+def test_parse_error_flows_through_like_the_state_machine(state):
+    state["plan_key"] = "missing.json"
+    out = pipeline_runner.handler(state, None)
+    assert out["plan"]["Payload"]["error"].startswith("s3-get-failed")
+    assert out["opa"]["Payload"]["allow"] is True and out["impact"]["Payload"]["blast_radius"] == "small"
@@ -0,0 +1,67 @@
+import json
+import pstats
+import pytest
+from lambdas import _profile, opa_gate
+from tools.fake_s3 import FakeS3
+
+
+@pytest.fixture(autouse=True)
+def _local_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(_profile, "ENABLED", False)
+    monkeypatch.setattr(_profile, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+
+@_profile.profiled
+def _work(event, context):
+    buf = [bytearray(1024) for _ in range(event.get("kb", 0))]
+    return len(buf)
+
+
+def test_off_by_default_writes_nothing(tmp_path):
+    assert _work({"run_id": "r1", "kb": 10}, None) == 10
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_fast_invocation_is_not_captured(tmp_path):
+    assert _work({"run_id": "r1", "profile": True}, None) == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_memory_threshold_captures_under_run_id(tmp_path):
+    _work({"run_id": "r-mem", "kb": 2048, "profile": {"mem_mb": 1}}, None)
+    (capture,) = (tmp_path / "r-mem").iterdir()
+    assert capture.name.startswith("test_profile-")
+    meta = json.loads((capture / "meta.json").read_text())
+    assert meta["heavy"] and not meta["slow"] and meta["peak_mb"] >= 1 and meta["run_id"] == "r-mem"
+    assert "test_profile.py" in (capture / "mem.txt").read_text()
+    stats = pstats.Stats(str(capture / "cpu.prof"))
+    assert any(fn[2] == "_work" for fn in stats.stats)
+
+
+def test_env_enabled_slow_capture_to_s3_and_error_kept(monkeypatch):
+    s3 = FakeS3()
+    monkeypatch.setattr(_profile, "PROFILE_DIR", None)
+    monkeypatch.setattr(_profile, "ENABLED", True)
+    monkeypatch.setattr(_profile, "SLOW_MS", 0.0)
+    monkeypatch.setattr(_profile, "PROFILE_BUCKET", "b")
+    monkeypatch.setattr(_profile, "_s3", lambda budget: s3)
+
+    @_profile.profiled
+    def boom(event, context):
+        raise ValueError("x")
+
+    with pytest.raises(ValueError):
+        boom({"run_id": "r-slow"}, None)
+    keys = sorted(s3.objects["b"])
+    assert [k.rsplit("/", 1)[-1] for k in keys] == ["cpu.prof", "cpu.txt", "meta.json"]
+    assert all(k.startswith("profiles/r-slow/test_profile-") for k in keys)
+    meta = json.loads(s3.objects["b"][keys[-1]])
+    assert meta["slow"] and meta["error"] == "ValueError"
+
+
+def test_handler_wrapped_and_capture_failure_is_harmless(monkeypatch):
+    monkeypatch.setattr(_profile, "PROFILE_DIR", None)
+    monkeypatch.setattr(_profile, "PROFILE_BUCKET", None)
+    out = opa_gate.handler({"run_id": "r2", "profile": {"slow_ms": 0}, "summary": {}}, None)
+    assert out["allow"] is True
@@ -0,0 +1,72 @@
+import threading
+import time
+import pytest
+from lambdas import _github, _github_ratelimit as rl
+from lambdas import publisher as mod
+from tools.fake_github import FakeGitHub
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setattr(rl, "_SCHEDULER", rl.Scheduler())
+    monkeypatch.setattr(mod.github_checks, "_emit_metrics", lambda *a, **k: None)
+    with FakeGitHub() as gh:
+        monkeypatch.setenv("GITHUB_API_URL", gh.url)
+        yield gh
+    _github._CLIENTS.clear()
+
+
+EVENT = {
+    "repo": "o/r",
+    "sha": "abc",
+    "pr_number": 3,
+    "token": "t",
+    "verdict": {"Payload": {"verdict": "green", "confidence": 0.95, "markdown": "ok"}},
+}
+
+
+def test_publish_fans_out_and_reports_each_sink(fake):
+    out = mod.handler(dict(EVENT, sinks=["check", "comment", "teams", "sns", "audit"]), None)
+    s = out["sinks"]
+    assert s["check"]["status"] == "ok" and s["comment"]["status"] == "ok"
+    # Unconfigured sinks are skipped, not failures
+    assert s["teams"]["status"] == "skipped" and s["sns"]["status"] == "skipped" and s["audit"]["status"] == "skipped"
+    assert out["published"] is True
+    assert len(fake.check_runs) == 1 and len(fake.comments) == 1
+
+
+def test_slow_sink_times_out_without_delaying_others(fake, monkeypatch):
+    def slow(event, budget):
+        time.sleep(1.0)
+        return {"teams": "sent"}
+
+    monkeypatch.setitem(mod.SINKS, "teams", slow)
+    monkeypatch.setitem(mod.SINK_TIMEOUTS_S, "teams", 0.1)
+    t0 = time.monotonic()
+    out = mod.handler(dict(EVENT, sinks=["check", "teams"]), None)
+    assert out["sinks"]["teams"]["status"] == "timeout"
+    assert out["sinks"]["check"]["status"] == "ok"
+    assert out["published"] is False
+    assert time.monotonic() - t0 < 0.9
+
+
+def test_hanging_sink_does_not_hold_back_the_flush(fake, monkeypatch, capsys):
+    from lambdas import _log
+    release = threading.Event()
+
+    @_log.buffered
+    def hang(event, budget):
+        _log.log("INFO", "hanging sink start", event)
+        release.wait(5)
+        return {"teams": "sent"}
+
+    monkeypatch.setitem(mod.SINKS, "teams", hang)
+    monkeypatch.setitem(mod.SINK_TIMEOUTS_S, "teams", 0.2)
+    try:
+        out = mod.handler(dict(EVENT, sinks=["teams"]), None)
+        assert out["sinks"]["teams"]["status"] == "timeout"
+        assert _log._depth.get() == 0 and not _log._metrics
+        written = capsys.readouterr().out
+        assert "publisher done" in written and '"SinkFailures":1.0' in written
+    finally:
+        release.set()
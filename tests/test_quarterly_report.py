@@ -0,0 +1,255 @@
+import json
+import re
+import pytest
+from botocore.exceptions import ClientError
+from lambdas import quarterly_report as mod
+from lambdas import runs_rollup
+from lambdas._budget import Budget
+from lambdas._sketch import DDSketch
+from tools.fake_dynamodb import FakeDynamoDB
+
+
+def _run(i, created_at, verdict="green"):
+    return {
+        "run_id": {"S": f"r{i}"},
+        "created_at": {"S": created_at},
+        "created_month": {"S": created_at[:7]},
+        "verdict": {"S": verdict},
+    }
+
+
+class _Pages:
+    def __init__(self, ddb, op):
+        self.ddb, self.op = ddb, op
+
+    def paginate(self, **kw):
+        self.ddb.calls.append((self.op, kw))
+        if self.op == "query":
+            if not self.ddb.indexed:
+                raise ClientError({"Error": {"Code": "ValidationException", "Message": "no index"}}, "Query")
+            month = kw["ExpressionAttributeValues"][":m"]["S"]
+            rows = [it for it in self.ddb.items if it["created_month"]["S"] == month]
+        else:
+            s, e = kw["ExpressionAttributeValues"][":s"]["S"], kw["ExpressionAttributeValues"][":e"]["S"]
+            seg = [it for n, it in enumerate(self.ddb.items) if n % kw["TotalSegments"] == kw["Segment"]]
+            rows = [it for it in seg if s <= it["created_at"]["S"] <= e]
+        # Two pages per call to exercise pagination
+        yield {"Items": rows[: len(rows) // 2]}
+        yield {"Items": rows[len(rows) // 2:]}
+
+
+class _FakeDDB:
+    def __init__(self, items, indexed=True):
+        self.items, self.indexed, self.calls = items, indexed, []
+
+    def get_paginator(self, op):
+        return _Pages(self, op)
+
+
+class _FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[Key] = Body
+
+
+ITEMS = [
+    _run(1, "2026-06-30T23:59:59.000000Z"),
+    _run(2, "2026-07-01T00:00:00.000000Z"),
+    _run(3, "2026-08-15T10:00:00.000000Z", "red"),
+    _run(4, "2026-09-30T23:59:59.999999Z", "amber"),
+    _run(5, "2026-10-01T00:00:00.000000Z"),
+]
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    s3 = _FakeS3()
+    monkeypatch.setattr(mod, "S3", s3)
+    return s3
+
+
+def test_quarter_range_wraps_year():
+    assert mod._quarter_range(2026, 4) == (["2026-10", "2026-11", "2026-12"], "2026-10-01T00:00:00", "2027-01-01T00:00:00")
+    assert mod._previous_quarter(mod.dt(2027, 1, 1).date()) == (2026, 4)
+
+
+def test_queries_one_bucket_per_month():
+    ddb = _FakeDDB(ITEMS)
+    items, degraded, access = mod.read_runs("PRRuns", 2026, 3, Budget(), ddb=ddb)
+    assert access == "query" and not degraded
+    assert sorted(it["run_id"]["S"] for it in items) == ["r2", "r3", "r4"]
+    assert sorted(kw["ExpressionAttributeValues"][":m"]["S"] for op, kw in ddb.calls) == ["2026-07", "2026-08", "2026-09"]
+
+
+def test_falls_back_to_segmented_scan_without_index():
+    ddb = _FakeDDB(ITEMS, indexed=False)
+    items, degraded, access = mod.read_runs("PRRuns", 2026, 3, Budget(), ddb=ddb)
+    assert access == "scan"
+    assert sorted(it["run_id"]["S"] for it in items) == ["r2", "r3", "r4"]
+    assert sorted(kw["Segment"] for op, kw in ddb.calls if op == "scan") == list(range(mod.SCAN_SEGMENTS))
+
+
+def _text_report(body):
+    # Text fallback when ReportLab is not installed; the PDF path is not inspected
+    return body.decode() if body.startswith(b"PR Review") else None
+
+
+def test_handler_falls_back_to_runs_without_rollups(monkeypatch, s3):
+    monkeypatch.setattr(mod, "REPORT_RENDER", "reportlab")
+    monkeypatch.setattr(mod, "_ddb", lambda budget: _FakeDDB(ITEMS))
+    monkeypatch.setattr(mod, "read_rollups", lambda *a, **k: [])
+    out = mod.handler({"bucket": "b", "year": 2026, "quarter": 3}, None)
+    assert out == {"status": "ok", "report_key": "reports/2026-Q3.pdf"}
+    text = _text_report(s3.objects["reports/2026-Q3.pdf"])
+    if text:
+        assert "Total runs: 3" in text and "Green/Amber/Red: 1/1/1" in text
+
+
+def test_handler_reads_daily_rollups(monkeypatch, s3):
+    ddb = FakeDynamoDB()
+    for it in ITEMS:
+        ddb.put_item(TableName="PRRuns", Item=dict(it, confidence={"N": "0.9"}, review_ms={"N": "42000"}, violations={"SS": ["iam.wildcard-action"]}))
+    runs_rollup.process(ddb.drain_stream(), ddb, "PRRuns")
+    monkeypatch.setattr(mod, "REPORT_RENDER", "reportlab")
+    monkeypatch.setattr(mod, "_ddb", lambda budget: ddb)
+    ddb.calls.clear()
+    mod.handler({"bucket": "b", "table": "PRRuns", "year": 2026, "quarter": 3}, None)
+    # ~92 day keys in a single BatchGet; days without an item are checked against raw runs
+    # with one range Query per gap (07-02..07-31, 08-01..08-14, 08-16..08-31, 09-01..09-29),
+    # so rolled-up days are not read twice, then the quarter aggregate is saved
+    assert ddb.calls == ["batch_get_item"] + ["query"] * 4 + ["put_item"]
+    quarter = ddb.tables["PRRuns"]["ROLLUP#QUARTER#2026-Q3"]
+    assert DDSketch.from_bytes(quarter["review_sketch"]["B"]).count == 3
+    assert json.loads(quarter["top_violations"]["S"])["i"] == [["iam.wildcard-action", 3, 0]]
+    text = _text_report(s3.objects["reports/2026-Q3.pdf"])
+    if text:
+        assert "Total runs: 3" in text and "Average confidence: 0.9" in text
+        assert "iam.wildcard-action (3)" in text
+        # Every run took 42s; the sketch answers within 1%
+        p50 = int(re.search(r"Median ms: (\d+)", text).group(1))
+        assert abs(p50 - 42000) <= 420
+
+
+def test_days_missing_from_rollups_are_counted_from_raw_runs(monkeypatch, s3):
+    ddb = FakeDynamoDB()
+    for it in ITEMS:
+        ddb.put_item(TableName="PRRuns", Item=it)
+    runs_rollup.process(ddb.drain_stream(), ddb, "PRRuns")
+    # Written while the stream consumer was down: no rollup for 2026-08-20
+    ddb.put_item(TableName="PRRuns", Item=_run(6, "2026-08-20T09:00:00.000000Z", "red"))
+    ddb.put_item(TableName="PRRuns", Item=_run(7, "2026-08-20T11:00:00.000000Z"))
+    ddb.drain_stream()
+    monkeypatch.setattr(mod, "REPORT_RENDER", "reportlab")
+    monkeypatch.setattr(mod, "_ddb", lambda budget: ddb)
+    out = mod.handler({"bucket": "b", "table": "PRRuns", "year": 2026, "quarter": 3}, None)
+    assert out["backfilled_days"] == ["2026-08-20"]
+    assert ddb.tables["PRRuns"]["ROLLUP#QUARTER#2026-Q3"]["runs"] == {"N": "5"}
+    text = _text_report(s3.objects["reports/2026-Q3.pdf"])
+    if text:
+        assert "Total runs: 5" in text and "Green/Amber/Red: 2/1/2" in text
+        assert "no rollup): 2026-08-20" in text
+
+
+def test_backfill_reads_only_the_gap_days():
+    ddb = FakeDynamoDB()
+    for i, created in enumerate(["2026-08-14T12:00:00.000000Z", "2026-08-15T10:00:00.000000Z", "2026-08-16T08:00:00.000000Z"]):
+        ddb.put_item(TableName="PRRuns", Item=_run(i, created))
+    queries, paginator = [], ddb.get_paginator
+
+    def spy(op):
+        pages = paginator(op)
+        inner = pages.paginate
+        pages.paginate = lambda **kw: queries.append(kw["ExpressionAttributeValues"]) or inner(**kw)
+        return pages
+    ddb.get_paginator = spy
+    totals, found, degraded = mod.backfill("PRRuns", 2026, 3, ["2026-08-13", "2026-08-14", "2026-08-16"], Budget(), ddb=ddb)
+    assert (totals["runs"], found, degraded) == (2, ["2026-08-14", "2026-08-16"], False)
+    assert [(v[":a"]["S"], v[":b"]["S"]) for v in queries] == [
+        ("2026-08-13T00:00:00", "2026-08-14T23:59:59.999999Z"),
+        ("2026-08-16T00:00:00", "2026-08-16T23:59:59.999999Z"),
+    ]
+
+
+def test_missing_days_stop_at_today():
+    rollups = [{"run_id": {"S": "ROLLUP#DAY#2026-10-01"}}]
+    assert mod.missing_days(rollups, 2026, 4, "2026-10-03") == ["2026-10-02", "2026-10-03"]
+
+
+def _pdf_objects(pdf):
+    # Every xref entry must point at "<n> 0 obj"
+    start = int(re.search(rb"startxref\n(\d+)", pdf).group(1))
+    rows = re.findall(rb"(\d{10}) 00000 n ", pdf[start:])
+    return [int(re.match(rb"(\d+) 0 obj", pdf[int(off):]).group(1)) for off in rows]
+
+
+def _check_pdf_structure(pdf):
+    """What a reader needs to open the file: startxref -> xref table -> objects -> trailer -> page tree."""
+    assert pdf.startswith(b"%PDF-1.4") and pdf.endswith(b"%%EOF\n")
+    start = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", pdf).group(1))
+    assert pdf[start:].startswith(b"xref\n")
+    first, size = map(int, re.match(rb"xref\n(\d+) (\d+)\n", pdf[start:]).groups())
+    assert first == 0
+    table = pdf[start:].split(b"\n", 2)[2]
+    rows = [table[i * 20:(i + 1) * 20] for i in range(size)]
+    assert rows[0] == b"0000000000 65535 f \n"
+    for num, row in enumerate(rows[1:], start=1):
+        off, gen, kind = re.match(rb"(\d{10}) (\d{5}) ([nf]) \n", row).groups()
+        if kind == b"n":
+            assert pdf[int(off):].startswith(b"%d 0 obj\n" % num), num
+    trailer = re.search(rb"trailer\n<< /Size (\d+) /Root (\d+) 0 R >>", table[size * 20:])
+    assert int(trailer.group(1)) == size
+    objs = dict((int(n), body) for n, body in re.findall(rb"(\d+) 0 obj\n(.*?)\nendobj", pdf, re.S))
+    assert len(objs) == size - 1
+    pages = int(re.search(rb"/Type /Catalog /Pages (\d+) 0 R", objs[int(trailer.group(2))]).group(1))
+    kids, count = re.search(rb"/Type /Pages /Kids \[([^\]]*)\] /Count (\d+)", objs[pages]).groups()
+    kids = [int(k) for k in re.findall(rb"(\d+) 0 R", kids)]
+    assert len(kids) == int(count) > 0
+    for k in kids:
+        assert objs[k].startswith(b"<< /Type /Page /Parent %d 0 R" % pages)
+
+
+def test_stream_render_writes_pages_as_sections_are_generated(s3):
+    class _Out:
+        def __init__(self):
+            self.chunks, self.bytes_written = [], 0
+
+        def write(self, data):
+            self.chunks.append(data)
+            self.bytes_written += len(data)
+
+    top = [(f"other.rule-{i}", 1000 - i) for i in range(500)]
+    out = _Out()
+    written_before_end = []
+    sections = mod._sections("PR Review Quarterly Report 2026 Q3", {"total": 9, "top_violations": top})
+
+    def watched():
+        for sec in sections:
+            yield sec
+        written_before_end.append(out.bytes_written)
+
+    mod._render_stream(watched(), out)
+    pdf = b"".join(out.chunks)
+    assert pdf.startswith(b"%PDF-1.4") and pdf.endswith(b"%%EOF\n")
+    # ~45 rows per page: pages went out while sections were still being produced
+    assert written_before_end[0] > len(pdf) // 2
+    assert int(re.search(rb"/Type /Pages /Kids \[[^\]]*\] /Count (\d+)", pdf).group(1)) > 10
+    assert _pdf_objects(pdf) == list(range(1, len(_pdf_objects(pdf)) + 1))
+    _check_pdf_structure(pdf)
+
+
+def test_handler_stream_render_uploads_through_writer(monkeypatch, s3):
+    monkeypatch.setattr(mod, "_ddb", lambda budget: _FakeDDB(ITEMS))
+    monkeypatch.setattr(mod, "read_rollups", lambda *a, **k: [])
+    mod.handler({"bucket": "b", "year": 2026, "quarter": 3, "render": "stream"}, None)
+    assert s3.objects["reports/2026-Q3.pdf"].startswith(b"%PDF-1.4")
+
+
+def test_handler_streams_by_default(monkeypatch, s3):
+    monkeypatch.setattr(mod, "_ddb", lambda budget: _FakeDDB(ITEMS))
+    monkeypatch.setattr(mod, "read_rollups", lambda *a, **k: [])
+    out = mod.handler({"bucket": "b", "year": 2026, "quarter": 3}, None)
+    assert out["status"] == "ok"
+    _check_pdf_structure(s3.objects["reports/2026-Q3.pdf"])
+
@@ -11,3 +11,14 @@ def test_risk_score_aggregation():
     assert out["risk"] in ("amber", "red")
     assert out["confidence"] <= 0.7
     assert any("wildcards" in d for d in out["drivers"]) 
+
+
+def test_reads_stage_results_as_lambda_invoke_stores_them():
+    bare = {
+        "lint": {"violations": ["a"]},
+        "plan": {"summary": {"iam": {"wildcard_actions": [{}]}}},
+        "drift": {"drift": "suspect"},
+        "impact": {"blast_radius": "medium"}
+    }
+    wrapped = {k: {"Payload": v} for k, v in bare.items()}
+    assert mod.handler(wrapped, None) == mod.handler(bare, None)
@@ -0,0 +1,91 @@
+from lambdas import _rollup, runs_rollup as mod
+from tools.fake_dynamodb import FakeDynamoDB
+
+
+def _run(i, day, verdict, conf, violations=()):
+    it = {
+        "run_id": {"S": f"r{i}"},
+        "created_at": {"S": f"{day}T12:00:00.000000Z"},
+        "created_month": {"S": day[:7]},
+        "verdict": {"S": verdict},
+        "confidence": {"N": str(conf)},
+        "tokens_estimated": {"N": "100"},
+    }
+    if violations:
+        it["violations"] = {"SS": list(violations)}
+    return it
+
+
+def _rollups(ddb):
+    return {k[len(_rollup.DAY_PREFIX):]: _rollup.counters(v) for k, v in ddb.tables["PRRuns"].items() if k.startswith(_rollup.DAY_PREFIX)}
+
+
+def test_stream_replay_builds_daily_rollups():
+    ddb = FakeDynamoDB()
+    ddb.put_item(TableName="PRRuns", Item=_run(1, "2026-07-01", "green", 0.9, ["iam.wildcard-action"]))
+    ddb.put_item(TableName="PRRuns", Item=_run(2, "2026-07-01", "red", 0.5, ["iam.wildcard-action", "other.b"]))
+    ddb.put_item(TableName="PRRuns", Item=_run(3, "2026-07-02", "amber", 0.7))
+    out = mod.process(ddb.drain_stream(), ddb, "PRRuns")
+    assert out["counted"] == 3 and not out["batchItemFailures"]
+    r = _rollups(ddb)
+    assert r["2026-07-01"] == {"runs": 2, "v_green": 1, "v_red": 1, "conf_sum": 1.4, "conf_n": 2, "tokens": 200, "viol:iam.wildcard-action": 2, "viol:other": 1}
+    assert r["2026-07-02"]["v_amber"] == 1
+
+
+def test_redelivered_and_derived_records_are_not_double_counted():
+    ddb = FakeDynamoDB()
+    ddb.put_item(TableName="PRRuns", Item=_run(1, "2026-07-01", "green", 0.9))
+    records = ddb.drain_stream()
+    mod.process(records, ddb, "PRRuns")
+    # The rollup/marker writes themselves land on the stream; replay them and the original again
+    out = mod.process(ddb.drain_stream() + records, ddb, "PRRuns")
+    assert out["counted"] == 0 and out["duplicate"] == 1
+    assert _rollups(ddb)["2026-07-01"]["runs"] == 1
+
+
+def test_failure_reports_first_failed_record():
+    class Broken(FakeDynamoDB):
+        def transact_write_items(self, **kw):
+            raise RuntimeError("throttled")
+
+    ddb = Broken()
+    recs = mod.records_for([_run(1, "2026-07-01", "green", 0.9), _run(2, "2026-07-01", "green", 0.9)])
+    out = mod.process(recs, ddb, "PRRuns")
+    assert out["batchItemFailures"] == [{"itemIdentifier": "0"}]
+
+
+def test_review_time_percentiles_merge_across_days():
+    ddb = FakeDynamoDB()
+    times = list(range(1000, 61000, 1000))
+    for i, ms in enumerate(times):
+        it = _run(i, f"2026-07-{1 + i % 3:02d}", "green", 0.9)
+        it["review_ms"] = {"N": str(ms)}
+        ddb.put_item(TableName="PRRuns", Item=it)
+    mod.process(ddb.drain_stream(), ddb, "PRRuns")
+    days = _rollups(ddb)
+    assert len(days) == 3
+    totals = _rollup.summarize(days.values())
+    sketch = _rollup.review_sketch(totals)
+    assert sketch.count == len(times)
+    assert abs(sketch.quantile(0.5) - 30000) <= 0.011 * 30000 + 1000
+
+
+def test_opa_blocked_run_is_recorded_with_its_deny_ids(monkeypatch):
+    from lambdas import _budget, publisher
+    ddb = FakeDynamoDB()
+    monkeypatch.setattr(publisher, "TABLE_NAME", "PRRuns")
+    monkeypatch.setattr(_budget.Budget, "client", lambda self, service, cap, session=None: ddb)
+    # State as OPAVerdictBlock leaves it: the agent never ran
+    state = {"run_id": "r9", "repo": "o/r", "sha": "abc",
+             "opa": {"Payload": {"allow": False, "deny": ["Action:* detected in policy arn:aws:iam::1:policy/p"]}},
+             "verdict": {"verdict": "red", "confidence": 0.9, "drivers": ["Action:* detected"]}}
+    out = publisher.handler(dict(state, sinks=["audit"]), None)
+    assert out["sinks"]["audit"]["status"] == "ok"
+    mod.process(ddb.drain_stream(), ddb, "PRRuns")
+    (day, r), = _rollups(ddb).items()
+    assert r["runs"] == 1 and r["v_red"] == 1 and r["viol:iam.wildcard-action"] == 1
+
+
+def test_unknown_violation_ids_share_one_counter():
+    d = _rollup.delta(_run(1, "2026-07-01", "red", 0.5, [f"other.noise-{i}" for i in range(500)] + ["tags.missing-required"]))
+    assert {k: v for k, v in d.items() if k.startswith("viol:")} == {"viol:other": 1, "viol:tags.missing-required": 1}
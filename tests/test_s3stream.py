@@ -0,0 +1,35 @@
+import pytest
+from lambdas._s3stream import MIN_PART_SIZE, MultipartWriter
+from tools.fake_s3 import FakeS3
+
+
+def test_small_object_is_a_single_put():
+    s3 = FakeS3()
+    with MultipartWriter(s3, "b", "k", ContentType="text/plain") as out:
+        out.write(b"hello ")
+        out.write(b"world")
+    assert s3.objects["b"]["k"] == b"hello world"
+    assert s3.calls == ["put_object"]
+
+
+def test_large_object_streams_parts_with_bounded_buffer():
+    s3 = FakeS3()
+    chunk = bytes(range(256)) * 256  # 64 KiB
+    with MultipartWriter(s3, "b", "k", part_size=MIN_PART_SIZE) as out:
+        for _ in range(192):  # 12 MiB
+            out.write(chunk)
+        # Two parts are already uploaded before close
+        assert s3.calls.count("upload_part") == 2
+    assert s3.part_sizes["k"] == [MIN_PART_SIZE, MIN_PART_SIZE, 2 * 1024 * 1024]
+    assert s3.objects["b"]["k"] == chunk * 192
+    assert out.peak_buffer < MIN_PART_SIZE + len(chunk)
+
+
+def test_error_aborts_the_upload():
+    s3 = FakeS3()
+    with pytest.raises(RuntimeError):
+        with MultipartWriter(s3, "b", "k", part_size=MIN_PART_SIZE) as out:
+            out.write(b"x" * (MIN_PART_SIZE + 1))
+            raise RuntimeError("render failed")
+    assert s3.calls[-1] == "abort_multipart_upload"
+    assert not s3.uploads and "k" not in s3.objects.get("b", {})
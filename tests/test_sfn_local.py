@@ -0,0 +1,149 @@
+import pytest
+from lambdas import _config_cache, opa_gate
+from tools import sfn_local
+from tools.sfn_local import Emulator, LocalAWS, definition, synthetic_plan
+
+GREEN = {"verdict": "green", "confidence": 0.95, "drivers": [], "markdown": "ok"}
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    a = LocalAWS(drift_rate=0.0)
+    for obj, name, value in a.patches():
+        monkeypatch.setattr(obj, name, value)
+    for k, v in a.env().items():
+        monkeypatch.setenv(k, v)
+    a.stub.verdict = lambda: dict(GREEN)
+    _config_cache.invalidate()
+    yield a
+    a.close()
+    _config_cache.invalidate()
+
+
+def _plan(wildcard=False):
+    plan = synthetic_plan(0, resources=12, seed=3)
+    for c in plan["resource_changes"]:
+        for side in ("before", "after"):
+            if (c["change"].get(side) or {}).get("policy"):
+                c["change"][side]["policy"] = '{"Statement": [{"Effect": "Allow", "Action": "s3:GetObject", "Resource": "*"}]}'
+    if wildcard:
+        plan["resource_changes"].append({"type": "aws_iam_policy", "address": "aws_iam_policy.w", "change": {
+            "actions": ["create"], "after": {"policy": '{"Statement": [{"Effect": "Allow", "Action": "*", "Resource": "*"}]}'}}})
+    return plan
+
+
+@pytest.mark.parametrize("runner", ["false", "true"])
+def test_full_review_reaches_publish(aws, runner):
+    res = Emulator(definition({"UsePipelineRunner": runner})).run(aws.execution_input(1, _plan()))
+    assert res["status"] == "SUCCEEDED", res
+    states = [n for n, _ in res["states"]]
+    if runner == "false":
+        assert states.index("StaticGate") < states.index("ImpactMap") < states.index("RiskScore")
+    else:
+        assert "DeterministicGates" in states and "ImpactMap" not in states
+    out = res["output"]
+    assert out["impact"]["Payload"]["blast_radius"] in ("small", "medium", "large")
+    assert out["verdict"]["Payload"]["verdict"] == "green"
+    assert states[-2:] == ["SuggestApprove", "Publish"]
+    assert out["publish"]["Payload"]["published"] is True
+    assert aws.github.check_runs and aws.stub.published
+
+
+def test_wildcard_plan_blocked_by_opa(aws):
+    res = Emulator(definition()).run(aws.execution_input(2, _plan(wildcard=True)))
+    assert res["status"] == "SUCCEEDED"
+    assert "OPAVerdictBlock" in [n for n, _ in res["states"]]
+    assert res["output"]["verdict"]["verdict"] == "red"
+
+
+def test_opa_timeout_fails_closed(aws, monkeypatch):
+    monkeypatch.setattr(opa_gate, "_opa_cli_available", lambda: True)
+    monkeypatch.setattr(opa_gate, "_opa_eval", lambda *a, **k: {"deny": [], "warn": ["opa_eval_timeout"], "timed_out": True})
+    res = Emulator(definition()).run(aws.execution_input(5, _plan()))
+    assert res["status"] == "SUCCEEDED", res
+    assert "OPAVerdictBlock" in [n for n, _ in res["states"]]
+    assert res["output"]["verdict"]["verdict"] == "red"
+    assert res["output"]["verdict"]["drivers"] == [opa_gate.TIMEOUT_DENY]
+
+
+def _state(sm, name):
+    for n, st in sm["States"].items():
+        if n == name:
+            return st
+        for inner in [st.get("Iterator") or st.get("ItemProcessor")] + (st.get("Branches") or []):
+            found = inner and _state(inner, name)
+            if found:
+                return found
+    return None
+
+
+@pytest.mark.parametrize("stage", ["opa", "verdict"])
+def test_degraded_results_never_reach_approval(stage):
+    decide = _state(definition(), "ApprovalDecide")
+    data = {
+        "opa": {"Payload": {"allow": True, "deny": []}},
+        "verdict": {"Payload": {"verdict": "green", "confidence": 0.95}},
+        "drift": {"Payload": {"drift": "none"}},
+        "config": {"Payload": {"mode": "auto_approve"}},
+    }
+    assert any(sfn_local.choice_matches(c, data, {}) for c in decide["Choices"])
+    data[stage]["Payload"]["degraded"] = True
+    assert not any(sfn_local.choice_matches(c, data, {}) for c in decide["Choices"])
+
+
+def test_agent_failure_uses_static_verdict(aws):
+    def boom():
+        raise RuntimeError("throttled")
+    aws.stub.verdict = boom
+    res = Emulator(definition()).run(aws.execution_input(3, _plan()))
+    assert res["status"] == "SUCCEEDED", res
+    states = [n for n, _ in res["states"]]
+    assert states.count("AgentReview") == 1 and "StaticVerdictFallback" in states
+    assert res["output"]["verdict"]["Payload"]["verdict"] == res["output"]["risk"]["Payload"]["risk"]
+
+
+def test_unapproved_bundle_notifies_teams(aws, monkeypatch):
+    monkeypatch.setattr(_config_cache, "BUNDLE_HASH", "unknown")
+    res = Emulator(definition()).run(aws.execution_input(4, _plan()))
+    assert res["status"] == "SUCCEEDED"
+    assert [n for n, _ in res["states"]][-3:] == ["BundleBlock", "BundleBlockChecks", "NotifyTeams"]
+    assert aws.github.calls("POST", r"/teams-webhook")
+
+
+def test_choice_on_missing_path_fails_execution():
+    sm = {"StartAt": "C", "States": {
+        "C": {"Type": "Choice", "Choices": [{"Variable": "$.opa.Payload.allow", "BooleanEquals": False, "Next": "Done"}],
+              "Default": "Done"},
+        "Done": {"Type": "Succeed"}}}
+    res = Emulator(sm).run({"opa": {"allow": False}})
+    assert res["status"] == "FAILED" and res["error"] == "States.Runtime" and res["state"] == "C"
+
+
+def test_retry_then_catch():
+    calls = []
+    sm = {"StartAt": "T", "States": {
+        "T": {"Type": "Task", "Resource": "local:x", "ResultPath": "$.r",
+              "Retry": [{"ErrorEquals": ["States.TaskFailed"], "MaxAttempts": 2}],
+              "Catch": [{"ErrorEquals": ["States.ALL"], "ResultPath": "$.err", "Next": "F"}], "End": True},
+        "F": {"Type": "Pass", "Parameters": {"e.$": "$.err.Error", "m.$": "States.Format('{}!', $.err.Cause)"}, "End": True}}}
+    emu = Emulator(sm)
+    emu.invoke = lambda module, payload: calls.append(module) or (_ for _ in ()).throw(ValueError("nope"))
+    res = emu.run({})
+    assert len(calls) == 3
+    assert res["status"] == "SUCCEEDED" and res["output"] == {"e": "ValueError", "m": "nope!"}
+
+
+def test_state_size_limit():
+    sm = {"StartAt": "P", "States": {"P": {"Type": "Pass", "Result": "x" * (sfn_local.STATE_LIMIT_BYTES + 1), "End": True}}}
+    res = Emulator(sm).run({})
+    assert res["error"] == "States.DataLimitExceeded"
+
+
+def test_benchmark_report():
+    rep = sfn_local.report([
+        {"status": "SUCCEEDED", "states": [("A", 1.0), ("B", 3.0)], "ms": 4.0},
+        {"status": "FAILED", "error": "States.Runtime", "state": "B", "states": [("A", 2.0), ("B", 1.0)], "ms": 3.0},
+    ], wall_s=0.5)
+    assert rep["throughput_per_s"] == 4.0 and rep["failed"] == 1
+    assert rep["errors"] == ["B: States.Runtime"]
+    assert rep["states"]["A"] == {"count": 2, "p50_ms": 1.0, "p95_ms": 2.0, "total_ms": 3.0}
@@ -0,0 +1,73 @@
+import random
+from lambdas._sketch import DDSketch, SpaceSaving, sketch_of
+
+
+def _exact(values, q):
+    s = sorted(values)
+    return s[int(q * (len(s) - 1))]
+
+
+def test_quantiles_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(10, 1.2) for _ in range(20000)]
+    s = sketch_of(values)
+    for q in (0.5, 0.9, 0.99):
+        assert abs(s.quantile(q) - _exact(values, q)) <= 0.011 * _exact(values, q)
+
+
+def test_merge_equals_sketch_of_union():
+    rng = random.Random(1)
+    a = [rng.uniform(50, 90000) for _ in range(3000)]
+    b = [rng.uniform(50, 90000) for _ in range(5000)]
+    merged = sketch_of(a).merge(sketch_of(b))
+    assert merged.bins == sketch_of(a + b).bins and merged.count == 8000
+
+
+def test_counters_and_bytes_round_trip():
+    s = sketch_of([0, 0.4, 1, 250, 250, 12000, 600000])
+    c = s.to_counters("rt:")
+    assert c["rt:z"] == 1 and sum(c.values()) == 7
+    back = DDSketch.from_counters(c, "rt:")
+    assert back.bins == s.bins and back.zero == 1
+    raw = s.to_bytes()
+    assert len(raw) < 40
+    again = DDSketch.from_bytes(raw)
+    assert again.bins == s.bins and again.quantile(0.5) == back.quantile(0.5)
+
+
+def test_bucket_count_is_bounded():
+    s = DDSketch(max_buckets=64)
+    for i in range(1, 100000, 7):
+        s.add(float(i))
+    assert len(s.bins) <= 64 and s.count == len(range(1, 100000, 7))
+    # The top of the distribution keeps its accuracy
+    assert abs(s.quantile(0.99) - 98999) < 0.011 * 98999
+
+
+def test_space_saving_finds_heavy_hitters_in_fixed_memory():
+    rng = random.Random(3)
+    exact = {}
+    ss = SpaceSaving(capacity=32)
+    for _ in range(50000):
+        # Zipf-ish: a few rules dominate, a long tail of one-off IDs
+        r = rng.random()
+        item = f"rule-{int(1 / max(r, 1e-4)) % 5000}"
+        exact[item] = exact.get(item, 0) + 1
+        ss.add(item)
+    assert len(ss.counts) == 32 and ss.total == 50000
+    true_top = sorted(exact, key=lambda k: -exact[k])[:5]
+    top = ss.top(5)
+    assert [t[0] for t in top] == true_top
+    for item, count, err in top:
+        assert count - err <= exact[item] <= count
+
+
+def test_space_saving_merge_and_round_trip():
+    a, b = SpaceSaving(4), SpaceSaving(4)
+    for x in "aaaabbbcc":
+        a.add(x)
+    for x in "aaddddde":
+        b.add(x)
+    m = SpaceSaving.from_dict(a.to_dict()).merge(b)
+    assert m.total == 17
+    assert [t[0] for t in m.top(2)] == ["a", "d"]
@@ -0,0 +1,48 @@
+import json
+from benchmarks import bench_stages
+from lambdas.tf_plan_parser import summary_from_plan
+from tools.synth_plan import generate, policy_document
+
+IAM = {"aws_iam_role", "aws_iam_policy", "aws_iam_role_policy", "aws_iam_role_policy_attachment"}
+
+
+def test_deterministic_per_seed():
+    a = json.dumps(generate(500, seed=7))
+    assert a == json.dumps(generate(500, seed=7))
+    assert a != json.dumps(generate(500, seed=8))
+
+
+def test_parameters_shape_the_plan():
+    plan = generate(2000, iam_ratio=0.5, module_depth=3, policy_size=6, duplicate_rate=0.5, wildcard_rate=0.0, seed=1)
+    rcs = plan["resource_changes"]
+    assert len(rcs) == 2000
+    iam = [rc for rc in rcs if rc["type"] in IAM]
+    assert 0.45 < len(iam) / len(rcs) < 0.55
+    assert max(rc["address"].count("module.") for rc in rcs) == 3
+    docs = [rc["change"]["before"]["policy"] if rc["change"]["after"] is None else rc["change"]["after"]["policy"]
+            for rc in rcs if rc["type"] in ("aws_iam_policy", "aws_iam_role_policy")]
+    assert all(len(json.loads(d)["Statement"]) == 6 for d in docs)
+    assert 0.4 < 1 - len(set(docs)) / len(docs) < 0.6
+    assert summary_from_plan(plan)["iam"]["wildcard_actions"] == []
+
+
+def test_wildcards_and_policy_document():
+    plan = generate(300, iam_ratio=1.0, policy_size=2, wildcard_rate=1.0, duplicate_rate=0.0, seed=2)
+    summary = summary_from_plan(plan)
+    assert summary["total_resources"] == 300 and summary["iam"]["wildcard_actions"]
+    assert len(summary["accounts"]) == 5
+    doc = policy_document(plan, limit=10)
+    assert len(doc["Statement"]) == 10 and doc["Statement"][0]["Action"] == "*"
+
+
+def test_regression_check():
+    base = {"calibration_ms": 10.0, "results": {"parse": {"1000": {"ms": 4.0, "peak_mb": 1.0}},
+                                                 "lint": {"1000": {"ms": 0.1, "peak_mb": 0.0}}}}
+    # Twice as slow on a machine that is also twice as slow: no regression
+    same = {"calibration_ms": 20.0, "results": {"parse": {"1000": {"ms": 8.0, "peak_mb": 1.1}}}}
+    assert bench_stages.compare(same, base) == []
+    worse = {"calibration_ms": 10.0, "results": {"parse": {"1000": {"ms": 8.0, "peak_mb": 2.0}},
+                                                  "lint": {"1000": {"ms": 0.3, "peak_mb": 0.0}}}}
+    found = {(r["stage"], r["metric"]) for r in bench_stages.compare(worse, base)}
+    # lint tripled but stays under the noise floor
+    assert found == {("parse", "ms"), ("parse", "peak_mb")}
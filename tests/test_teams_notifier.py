@@ -0,0 +1,69 @@
+import json
+import pytest
+from lambdas import teams_notifier as mod
+
+
+@pytest.fixture
+def posts(monkeypatch):
+    sent = []
+    monkeypatch.setattr(mod, "_post", lambda url, card, timeout: sent.append((url, card)))
+    monkeypatch.setattr(mod, "_LOCAL", mod.LocalQueue())
+    monkeypatch.setattr(mod, "DIGEST_QUEUE_URL", None)
+    monkeypatch.setattr(mod, "DIGEST_MAX_ITEMS", 3)
+    return sent
+
+
+def _ev(n, verdict="green", channel=None):
+    ev = {"digest": True, "teams_webhook_url": "https://hook/x", "repo": "o/r", "pr_number": n,
+          "text": f"o/r#{n}: {verdict.upper()}", "verdict": {"Payload": {"verdict": verdict}}}
+    if channel:
+        ev["teams_channel"] = channel
+    return ev
+
+
+def _texts(card):
+    return [b["text"] for b in card["attachments"][0]["content"]["body"]]
+
+
+def test_digest_coalesces_until_count_window_closes(posts):
+    assert mod.handler(_ev(1), None) == {"teams": "buffered"}
+    assert mod.handler(_ev(2), None) == {"teams": "buffered"}
+    assert posts == []
+    out = mod.handler(_ev(3), None)
+    assert out["teams"] == "digest-sent" and out["items"] == 3
+    assert len(posts) == 1
+    texts = _texts(posts[0][1])
+    assert texts[0].startswith("PR review digest: 3 notifications")
+    assert "- o/r#2: GREEN" in texts
+
+
+def test_red_verdict_bypasses_buffer(posts):
+    mod.handler(_ev(1), None)
+    assert mod.handler(_ev(2, verdict="red"), None) == {"teams": "sent"}
+    assert len(posts) == 1 and _texts(posts[0][1]) == ["o/r#2: RED"]
+    assert len(mod._LOCAL) == 1
+
+
+def test_time_window_and_channels_flush_separately(posts, monkeypatch):
+    mod.handler(_ev(1, channel="a"), None)
+    mod.handler(_ev(2, channel="b"), None)
+    monkeypatch.setattr(mod, "DIGEST_WINDOW_S", 0)
+    out = mod.handler({"flush": True}, None)
+    assert out["channels"] == 2 and not out["failed"]
+    assert len(posts) == 2
+
+
+def test_sqs_batch_reports_failed_channel(posts, monkeypatch):
+    def post(url, card, timeout):
+        if "bad" in url:
+            raise OSError("429")
+        posts.append((url, card))
+
+    monkeypatch.setattr(mod, "_post", post)
+    recs = []
+    for i, (ch, url) in enumerate([("a", "https://hook/a"), ("a", "https://hook/a"), ("b", "https://hook/bad")]):
+        body = dict(mod._message(_ev(i), f"item {i}"), channel=ch, teams_webhook_url=url)
+        recs.append({"messageId": f"m{i}", "body": json.dumps(body)})
+    out = mod.handler({"Records": recs}, None)
+    assert len(posts) == 1 and len(_texts(posts[0][1])) == 3
+    assert out["batchItemFailures"] == [{"itemIdentifier": "m2"}]
@@ -14,3 +14,19 @@ def test_parse_changes_basic():
     assert out["iam"]["wildcard_actions"]
     assert out["modules"] == ["module.auth"]
     assert out["accounts"] == ["111111111111"]
+
+
+def test_module_dirs_follow_local_sources():
+    plan = {"configuration": {"root_module": {"module_calls": {
+        "iam": {"source": "./modules/iam", "module": {"module_calls": {
+            "roles": {"source": "../roles"},
+            "vpc": {"source": "terraform-aws-modules/vpc/aws"},
+        }}},
+        "here": {"source": "./"},
+    }}}}
+    assert mod._parse_changes(plan)["module_dirs"] == {
+        "module.iam": "modules/iam",
+        "module.iam.module.roles": "modules/roles",
+        "module.iam.module.vpc": "modules/iam",
+        "module.here": "",
+    }
@@ -0,0 +1,82 @@
+import json
+import threading
+import pytest
+from lambdas import _log, _trace
+from tools import trace_view
+
+
+@pytest.fixture(autouse=True)
+def _defaults(monkeypatch):
+    monkeypatch.setattr(_log, "MIN_LEVEL", _log.LEVELS["INFO"])
+    monkeypatch.setattr(_log, "SAMPLE_RATES", {})
+    monkeypatch.setattr(_trace, "ENABLED", True)
+
+
+def _spans(capsys):
+    recs = [json.loads(l) for l in capsys.readouterr().out.splitlines()]
+    return [r for r in recs if r.get("message") == _trace.SPAN_MESSAGE]
+
+
+@_trace.trace_handler
+def _handler(event, context):
+    with _trace.span("outer", key="k") as sp:
+        with _trace.span("inner"):
+            pass
+        sp.set(bytes=10)
+    t = threading.Thread(target=lambda: _trace.span("worker").__enter__().__exit__(None, None, None))
+    t.start()
+    t.join()
+    if event.get("fail"):
+        with _trace.span("boom"):
+            raise ValueError("x")
+    return "ok"
+
+
+def test_spans_nest_under_handler_root_keyed_by_run_id(capsys):
+    assert _handler({"run_id": "r-1"}, None) == "ok"
+    spans = {s["span"]: s for s in _spans(capsys)}
+    root = spans["test_trace"]
+    assert {s["run_id"] for s in spans.values()} == {"r-1"}
+    assert root["parent_id"] is None and root["handler"] is True
+    assert spans["outer"]["parent_id"] == root["span_id"]
+    assert spans["inner"]["parent_id"] == spans["outer"]["span_id"]
+    # Worker threads have no stack of their own; they hang off the root
+    assert spans["worker"]["parent_id"] == root["span_id"]
+    assert spans["outer"]["bytes"] == 10 and spans["outer"]["key"] == "k"
+    assert root["dur_ms"] >= spans["outer"]["dur_ms"] >= spans["inner"]["dur_ms"]
+
+
+def test_error_recorded_and_trace_reset(capsys):
+    class Ctx:
+        aws_request_id = "req-9"
+    with pytest.raises(ValueError):
+        _handler({"fail": True}, Ctx())
+    spans = {s["span"]: s for s in _spans(capsys)}
+    assert spans["boom"]["error"] == "ValueError" and spans["test_trace"]["error"] == "ValueError"
+    assert spans["boom"]["run_id"] == "req-9"
+    assert _trace._current == {"trace_id": None, "root": None, "stage": None}
+
+
+def test_disabled_emits_nothing(monkeypatch, capsys):
+    monkeypatch.setattr(_trace, "ENABLED", False)
+    assert _handler({"run_id": "r-2"}, None) == "ok"
+    assert _spans(capsys) == []
+
+
+def test_trace_view_builds_waterfall_and_chrome(tmp_path, capsys):
+    _handler({"run_id": "r-3"}, None)
+    _handler({"run_id": "r-4"}, None)
+    out = capsys.readouterr().out
+    path = tmp_path / "logs.jsonl"
+    # Mixed with non-span records and Lambda's tab-separated prefix
+    path.write_text("not json\n" + "\n".join(f"2026-01-01T00:00:00Z\treq\t{l}" for l in out.splitlines()))
+    runs = trace_view.load([str(path)])
+    assert set(runs) == {"r-3", "r-4"}
+    order = [(s["span"], s["depth"]) for s in trace_view.tree(runs["r-3"])]
+    assert order[0] == ("test_trace", 0)
+    assert order.index(("inner", 2)) == order.index(("outer", 1)) + 1
+    text = trace_view.waterfall("r-3", runs["r-3"], width=20)
+    assert text.startswith("run r-3") and "    inner" in text
+    events = trace_view.chrome(runs)["traceEvents"]
+    assert sum(1 for e in events if e["ph"] == "X") == 8
+    assert trace_view.main([str(path), "--summary"]) == 0
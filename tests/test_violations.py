@@ -0,0 +1,22 @@
+from lambdas._violations import normalize, run_violations
+
+
+def test_known_messages_map_to_stable_ids():
+    assert normalize("Action:* detected – use least-privilege explicit actions") == "iam.wildcard-action"
+    assert normalize("sts:AssumeRoleWithWebIdentity on * requires restrictive Condition") == "sts.assume-role-web-identity-unscoped"
+    assert normalize("sts:AssumeRole on * requires restrictive Condition") == "sts.assume-role-unscoped"
+
+
+def test_unknown_messages_drop_run_specific_values():
+    a = normalize("Role arn:aws:iam::111122223333:role/x grants 3 wildcards")
+    b = normalize("Role arn:aws:iam::444455556666:role/y grants 7 wildcards")
+    assert a == b == "other.role-grants-wildcards"
+    assert len(normalize("x" * 500)) <= 64
+
+
+def test_run_violations_dedupes_lint_and_opa():
+    event = {
+        "lint": {"Payload": {"violations": ["iam:PassRole must be scoped to specific role ARNs"]}},
+        "opa": {"deny": ["iam:PassRole must be scoped to specific role ARNs", "Action:* detected – use least-privilege explicit actions"]},
+    }
+    assert run_violations(event) == ["iam.passrole-unscoped", "iam.wildcard-action"]
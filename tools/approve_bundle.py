@@ -1,29 +1,46 @@
 """
 One-time helper to mark a bundle hash as approved in DDB.
 
+The approval also bumps the config epoch (item CONFIG#EPOCH), which makes warm
+containers drop their cached config (lambdas/_config_cache.py) on the next check.
+
 Usage:
   python tools/approve_bundle.py <table-name> <hash>
 """
 import sys
 import boto3
 
+EPOCH_KEY = "CONFIG#EPOCH"
 
-def main():
-    if len(sys.argv) < 3:
-        print("usage: approve_bundle.py <table> <hash>")
-        sys.exit(2)
-    table, h = sys.argv[1], sys.argv[2]
-    ddb = boto3.client("dynamodb")
-    pk = f"CONFIG#BUNDLE#{h}"
+
+def approve(ddb, table: str, h: str) -> int:
+    """Write the approval, then bump the epoch; returns the new epoch."""
+    # Items share the runs table, whose hash key is run_id
     ddb.put_item(
         TableName=table,
         Item={
-            "pk": {"S": pk},
+            "run_id": {"S": f"CONFIG#BUNDLE#{h}"},
             "approved": {"BOOL": True},
         },
     )
-    print("approved", h)
+    res = ddb.update_item(
+        TableName=table,
+        Key={"run_id": {"S": EPOCH_KEY}},
+        UpdateExpression="ADD epoch :one",
+        ExpressionAttributeValues={":one": {"N": "1"}},
+        ReturnValues="UPDATED_NEW",
+    )
+    return int(res["Attributes"]["epoch"]["N"])
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("usage: approve_bundle.py <table> <hash>")
+        sys.exit(2)
+    table, h = sys.argv[1], sys.argv[2]
+    epoch = approve(boto3.client("dynamodb"), table, h)
+    print("approved", h, "epoch", epoch)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,22 +1,171 @@
+"""
+Governance bundle hash: a Merkle root over every file that shapes a review verdict.
+
+Leaves are the files matched by the glob set (policies, OPA data/WASM, prompts and the
+verdict-producing lambdas), sorted by path. Each leaf is sha256(0x00 | path | 0x00 | sha256(file)),
+and each parent is sha256(0x01 | left | right). An odd node is carried up unchanged. The root is
+the BundleHash that bundle_guard / ResolveConfig require an approval for.
+
+Files are mmap-read and digested in parallel. Per-file digests are cached by (size, mtime_ns)
+in BUNDLE_HASH_CACHE, so recomputation in the same workspace only re-reads files that changed.
+With --previous, the leaves that differ from an earlier manifest are listed, so governance
+review can focus on what actually moved.
+
+Usage:
+    python tools/bundle_hash.py                                  # prints the root
+    python tools/bundle_hash.py --manifest out.json [--previous old.json] [--glob 'prompts/**/*']
+    BUNDLE_GLOBS='policies/**/*.rego,prompts/**/*' python tools/bundle_hash.py
+"""
+import argparse
 import hashlib
+import json
+import mmap
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional
 
-
-TARGETS = [
-    Path("policies/iam.rego"),
-    Path("lambdas/agent_invoker.py"),
-    Path("lambdas/opa_gate.py"),
-    Path("lambdas/github_checks.py"),
+DEFAULT_GLOBS = [
+    "policies/**/*.rego",
+    "policies/**/*.json",
+    # OPA artifacts as packaged (built by the deploy workflow before hashing)
+    "dist/stage-opa/policies/policy.wasm",
+    "dist/stage-opa/policies/data.json",
+    "prompts/**/*",
+    "lambdas/agent_invoker.py",
+    "lambdas/opa_gate.py",
+    "lambdas/github_checks.py",
 ]
+GLOBS = [g.strip() for g in os.environ.get("BUNDLE_GLOBS", "").split(",") if g.strip()] or DEFAULT_GLOBS
+CACHE_PATH = os.environ.get("BUNDLE_HASH_CACHE", ".bundle_hash_cache.json")
+MANIFEST_VERSION = 1
+WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def collect(globs: Iterable[str] = None, root: Path = Path(".")) -> List[str]:
+    """Sorted, de-duplicated POSIX paths (relative to root) of regular files matching the globs."""
+    found = set()
+    for pattern in globs or GLOBS:
+        for p in root.glob(pattern):
+            if p.is_file() and "__pycache__" not in p.parts:
+                found.add(p.relative_to(root).as_posix())
+    return sorted(found)
+
+
+def file_digest(path: Path) -> str:
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return hashlib.sha256(b"").hexdigest()
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # hashlib releases the GIL on large buffers, so threads digest in parallel
+            return hashlib.sha256(mm).hexdigest()
+
+
+def _load_cache(path: Optional[str]) -> Dict[str, Dict]:
+    if not path:
+        return {}
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def digests(paths: List[str], root: Path = Path("."), cache_path: Optional[str] = CACHE_PATH) -> Dict[str, Dict]:
+    """``{path: {sha256, size, mtime_ns}}``; unchanged (size, mtime_ns) entries come from the cache."""
+    cache = _load_cache(cache_path)
+    out: Dict[str, Dict] = {}
+    todo = []
+    for rel in paths:
+        st = (root / rel).stat()
+        hit = cache.get(rel)
+        if hit and hit.get("size") == st.st_size and hit.get("mtime_ns") == st.st_mtime_ns:
+            out[rel] = hit
+        else:
+            todo.append((rel, st))
+    if todo:
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            for (rel, st), sha in zip(todo, pool.map(lambda t: file_digest(root / t[0]), todo)):
+                out[rel] = {"sha256": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if cache_path and todo:
+        cache.update(out)
+        tmp = f"{cache_path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(cache, fh, sort_keys=True)
+        os.replace(tmp, cache_path)
+    return {rel: out[rel] for rel in paths}
+
+
+def leaf_hash(path: str, sha256_hex: str) -> bytes:
+    return hashlib.sha256(b"\x00" + path.encode("utf-8") + b"\x00" + bytes.fromhex(sha256_hex)).digest()
+
+
+def merkle_root(leaves: List[bytes]) -> str:
+    if not leaves:
+        return hashlib.sha256(b"").hexdigest()
+    level = leaves
+    while len(level) > 1:
+        nxt = [hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+    return level[0].hex()
+
+
+def manifest(globs: Iterable[str] = None, root: Path = Path("."), cache_path: Optional[str] = CACHE_PATH) -> Dict:
+    globs = list(globs or GLOBS)
+    files = digests(collect(globs, root), root, cache_path)
+    return {
+        "version": MANIFEST_VERSION,
+        "root": merkle_root([leaf_hash(p, f["sha256"]) for p, f in files.items()]),
+        "globs": globs,
+        "files": {p: {"sha256": f["sha256"], "size": f["size"]} for p, f in files.items()},
+    }
+
+
+def changed(current: Dict, previous: Dict) -> Dict[str, List[str]]:
+    """Leaves added, removed or modified between two manifests."""
+    cur, old = current.get("files") or {}, previous.get("files") or {}
+    return {
+        "added": sorted(set(cur) - set(old)),
+        "removed": sorted(set(old) - set(cur)),
+        "modified": sorted(p for p in set(cur) & set(old) if cur[p]["sha256"] != old[p]["sha256"]),
+    }
+
+
+def compute_hash(globs: Iterable[str] = None) -> str:
+    return manifest(globs)["root"]
 
 
-def compute_hash():
-    h = hashlib.sha256()
-    for p in TARGETS:
-        if p.exists():
-            h.update(p.read_bytes())
-    return h.hexdigest()
+def main(argv: List[str] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--glob", action="append", help="leaf glob (repeatable); replaces BUNDLE_GLOBS/defaults")
+    ap.add_argument("--manifest", help="write the manifest JSON here")
+    ap.add_argument("--previous", help="earlier manifest to diff leaves against")
+    ap.add_argument("--no-cache", action="store_true")
+    args = ap.parse_args(argv)
+    m = manifest(args.glob, cache_path=None if args.no_cache else CACHE_PATH)
+    if args.manifest:
+        with open(args.manifest, "w") as fh:
+            json.dump(m, fh, indent=2, sort_keys=True)
+    if args.previous:
+        try:
+            with open(args.previous) as fh:
+                prev = json.load(fh)
+        except (OSError, ValueError):
+            prev = None
+        if prev is None:
+            print("no previous manifest; all leaves are new", file=sys.stderr)
+        elif prev.get("root") == m["root"]:
+            print("bundle unchanged", file=sys.stderr)
+        else:
+            for kind, paths in changed(m, prev).items():
+                for p in paths:
+                    print(f"{kind}: {p}", file=sys.stderr)
+    print(m["root"])
+    return 0
 
 
 if __name__ == "__main__":
-    print(compute_hash())
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+In-memory fake of the DynamoDB client calls used by the PRRuns writers and readers.
+
+Keeps typed items (``{"S": ...}``/``{"N": ...}``) keyed by the table's hash key,
+understands the small expression subset the lambdas use (SET / if_not_exists,
+ADD, attribute_not_exists, ``a = :v`` key conditions with an optional
+sort-key comparison, ``a BETWEEN :s AND :e`` filters) and records a stream of INSERT/MODIFY images so stream consumers can be
+replayed locally.
+
+Usage (tests):
+    ddb = FakeDynamoDB()
+    ddb.put_item(TableName="PRRuns", Item={...})
+    runs_rollup.handler({"Records": ddb.drain_stream()}, None)
+
+Usage (manual replay of a JSON-lines file of typed run items into rollups):
+    python tools/fake_dynamodb.py runs.jsonl
+"""
+import copy
+import itertools
+import json
+import re
+import sys
+import threading
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+
+
+def _num(v: Dict[str, Any]) -> Decimal:
+    return Decimal(v["N"])
+
+
+def _fmt(d: Decimal) -> str:
+    return str(d.normalize()) if d != d.to_integral_value() else str(int(d))
+
+
+def _conditional_failed(op: str) -> ClientError:
+    return ClientError({"Error": {"Code": "ConditionalCheckFailedException", "Message": "The conditional request failed"}}, op)
+
+
+class FakeDynamoDB:
+    def __init__(self, hash_key: str = "run_id", indexes: Optional[Dict[str, str]] = None):
+        self.hash_key = hash_key
+        # index name -> partition attribute (items without it are not in the index)
+        self.indexes = indexes if indexes is not None else {"created_month_gsi": "created_month"}
+        self.tables: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.stream: List[Dict[str, Any]] = []
+        self.calls: List[str] = []
+        self._seq = itertools.count(1)
+        self._lock = threading.RLock()
+
+    # -- helpers ---------------------------------------------------------
+    def _table(self, name: str) -> Dict[str, Dict[str, Any]]:
+        return self.tables.setdefault(name, {})
+
+    def _key(self, key: Dict[str, Any]) -> str:
+        return key[self.hash_key]["S"]
+
+    def _emit(self, old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> None:
+        self.stream.append({
+            "eventID": str(len(self.stream) + 1),
+            "eventName": "MODIFY" if old else "INSERT",
+            "dynamodb": {
+                "Keys": {self.hash_key: new[self.hash_key]},
+                "NewImage": copy.deepcopy(new),
+                "SequenceNumber": str(next(self._seq)),
+            },
+        })
+
+    def drain_stream(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            out, self.stream = self.stream, []
+        return out
+
+    @staticmethod
+    def _name(tok: str, names: Dict[str, str]) -> str:
+        return names.get(tok, tok)
+
+    def _check(self, item: Optional[Dict[str, Any]], expr: Optional[str], names: Dict[str, str], op: str) -> None:
+        if not expr:
+            return
+        m = re.fullmatch(r"attribute_not_exists\((\S+)\)", expr.strip())
+        if not m:
+            raise NotImplementedError(expr)
+        if item is not None and self._name(m.group(1), names) in item:
+            raise _conditional_failed(op)
+
+    # -- single-item API -------------------------------------------------
+    def get_item(self, TableName: str, Key: Dict[str, Any], **kw) -> Dict[str, Any]:
+        self.calls.append("get_item")
+        it = self._table(TableName).get(self._key(Key))
+        return {"Item": copy.deepcopy(it)} if it else {}
+
+    def put_item(self, TableName: str, Item: Dict[str, Any], ConditionExpression: Optional[str] = None,
+                 ExpressionAttributeNames: Optional[Dict[str, str]] = None, **kw) -> Dict[str, Any]:
+        self.calls.append("put_item")
+        with self._lock:
+            t = self._table(TableName)
+            old = t.get(self._key(Item))
+            self._check(old, ConditionExpression, ExpressionAttributeNames or {}, "PutItem")
+            t[self._key(Item)] = copy.deepcopy(Item)
+            self._emit(old, Item)
+        return {}
+
+    def delete_item(self, TableName: str, Key: Dict[str, Any], **kw) -> Dict[str, Any]:
+        self.calls.append("delete_item")
+        with self._lock:
+            self._table(TableName).pop(self._key(Key), None)
+        return {}
+
+    def update_item(self, TableName: str, Key: Dict[str, Any], UpdateExpression: str,
+                    ExpressionAttributeNames: Optional[Dict[str, str]] = None,
+                    ExpressionAttributeValues: Optional[Dict[str, Any]] = None,
+                    ConditionExpression: Optional[str] = None, **kw) -> Dict[str, Any]:
+        self.calls.append("update_item")
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        with self._lock:
+            t = self._table(TableName)
+            old = t.get(self._key(Key))
+            self._check(old, ConditionExpression, names, "UpdateItem")
+            item = copy.deepcopy(old) if old else copy.deepcopy(Key)
+            touched = set()
+            for action, body in re.findall(r"\b(SET|ADD|REMOVE)\s+(.*?)(?=\s+\b(?:SET|ADD|REMOVE)\b|$)", UpdateExpression):
+                for clause in (c.strip() for c in body.split(",") if c.strip()):
+                    if action == "SET":
+                        lhs, rhs = (p.strip() for p in clause.split("=", 1))
+                        attr = self._name(lhs, names)
+                        touched.add(attr)
+                        m = re.fullmatch(r"if_not_exists\((\S+),\s*(\S+)\)", rhs)
+                        if m:
+                            if attr not in item:
+                                item[attr] = copy.deepcopy(values[m.group(2)])
+                        else:
+                            item[attr] = copy.deepcopy(values[rhs])
+                    elif action == "ADD":
+                        lhs, rhs = clause.split()
+                        attr = self._name(lhs, names)
+                        touched.add(attr)
+                        cur = item.get(attr)
+                        inc = values[rhs]
+                        if "N" in inc:
+                            item[attr] = {"N": _fmt((_num(cur) if cur else Decimal(0)) + _num(inc))}
+                        else:
+                            kind = "SS" if "SS" in inc else "NS"
+                            item[attr] = {kind: sorted(set((cur or {}).get(kind, [])) | set(inc[kind]))}
+                    else:
+                        item.pop(self._name(clause, names), None)
+            t[self._key(Key)] = item
+            self._emit(old, item)
+        rv = kw.get("ReturnValues")
+        if rv == "ALL_NEW":
+            return {"Attributes": copy.deepcopy(item)}
+        if rv == "UPDATED_NEW":
+            return {"Attributes": {k: copy.deepcopy(v) for k, v in item.items() if k in touched}}
+        return {}
+
+    def transact_write_items(self, TransactItems: List[Dict[str, Any]], **kw) -> Dict[str, Any]:
+        self.calls.append("transact_write_items")
+        with self._lock:
+            snapshot = copy.deepcopy(self.tables)
+            stream_len = len(self.stream)
+            reasons = []
+            failed = False
+            for ti in TransactItems:
+                (op, args), = ti.items()
+                try:
+                    {"Put": self.put_item, "Update": self.update_item}[op](**args)
+                    reasons.append({"Code": "None"})
+                except ClientError:
+                    reasons.append({"Code": "ConditionalCheckFailed"})
+                    failed = True
+            if failed:
+                self.tables, self.stream = snapshot, self.stream[:stream_len]
+                err = ClientError({"Error": {"Code": "TransactionCanceledException", "Message": "Transaction cancelled"}}, "TransactWriteItems")
+                err.response["CancellationReasons"] = reasons
+                raise err
+        return {}
+
+    def batch_get_item(self, RequestItems: Dict[str, Any], **kw) -> Dict[str, Any]:
+        self.calls.append("batch_get_item")
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        for table, req in RequestItems.items():
+            t = self._table(table)
+            out[table] = [copy.deepcopy(t[self._key(k)]) for k in req["Keys"] if self._key(k) in t]
+        return {"Responses": out, "UnprocessedKeys": {}}
+
+    # -- reads -----------------------------------------------------------
+    def _query(self, TableName: str, KeyConditionExpression: str, ExpressionAttributeValues: Dict[str, Any],
+               IndexName: Optional[str] = None, ExpressionAttributeNames: Optional[Dict[str, str]] = None, **kw) -> Iterator[Dict[str, Any]]:
+        if IndexName and IndexName not in self.indexes:
+            raise ClientError({"Error": {"Code": "ValidationException", "Message": "index not found"}}, "Query")
+        names, values = ExpressionAttributeNames or {}, ExpressionAttributeValues
+        hash_cond, _, range_cond = KeyConditionExpression.partition(" AND ")
+        attr, val = (p.strip() for p in hash_cond.split("=", 1))
+        attr = self._name(attr, names)
+        rows = [copy.deepcopy(it) for it in self._table(TableName).values() if it.get(attr) == values[val]]
+        if range_cond:
+            # Optional sort-key condition: "k > :v", "k >= :v", "k <= :v" or "k BETWEEN :a AND :b"
+            m = re.fullmatch(r"(\S+) BETWEEN (\S+) AND (\S+)", range_cond.strip())
+            if m:
+                k, lo, hi = self._name(m.group(1), names), values[m.group(2)]["S"], values[m.group(3)]["S"]
+                rows = [it for it in rows if k in it and lo <= it[k]["S"] <= hi]
+            else:
+                k, op, v = range_cond.split()
+                k, v = self._name(k, names), values[v]["S"]
+                cmp = {">": str.__gt__, ">=": str.__ge__, "<": str.__lt__, "<=": str.__le__}[op]
+                rows = [it for it in rows if k in it and cmp(it[k]["S"], v)]
+        rows.sort(key=lambda it: (it.get("created_at") or {}).get("S", ""))
+        yield {"Items": rows, "Count": len(rows)}
+
+    def _scan(self, TableName: str, Segment: int = 0, TotalSegments: int = 1, FilterExpression: Optional[str] = None,
+              ExpressionAttributeValues: Optional[Dict[str, Any]] = None, **kw) -> Iterator[Dict[str, Any]]:
+        rows = [it for n, it in enumerate(self._table(TableName).values()) if n % TotalSegments == Segment]
+        if FilterExpression:
+            m = re.fullmatch(r"(\S+) BETWEEN (\S+) AND (\S+)", FilterExpression.strip())
+            if not m:
+                raise NotImplementedError(FilterExpression)
+            lo, hi = ExpressionAttributeValues[m.group(2)]["S"], ExpressionAttributeValues[m.group(3)]["S"]
+            rows = [it for it in rows if m.group(1) in it and lo <= it[m.group(1)].get("S", "") <= hi]
+        yield {"Items": [copy.deepcopy(it) for it in rows], "Count": len(rows)}
+
+    def get_paginator(self, op: str):
+        fake = self
+        fn = {"query": self._query, "scan": self._scan}[op]
+
+        class _Paginator:
+            def paginate(self, **kw):
+                fake.calls.append(op)
+                return fn(**kw)
+
+        return _Paginator()
+
+
+def _main(path: str) -> None:
+    sys.path.insert(0, ".")
+    from lambdas import _rollup, runs_rollup
+
+    ddb = FakeDynamoDB()
+    with open(path) as fh:
+        for line in fh:
+            if line.strip():
+                ddb.put_item(TableName="PRRuns", Item=json.loads(line))
+    print(json.dumps(runs_rollup.process(ddb.drain_stream(), ddb, "PRRuns")))
+    for key, item in sorted(ddb.tables["PRRuns"].items()):
+        if key.startswith(_rollup.DAY_PREFIX):
+            print(key, json.dumps(_rollup.counters(item), sort_keys=True))
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1])
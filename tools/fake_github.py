@@ -0,0 +1,202 @@
+"""
+In-process fake of the GitHub REST endpoints used by the pipeline.
+
+Speaks HTTP/1.1 with keep-alive so connection reuse can be asserted, honours
+If-None-Match on GETs, and keeps just enough state (check runs, comments,
+merges) for the GitHub lambdas to round-trip against it.
+
+Usage (tests):
+    with FakeGitHub() as gh:
+        monkeypatch.setenv("GITHUB_API_URL", gh.url)
+        ...
+        assert gh.connections == 1
+
+Usage (manual):
+    python tools/fake_github.py [port]
+"""
+import hashlib
+import itertools
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class FakeGitHub:
+    def __init__(self, installation_id: int = 42, port: int = 0, idle_timeout: Optional[float] = None):
+        self.installation_id = installation_id
+        # A request on a keep-alive connection idle longer than this is dropped unanswered,
+        # as a front end that has already forgotten the connection would
+        self.idle_timeout = idle_timeout
+        self.requests: List[Dict[str, Any]] = []
+        self.connections = 0
+        self.check_runs: Dict[int, Dict[str, Any]] = {}
+        self.comments: Dict[int, Dict[str, Any]] = {}
+        self.merges: List[Dict[str, Any]] = []
+        self._ids = itertools.count(1000)
+        self._lock = threading.Lock()
+        # Overrides checked before the built-in routes: (method, regex) -> fn(match, body, headers) -> (status, body, headers)
+        self._overrides: List[Tuple[str, "re.Pattern[str]", Callable]] = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    # -- lifecycle -------------------------------------------------------
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGitHub":
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeGitHub":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # -- scripting -------------------------------------------------------
+    def route(self, method: str, pattern: str, fn: Callable) -> None:
+        """Override a route; ``fn(match, body, headers)`` returns (status, body, headers)."""
+        self._overrides.insert(0, (method.upper(), re.compile(pattern + "$"), fn))
+
+    def calls(self, method: Optional[str] = None, path_re: Optional[str] = None) -> List[Dict[str, Any]]:
+        out = self.requests
+        if method:
+            out = [r for r in out if r["method"] == method.upper()]
+        if path_re:
+            rx = re.compile(path_re)
+            out = [r for r in out if rx.search(r["path"])]
+        return out
+
+    # -- built-in routes ---------------------------------------------------
+    def _next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def _dispatch(self, method: str, path: str, body: Any, headers: Dict[str, str]):
+        for m, rx, fn in self._overrides:
+            match = rx.match(path)
+            if m == method and match:
+                return fn(match, body, headers)
+
+        repo = r"/repos/(?P<repo>[^/]+/[^/]+)"
+        routes = [
+            ("GET", repo + r"/installation", lambda mt: (200, {"id": self.installation_id}, {})),
+            ("POST", r"/app/installations/(?P<iid>\d+)/access_tokens", self._access_token),
+            ("POST", repo + r"/check-runs", lambda mt: self._create(self.check_runs, body, {"head_sha": body.get("head_sha")})),
+            ("PATCH", repo + r"/check-runs/(?P<id>\d+)", lambda mt: self._update(self.check_runs, int(mt["id"]), body)),
+            ("GET", repo + r"/issues/(?P<n>\d+)/comments", lambda mt: (200, [c for c in self.comments.values() if c.get("issue") == int(mt["n"])], {})),
+            ("POST", repo + r"/issues/(?P<n>\d+)/comments", lambda mt: self._create(self.comments, body, {"issue": int(mt["n"]), "user": {"login": "pr-review[bot]", "type": "Bot"}})),
+            ("GET", repo + r"/issues/comments/(?P<id>\d+)", lambda mt: (200, self.comments[int(mt["id"])], {}) if int(mt["id"]) in self.comments else (404, {"message": "Not Found"}, {})),
+            ("PATCH", repo + r"/issues/comments/(?P<id>\d+)", lambda mt: self._update(self.comments, int(mt["id"]), body)),
+            ("POST", repo + r"/commits/(?P<sha>[^/]+)/comments", lambda mt: self._create(self.comments, body, {"commit_id": mt["sha"]})),
+            ("PUT", repo + r"/pulls/(?P<n>\d+)/merge", self._merge),
+        ]
+        for m, pattern, fn in routes:
+            match = re.match(pattern + "$", path)
+            if m == method and match:
+                return fn(match)
+        return 404, {"message": "Not Found"}, {}
+
+    def _access_token(self, mt):
+        expires = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 3600))
+        return 201, {"token": f"ghs_fake_{mt['iid']}_{self._next_id()}", "expires_at": expires}, {}
+
+    def _create(self, store: Dict[int, Dict[str, Any]], body: Any, extra: Dict[str, Any]):
+        obj = dict(body or {})
+        obj.update(extra)
+        obj["id"] = self._next_id()
+        store[obj["id"]] = obj
+        return 201, obj, {}
+
+    def _update(self, store: Dict[int, Dict[str, Any]], oid: int, body: Any):
+        if oid not in store:
+            return 404, {"message": "Not Found"}, {}
+        store[oid].update(body or {})
+        return 200, store[oid], {}
+
+    def _merge(self, mt):
+        rec = {"repo": mt["repo"], "pr": int(mt["n"]), "sha": hashlib.sha1(mt["n"].encode()).hexdigest()}
+        self.merges.append(rec)
+        return 200, {"merged": True, "sha": rec["sha"], "message": "Pull Request successfully merged"}, {}
+
+    # -- HTTP plumbing -----------------------------------------------------
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; without this, Nagle plus the
+            # client's delayed ACK adds ~40ms to every keep-alive response
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+                self.last_used = time.time()
+
+            def log_message(self, *args):  # keep test output quiet
+                pass
+
+            def _serve(self):
+                if fake.idle_timeout is not None and time.time() - self.last_used > fake.idle_timeout:
+                    self.close_connection = True
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw.decode("utf-8")) if raw else None
+                except ValueError:
+                    body = None
+                headers = {k.lower(): v for k, v in self.headers.items()}
+                path = self.path.split("?", 1)[0]
+                fake.requests.append({"method": self.command, "path": path, "headers": headers, "body": body})
+                status, out, extra = fake._dispatch(self.command, path, body, headers)
+                data = json.dumps(out).encode("utf-8") if out is not None else b""
+                etag = None
+                if self.command == "GET" and status == 200:
+                    etag = '"' + hashlib.sha256(data).hexdigest()[:20] + '"'
+                    if headers.get("if-none-match") == etag:
+                        status, data = 304, b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if etag:
+                    self.send_header("ETag", etag)
+                for k, v in (extra or {}).items():
+                    self.send_header(k, str(v))
+                self.end_headers()
+                if data:
+                    self.wfile.write(data)
+                self.last_used = time.time()
+
+            do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _serve
+
+        return Handler
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    fake = FakeGitHub(port=port).start()
+    print("fake github listening on", fake.url)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
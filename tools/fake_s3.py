@@ -0,0 +1,158 @@
+"""
+In-memory (or directory-backed) fake of the S3 client calls used by the exporters and reports.
+
+Supports put_object / get_object / head_object, multipart uploads (enforcing S3's 5 MiB
+minimum for every part but the last) and the list_objects_v2 paginator. With ``root`` set,
+objects are written under ``<root>/<bucket>/<key>`` so exported files can be inspected
+with ordinary tools.
+
+Usage (tests):
+    s3 = FakeS3()
+    audit_exporter.export(ddb, s3, "PRRuns", "artifacts")
+
+Usage (manual export of a JSON-lines file of typed run items to ./out/<bucket>/exports/...):
+    python tools/fake_s3.py runs.jsonl out
+"""
+import io
+import itertools
+import json
+import os
+import sys
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+
+
+class _Body(io.BytesIO):
+    """StreamingBody stand-in: read() / iter_chunks()."""
+
+    def iter_chunks(self, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class FakeS3:
+    def __init__(self, root: Optional[str] = None):
+        self.root = root
+        self.objects: Dict[str, Dict[str, bytes]] = {}
+        self.calls: List[str] = []
+        # upload id -> (bucket, key, {part number: bytes})
+        self.uploads: Dict[str, Any] = {}
+        # Sizes of the parts of every completed multipart upload, by key
+        self.part_sizes: Dict[str, List[int]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    # -- storage -----------------------------------------------------------
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def _store(self, bucket: str, key: str, data: bytes) -> None:
+        with self._lock:
+            self.objects.setdefault(bucket, {})[key] = data
+        if self.root:
+            path = self._path(bucket, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fh:
+                fh.write(data)
+
+    def _load(self, bucket: str, key: str, op: str) -> bytes:
+        data = self.objects.get(bucket, {}).get(key)
+        if data is None:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "The specified key does not exist."}}, op)
+        return data
+
+    # -- object API ----------------------------------------------------------
+    def put_object(self, Bucket: str, Key: str, Body: Any = b"", **kw) -> Dict[str, Any]:
+        self.calls.append("put_object")
+        data = Body.read() if hasattr(Body, "read") else Body
+        self._store(Bucket, Key, data.encode("utf-8") if isinstance(data, str) else bytes(data))
+        return {"ETag": f'"{len(data)}"'}
+
+    def get_object(self, Bucket: str, Key: str, **kw) -> Dict[str, Any]:
+        self.calls.append("get_object")
+        data = self._load(Bucket, Key, "GetObject")
+        return {"Body": _Body(data), "ContentLength": len(data)}
+
+    def head_object(self, Bucket: str, Key: str, **kw) -> Dict[str, Any]:
+        self.calls.append("head_object")
+        return {"ContentLength": len(self._load(Bucket, Key, "HeadObject"))}
+
+    # -- multipart ---------------------------------------------------------
+    def create_multipart_upload(self, Bucket: str, Key: str, **kw) -> Dict[str, Any]:
+        self.calls.append("create_multipart_upload")
+        upload_id = f"upload-{next(self._ids)}"
+        self.uploads[upload_id] = (Bucket, Key, {})
+        return {"Bucket": Bucket, "Key": Key, "UploadId": upload_id}
+
+    def _upload(self, upload_id: str, op: str):
+        if upload_id not in self.uploads:
+            raise ClientError({"Error": {"Code": "NoSuchUpload", "Message": "The specified upload does not exist."}}, op)
+        return self.uploads[upload_id]
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: Any, **kw) -> Dict[str, Any]:
+        self.calls.append("upload_part")
+        data = Body.read() if hasattr(Body, "read") else bytes(Body)
+        self._upload(UploadId, "UploadPart")[2][PartNumber] = data
+        return {"ETag": f'"{UploadId}-{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload: Dict[str, Any], **kw) -> Dict[str, Any]:
+        self.calls.append("complete_multipart_upload")
+        parts = self._upload(UploadId, "CompleteMultipartUpload")[2]
+        numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+        if numbers != sorted(numbers) or any(n not in parts for n in numbers):
+            raise ClientError({"Error": {"Code": "InvalidPart", "Message": "One or more of the specified parts could not be found."}}, "CompleteMultipartUpload")
+        sizes = [len(parts[n]) for n in numbers]
+        if any(size < 5 * 1024 * 1024 for size in sizes[:-1]):
+            raise ClientError({"Error": {"Code": "EntityTooSmall", "Message": "Your proposed upload is smaller than the minimum allowed size"}}, "CompleteMultipartUpload")
+        self._store(Bucket, Key, b"".join(parts[n] for n in numbers))
+        self.part_sizes[Key] = sizes
+        del self.uploads[UploadId]
+        return {"Bucket": Bucket, "Key": Key}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str, **kw) -> Dict[str, Any]:
+        self.calls.append("abort_multipart_upload")
+        self.uploads.pop(UploadId, None)
+        return {}
+
+    def _list(self, Bucket: str, Prefix: str = "", MaxKeys: int = 1000, **kw) -> Iterator[Dict[str, Any]]:
+        keys = sorted(k for k in self.objects.get(Bucket, {}) if k.startswith(Prefix))
+        for i in range(0, max(len(keys), 1), MaxKeys):
+            page = keys[i:i + MaxKeys]
+            yield {
+                "Contents": [{"Key": k, "Size": len(self.objects[Bucket][k])} for k in page],
+                "KeyCount": len(page),
+            }
+
+    def get_paginator(self, op: str):
+        fake = self
+        fn = {"list_objects_v2": self._list}[op]
+
+        class _Paginator:
+            def paginate(self, **kw):
+                fake.calls.append(op)
+                return fn(**kw)
+
+        return _Paginator()
+
+
+def _main(path: str, root: str) -> None:
+    sys.path.insert(0, ".")
+    from lambdas import audit_exporter
+    from tools.fake_dynamodb import FakeDynamoDB
+
+    ddb = FakeDynamoDB()
+    with open(path) as fh:
+        for line in fh:
+            if line.strip():
+                ddb.put_item(TableName="PRRuns", Item=json.loads(line))
+    s3 = FakeS3(root)
+    print(json.dumps(audit_exporter.export(ddb, s3, "PRRuns", "artifacts", lag_s=0)))
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "out")
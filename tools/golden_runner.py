@@ -0,0 +1,228 @@
+"""
+Golden PR suite runner: every case through the deterministic stages, in parallel, with latency budgets.
+
+A case (tests/golden/cases/<name>.json) provides the stage inputs and what to expect:
+    plan_json | summary     full plan (parsed by tf_plan_parser) or an already parsed summary
+    policy, trust, metadata optional iam_lint / opa_gate inputs
+    expect                  {"opa.allow": false, "opa.deny": {"nonempty": true}, ...}; a plain value
+                            means equality, otherwise one of contains / nonempty / in
+    budget_ms               per-stage latency budget, overriding DEFAULT_BUDGET_MS
+
+Stages run as pipeline_runner runs them (plan, opa, lint, impact, risk). A stage over its
+budget is re-run up to BUDGET_RETRIES times and the case fails only if it never fits,
+so one scheduling hiccup on a shared runner does not fail the suite.
+
+Passing results are cached under CACHE_DIR by content address: sha256 of the case file plus
+a Merkle root (tools/bundle_hash.py) over the governance bundle and the stage code. Cases
+whose inputs and bundle are unchanged since their last passing run are skipped.
+
+Usage:
+    python tools/golden_runner.py [--workers 4] [--no-cache] [--case wildcard_action] [--json out.json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from lambdas import _claim  # noqa: E402
+from tools import bundle_hash  # noqa: E402
+
+CASES_DIR = ROOT / "tests" / "golden" / "cases"
+CACHE_DIR = os.environ.get("GOLDEN_CACHE_DIR", str(ROOT / ".golden_cache"))
+# Code the verdict depends on beyond the governance bundle
+CODE_GLOBS = ["lambdas/*.py", "tools/golden_runner.py"]
+DEFAULT_BUDGET_MS = {"plan": 500.0, "opa": 500.0, "lint": 200.0, "impact": 200.0, "risk": 200.0}
+BUDGET_RETRIES = 2
+_MISSING = object()
+
+
+def load_cases(cases_dir: Path = CASES_DIR, names: Optional[List[str]] = None) -> Dict[str, bytes]:
+    """Case name -> raw file bytes (the bytes are what the cache key covers)."""
+    out = {}
+    for p in sorted(Path(cases_dir).glob("*.json")):
+        if not names or p.stem in names:
+            out[p.stem] = p.read_bytes()
+    return out
+
+
+def bundle_root() -> str:
+    globs = list(bundle_hash.GLOBS) + CODE_GLOBS
+    return bundle_hash.manifest(globs, root=ROOT, cache_path=str(ROOT / bundle_hash.CACHE_PATH))["root"]
+
+
+def cache_key(raw: bytes, bundle: str) -> str:
+    return hashlib.sha256(hashlib.sha256(raw).digest() + bundle.encode("ascii")).hexdigest()
+
+
+def _get(obj: Any, path: str) -> Any:
+    for part in path.split("."):
+        if isinstance(obj, dict) and part in obj:
+            obj = obj[part]
+        elif isinstance(obj, list) and part.isdigit() and int(part) < len(obj):
+            obj = obj[int(part)]
+        else:
+            return _MISSING
+    return obj
+
+
+def check(outputs: Dict[str, Any], expect: Dict[str, Any]) -> List[str]:
+    """Failed expectations as readable strings."""
+    failures = []
+    for path, want in expect.items():
+        got = _get(outputs, path)
+        if isinstance(want, dict) and len(want) == 1 and next(iter(want)) in ("contains", "nonempty", "in"):
+            op, arg = next(iter(want.items()))
+            if op == "contains":
+                ok = got is not _MISSING and any(arg in str(x) for x in (got if isinstance(got, list) else [got]))
+            elif op == "nonempty":
+                ok = (got is not _MISSING and bool(got)) == bool(arg)
+            else:
+                ok = got in arg
+        else:
+            ok = got == want
+        if not ok:
+            failures.append(f"{path}: expected {json.dumps(want)}, got {'<missing>' if got is _MISSING else json.dumps(got)}")
+    return failures
+
+
+def _stages():
+    from lambdas import pipeline_runner, tf_plan_parser
+
+    def plan(state, context):
+        if "plan_json" in state:
+            return {"status": "ok", "summary": tf_plan_parser.summary_from_plan(state["plan_json"])}
+        return {"status": "ok", "summary": state.get("summary") or {}}
+    # The parser's S3 read is replaced by the case's inline plan; the rest run as in pipeline_runner
+    return [("plan", plan, lambda s: s)] + [st for st in pipeline_runner.STAGES if st[0] != "plan"]
+
+
+def execute(case: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    state = {k: v for k, v in case.items() if k not in ("expect", "budget_ms", "description")}
+    state.setdefault("run_id", "golden")
+    outputs: Dict[str, Any] = {}
+    timings: Dict[str, float] = {}
+    with _claim.inline():
+        for key, fn, view in _stages():
+            t0 = time.perf_counter()
+            out = fn(view(state), None)
+            timings[key] = round((time.perf_counter() - t0) * 1000.0, 3)
+            state[key] = outputs[key] = out
+    return outputs, timings
+
+
+def run_case(name: str, raw: bytes) -> Dict[str, Any]:
+    """One case: expectations plus latency budgets. Never raises; errors fail the case."""
+    try:
+        case = json.loads(raw)
+        budget = {**DEFAULT_BUDGET_MS, **(case.get("budget_ms") or {})}
+        outputs, best = execute(case)
+        failures = check(outputs, case.get("expect") or {})
+        for _ in range(BUDGET_RETRIES):
+            if all(best[s] <= budget.get(s, float("inf")) for s in best):
+                break
+            _, again = execute(case)
+            best = {s: min(best[s], again[s]) for s in best}
+        over = {s: ms for s, ms in best.items() if ms > budget.get(s, float("inf"))}
+        failures += [f"{s}: {ms:.1f}ms over budget {budget[s]:.1f}ms" for s, ms in sorted(over.items())]
+    except Exception as e:
+        return {"case": name, "passed": False, "failures": [f"error: {type(e).__name__}: {e}"], "stages_ms": {}}
+    return {"case": name, "passed": not failures, "failures": failures, "stages_ms": best}
+
+
+def _quiet_worker() -> None:
+    sys.stdout = open(os.devnull, "w")
+
+
+def _run_one(args: Tuple[str, bytes]) -> Dict[str, Any]:
+    return run_case(*args)
+
+
+def _cache_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, key[:2], f"{key}.json")
+
+
+def run(cases: Dict[str, bytes], workers: int = 0, cache_dir: Optional[str] = CACHE_DIR,
+        bundle: Optional[str] = None) -> Dict[str, Any]:
+    """Run (or skip, when cached) every case; ``workers=0`` runs in this process."""
+    bundle = bundle or bundle_root()
+    keys = {name: cache_key(raw, bundle) for name, raw in cases.items()}
+    results: Dict[str, Dict[str, Any]] = {}
+    todo = []
+    for name, raw in cases.items():
+        path = _cache_path(cache_dir, keys[name]) if cache_dir else None
+        if path and os.path.exists(path):
+            with open(path) as fh:
+                results[name] = {**json.load(fh), "cached": True}
+        else:
+            todo.append((name, raw))
+    t0 = time.perf_counter()
+    if workers and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo)), initializer=_quiet_worker) as pool:
+            fresh = list(pool.map(_run_one, todo))
+    else:
+        real = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            fresh = [run_case(n, r) for n, r in todo]
+        finally:
+            sys.stdout.close()
+            sys.stdout = real
+    for res in fresh:
+        res["cached"] = False
+        results[res["case"]] = res
+        if cache_dir and res["passed"]:
+            path = _cache_path(cache_dir, keys[res["case"]])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as fh:
+                json.dump({k: v for k, v in res.items() if k != "cached"}, fh)
+            os.replace(tmp, path)
+    return {
+        "bundle": bundle,
+        "passed": all(r["passed"] for r in results.values()),
+        "ran": len(todo),
+        "cached": len(cases) - len(todo),
+        "wall_s": round(time.perf_counter() - t0, 3),
+        "cases": [results[n] for n in sorted(results)],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--cases", default=str(CASES_DIR))
+    ap.add_argument("--case", action="append", help="run only this case (repeatable)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (0 = in process)")
+    ap.add_argument("--cache-dir", default=CACHE_DIR)
+    ap.add_argument("--no-cache", action="store_true", help="run every case and do not record results")
+    ap.add_argument("--json", help="write the report here")
+    args = ap.parse_args(argv)
+    cases = load_cases(Path(args.cases), args.case)
+    if not cases:
+        print("no golden cases found", file=sys.stderr)
+        return 1
+    report = run(cases, args.workers, None if args.no_cache else args.cache_dir)
+    for r in report["cases"]:
+        status = "PASS" if r["passed"] else "FAIL"
+        timing = " ".join(f"{s}={ms:.1f}" for s, ms in r["stages_ms"].items())
+        print(f"{status:<5}{'(cached) ' if r['cached'] else ''}{r['case']:<32} {timing}")
+        for f in r["failures"]:
+            print(f"      {f}")
+    print(f"{len(report['cases'])} cases: {report['ran']} run, {report['cached']} cached, "
+          f"{sum(not r['passed'] for r in report['cases'])} failed in {report['wall_s']}s (bundle {report['bundle'][:12]})")
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(report, fh, indent=2)
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,631 @@
+"""
+Local interpreter for the pr-review-orchestrator state machine.
+
+Loads the Amazon States Language definition straight from cfn/pr-review-orchestration.yaml
+and resolves each ``${...Fn}`` through the compute stack's exports to the handler it names
+(e.g. pr-compute:TfPlanParserFn -> tf_plan_parser.handler). Tasks then call the Python
+handlers in-process. AWS is served by in-memory fakes (FakeS3, FakeDynamoDB, stub SSM/SNS/
+Bedrock/IAM) and GitHub/Teams by tools/fake_github.py.
+
+Supported: Task (lambda:invoke and direct Lambda ARNs), Pass, Choice, Succeed, Fail;
+InputPath, Parameters (including States.Format), ResultSelector, ResultPath, OutputPath;
+Retry and Catch. A Choice on a path that does not exist fails the execution with
+States.Runtime, and state over 256KB fails it with States.DataLimitExceeded, as in AWS.
+This is how wiring mistakes show up here.
+
+Usage:
+    python tools/sfn_local.py --prs 200 --concurrency 8 [--runner] [--agent-ms 800] [--logs out/]
+    python tools/sfn_local.py --prs 1 --show          # print one execution's final state
+
+Executions run in worker processes (one in-flight execution per process, like a Lambda
+container). The report gives throughput, end-to-end latency percentiles and per-state latency.
+"""
+import argparse
+import copy
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from lambdas.tf_plan_parser import summary_from_plan  # noqa: E402
+from tools.synth_plan import generate  # noqa: E402
+
+ORCHESTRATION = ROOT / "cfn" / "pr-review-orchestration.yaml"
+COMPUTE = ROOT / "cfn" / "pr-review-compute.yaml"
+STATE_LIMIT_BYTES = 256 * 1024
+LOCAL_PREFIX = "local:"
+TABLE = "PRRuns"
+BUCKET = "pr-artifacts"
+BUNDLE = "local-bundle"
+TEAMS_SECRET = "local:teams-webhook"
+
+
+class StatesError(Exception):
+    def __init__(self, error: str, cause: str = ""):
+        super().__init__(f"{error}: {cause}")
+        self.error = error
+        self.cause = cause
+
+
+# -- template loading --------------------------------------------------------
+class _CfnLoader(yaml.SafeLoader):
+    pass
+
+
+def _tag(loader, suffix, node):
+    if isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node, deep=True)
+    elif isinstance(node, yaml.MappingNode):
+        value = loader.construct_mapping(node, deep=True)
+    else:
+        value = loader.construct_scalar(node)
+    return {suffix: value}
+
+
+_CfnLoader.add_multi_constructor("!", _tag)
+
+
+def _load(path: Path) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as fh:
+        return yaml.load(fh, Loader=_CfnLoader)
+
+
+def functions(compute: Path = COMPUTE) -> Dict[str, Dict[str, Any]]:
+    """Export name -> {module, timeout_s} for every Lambda the compute stack exports."""
+    tpl = _load(compute)
+    res = tpl.get("Resources") or {}
+    out = {}
+    for o in (tpl.get("Outputs") or {}).values():
+        name = ((o.get("Export") or {}).get("Name"))
+        att = (o.get("Value") or {}).get("GetAtt") if isinstance(o.get("Value"), dict) else None
+        if not (name and att):
+            continue
+        props = (res.get(att.split(".")[0]) or {}).get("Properties") or {}
+        handler = props.get("Handler")
+        if handler:
+            out[name] = {"module": handler.rsplit(".", 1)[0], "timeout_s": int(props.get("Timeout") or 3)}
+    return out
+
+
+def definition(params: Optional[Dict[str, str]] = None, orchestration: Path = ORCHESTRATION,
+               compute: Path = COMPUTE) -> Dict[str, Any]:
+    """The state machine JSON with ${...} resolved: functions -> ``local:<module>``, parameters -> values."""
+    tpl = _load(orchestration)
+    body, variables = tpl["Resources"]["PRReviewStateMachine"]["Properties"]["DefinitionString"]["Sub"]
+    fns = functions(compute)
+    values: Dict[str, str] = {k: str(p.get("Default", "")) for k, p in (tpl.get("Parameters") or {}).items()}
+    values.update(params or {})
+    for name, ref in variables.items():
+        export = ref.get("ImportValue") if isinstance(ref, dict) else None
+        if export in fns:
+            values[name] = LOCAL_PREFIX + fns[export]["module"]
+
+    def sub(m):
+        if m.group(1) not in values:
+            raise KeyError(f"unresolved ${{{m.group(1)}}} in state machine definition")
+        return values[m.group(1)]
+    return json.loads(re.sub(r"\$\{([\w:]+)\}", sub, body))
+
+
+# -- paths and payload templates -------------------------------------------
+_SEG = re.compile(r"\.([^.\[]+)|\[(\d+)\]")
+_MISSING = object()
+
+
+def get_path(data: Any, path: str, ctx: Optional[Dict[str, Any]] = None) -> Any:
+    if path.startswith("$$"):
+        data, path = ctx or {}, path[1:]
+    if path == "$":
+        return data
+    if not path.startswith("$"):
+        raise StatesError("States.Runtime", f"invalid path {path}")
+    cur = data
+    for key, idx in _SEG.findall(path[1:]):
+        if idx:
+            if not isinstance(cur, list) or int(idx) >= len(cur):
+                return _MISSING
+            cur = cur[int(idx)]
+        else:
+            if not isinstance(cur, dict) or key not in cur:
+                return _MISSING
+            cur = cur[key]
+    return cur
+
+
+def _must(data: Any, path: str, ctx: Dict[str, Any]) -> Any:
+    v = get_path(data, path, ctx)
+    if v is _MISSING:
+        raise StatesError("States.Runtime", f"path {path} not found in input")
+    return v
+
+
+def set_path(data: Any, path: Optional[str], value: Any) -> Any:
+    """Apply a ResultPath: None discards the result, '$' replaces the input."""
+    if path is None:
+        return data
+    if path == "$":
+        return value
+    out = copy.copy(data) if isinstance(data, dict) else {}
+    cur = out
+    keys = [k for k, _ in _SEG.findall(path[1:])]
+    for k in keys[:-1]:
+        nxt = cur.get(k)
+        nxt = copy.copy(nxt) if isinstance(nxt, dict) else {}
+        cur[k] = nxt
+        cur = nxt
+    cur[keys[-1]] = value
+    return out
+
+
+def _intrinsic(expr: str, data: Any, ctx: Dict[str, Any]) -> Any:
+    m = re.fullmatch(r"States\.Format\((.*)\)", expr.strip(), re.S)
+    if not m:
+        raise StatesError("States.Runtime", f"unsupported intrinsic {expr}")
+    args = [a.strip() for a in re.findall(r"'(?:[^'\\]|\\.)*'|[^,]+", m.group(1))]
+    fmt = args[0][1:-1]
+    vals = [str(_must(data, a, ctx)) for a in args[1:]]
+    it = iter(vals)
+    return re.sub(r"\{\}", lambda _: next(it), fmt)
+
+
+def render(tpl: Any, data: Any, ctx: Dict[str, Any]) -> Any:
+    """Evaluate a Parameters/ResultSelector template against ``data``."""
+    if isinstance(tpl, dict):
+        out = {}
+        for k, v in tpl.items():
+            if k.endswith(".$"):
+                out[k[:-2]] = _intrinsic(v, data, ctx) if v.startswith("States.") else _must(data, v, ctx)
+            else:
+                out[k] = render(v, data, ctx)
+        return out
+    if isinstance(tpl, list):
+        return [render(v, data, ctx) for v in tpl]
+    return tpl
+
+
+# -- choice rules ---------------------------------------------------------------
+_CMP: Dict[str, Callable[[Any, Any], bool]] = {
+    "StringEquals": lambda a, b: isinstance(a, str) and a == b,
+    "StringLessThan": lambda a, b: isinstance(a, str) and a < b,
+    "StringGreaterThan": lambda a, b: isinstance(a, str) and a > b,
+    "BooleanEquals": lambda a, b: isinstance(a, bool) and a == b,
+    "NumericEquals": lambda a, b: _num(a) and a == b,
+    "NumericLessThan": lambda a, b: _num(a) and a < b,
+    "NumericLessThanEquals": lambda a, b: _num(a) and a <= b,
+    "NumericGreaterThan": lambda a, b: _num(a) and a > b,
+    "NumericGreaterThanEquals": lambda a, b: _num(a) and a >= b,
+}
+_TYPE = {
+    "IsNull": lambda a: a is None,
+    "IsString": lambda a: isinstance(a, str),
+    "IsBoolean": lambda a: isinstance(a, bool),
+    "IsNumeric": lambda a: _num(a),
+}
+
+
+def _num(a: Any) -> bool:
+    return isinstance(a, (int, float)) and not isinstance(a, bool)
+
+
+def choice_matches(rule: Dict[str, Any], data: Any, ctx: Dict[str, Any]) -> bool:
+    if "And" in rule:
+        return all(choice_matches(r, data, ctx) for r in rule["And"])
+    if "Or" in rule:
+        return any(choice_matches(r, data, ctx) for r in rule["Or"])
+    if "Not" in rule:
+        return not choice_matches(rule["Not"], data, ctx)
+    value = get_path(data, rule["Variable"], ctx)
+    if "IsPresent" in rule:
+        return (value is not _MISSING) == rule["IsPresent"]
+    if value is _MISSING:
+        raise StatesError("States.Runtime", f"Invalid path '{rule['Variable']}': The choice state's condition path references an invalid value.")
+    for op, fn in _TYPE.items():
+        if op in rule:
+            return fn(value) == rule[op]
+    for op, fn in _CMP.items():
+        if op in rule:
+            return fn(value, rule[op])
+        if op + "Path" in rule:
+            return fn(value, _must(data, rule[op + "Path"], ctx))
+    raise StatesError("States.Runtime", f"unsupported choice rule {sorted(rule)}")
+
+
+# -- interpreter ------------------------------------------------------------------
+class LambdaContext:
+    def __init__(self, timeout_s: int):
+        self.aws_request_id = str(uuid.uuid4())
+        self._deadline = time.monotonic() + timeout_s
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def _matches(error: str, names: List[str]) -> bool:
+    return "States.ALL" in names or error in names or (error != "States.Timeout" and "States.TaskFailed" in names)
+
+
+class Emulator:
+    """Runs executions of one definition; ``invoke(module, payload, timeout_s)`` calls the handler."""
+
+    def __init__(self, definition: Dict[str, Any], timeouts: Optional[Dict[str, int]] = None,
+                 retry_scale: float = 0.0):
+        self.definition = definition
+        self.timeouts = timeouts or {}
+        self.retry_scale = retry_scale
+
+    def invoke(self, module: str, payload: Any) -> Any:
+        handler = importlib.import_module(f"lambdas.{module}").handler
+        # Lambda sees JSON, not the caller's objects
+        return json.loads(json.dumps(handler(json.loads(json.dumps(payload)), LambdaContext(self.timeouts.get(module, 60)))))
+
+    def _task(self, st: Dict[str, Any], data: Any, ctx: Dict[str, Any]) -> Any:
+        params = render(st["Parameters"], data, ctx) if "Parameters" in st else data
+        res = st["Resource"]
+        if res == "arn:aws:states:::lambda:invoke":
+            fn = params.get("FunctionName", "")
+            if not fn.startswith(LOCAL_PREFIX):
+                raise StatesError("States.Runtime", f"unknown function {fn}")
+            try:
+                out = self.invoke(fn[len(LOCAL_PREFIX):], params.get("Payload", {}))
+            except StatesError:
+                raise
+            except Exception as e:
+                raise StatesError(type(e).__name__, str(e))
+            return {"ExecutedVersion": "$LATEST", "Payload": out, "StatusCode": 200}
+        if res.startswith(LOCAL_PREFIX):
+            try:
+                return self.invoke(res[len(LOCAL_PREFIX):], params)
+            except Exception as e:
+                raise StatesError(type(e).__name__, str(e))
+        raise StatesError("States.Runtime", f"unsupported resource {res}")
+
+    def run(self, execution_input: Dict[str, Any], name: Optional[str] = None) -> Dict[str, Any]:
+        """One execution; returns {status, output|error, states: [(name, ms)], ms}."""
+        sm = self.definition
+        started = datetime.now(timezone.utc)
+        ctx = {"Execution": {"Id": name or str(uuid.uuid4()), "Input": execution_input,
+                             "StartTime": started.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"}}
+        data: Any = execution_input
+        current = sm["StartAt"]
+        trail: List[Tuple[str, float]] = []
+        t_exec = time.perf_counter()
+        while True:
+            st = sm["States"][current]
+            ctx["State"] = {"Name": current, "EnteredTime": datetime.now(timezone.utc).isoformat()}
+            t0 = time.perf_counter()
+            nxt: Optional[str] = None
+            try:
+                data, nxt = self._step(current, st, data, ctx)
+                size = len(json.dumps(data))
+                if size > STATE_LIMIT_BYTES:
+                    raise StatesError("States.DataLimitExceeded", f"state output of {current} is {size} bytes")
+            except StatesError as e:
+                trail.append((current, (time.perf_counter() - t0) * 1000.0))
+                return {"status": "FAILED", "error": e.error, "cause": e.cause, "state": current, "states": trail,
+                        "ms": (time.perf_counter() - t_exec) * 1000.0}
+            trail.append((current, (time.perf_counter() - t0) * 1000.0))
+            if st["Type"] == "Fail":
+                return {"status": "FAILED", "error": st.get("Error", ""), "cause": st.get("Cause", ""), "state": current,
+                        "states": trail, "ms": (time.perf_counter() - t_exec) * 1000.0}
+            if nxt is None:
+                return {"status": "SUCCEEDED", "output": data, "states": trail, "ms": (time.perf_counter() - t_exec) * 1000.0}
+            current = nxt
+
+    def _step(self, name: str, st: Dict[str, Any], data: Any, ctx: Dict[str, Any]) -> Tuple[Any, Optional[str]]:
+        kind = st["Type"]
+        if kind == "Choice":
+            inp = get_path(data, st["InputPath"], ctx) if st.get("InputPath") else data
+            for rule in st.get("Choices", []):
+                if choice_matches(rule, inp, ctx):
+                    return data, rule["Next"]
+            if "Default" not in st:
+                raise StatesError("States.NoChoiceMatched", name)
+            return data, st["Default"]
+        if kind in ("Succeed", "Fail"):
+            return data, None
+        inp = data if "InputPath" not in st else ({} if st["InputPath"] is None else _must(data, st["InputPath"], ctx))
+        if kind == "Pass":
+            result = st["Result"] if "Result" in st else (render(st["Parameters"], inp, ctx) if "Parameters" in st else inp)
+        elif kind == "Task":
+            try:
+                result = self._with_retry(st, inp, ctx)
+                if "ResultSelector" in st:
+                    result = render(st["ResultSelector"], result, ctx)
+            except StatesError as e:
+                for catcher in st.get("Catch", []):
+                    if _matches(e.error, catcher["ErrorEquals"]):
+                        out = set_path(data, catcher.get("ResultPath", "$"), {"Error": e.error, "Cause": e.cause})
+                        return out, catcher["Next"]
+                raise
+        else:
+            raise StatesError("States.Runtime", f"unsupported state type {kind}")
+        out = set_path(data, st.get("ResultPath", "$"), result)
+        if "OutputPath" in st:
+            out = {} if st["OutputPath"] is None else _must(out, st["OutputPath"], ctx)
+        return out, (None if st.get("End") else st["Next"])
+
+    def _with_retry(self, st: Dict[str, Any], inp: Any, ctx: Dict[str, Any]) -> Any:
+        attempts: Dict[int, int] = {}
+        while True:
+            try:
+                return self._task(st, inp, ctx)
+            except StatesError as e:
+                for i, r in enumerate(st.get("Retry", [])):
+                    if _matches(e.error, r["ErrorEquals"]):
+                        n = attempts.get(i, 0)
+                        if n >= r.get("MaxAttempts", 3):
+                            raise
+                        attempts[i] = n + 1
+                        delay = r.get("IntervalSeconds", 1) * r.get("BackoffRate", 2.0) ** n
+                        if self.retry_scale:
+                            time.sleep(delay * self.retry_scale)
+                        break
+                else:
+                    raise
+
+
+# -- local AWS / GitHub ---------------------------------------------------------
+class _Stub:
+    """Minimal AWS clients for the calls the pipeline makes outside S3/DynamoDB."""
+
+    def __init__(self, mode: str, agent_ms: float, verdict: Callable[[], Dict[str, Any]]):
+        self.mode = mode
+        self.agent_ms = agent_ms
+        self.verdict = verdict
+        self.published: List[Dict[str, Any]] = []
+        self.secrets: Dict[str, str] = {}
+
+    # ssm
+    def get_parameter(self, Name):
+        return {"Parameter": {"Name": Name, "Value": self.mode, "Version": 1}}
+
+    # sns
+    def publish(self, **kw):
+        self.published.append(kw)
+        return {"MessageId": str(uuid.uuid4())}
+
+    # secretsmanager
+    def get_secret_value(self, SecretId):
+        return {"SecretString": self.secrets[SecretId]}
+
+    # bedrock-agent-runtime
+    def invoke_agent(self, **kw):
+        if self.agent_ms:
+            time.sleep(self.agent_ms / 1000.0)
+        body = json.dumps(self.verdict()).encode("utf-8")
+        return {"responseStream": [{"chunk": {"bytes": body[:len(body) // 2]}}, {"chunk": {"bytes": body[len(body) // 2:]}}]}
+
+    # s3 presign (github_checks artifact links)
+    def generate_presigned_url(self, op, Params, ExpiresIn=3600):
+        return f"https://{Params['Bucket']}.local/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+
+class _Iam:
+    def __init__(self, roles: List[str]):
+        self.roles = roles
+
+    def get_paginator(self, op):
+        iam = self
+
+        class P:
+            def paginate(self, **kw):
+                if op == "list_roles":
+                    yield {"Roles": [{"RoleName": r} for r in iam.roles]}
+                else:
+                    yield {"AttachedPolicies": []}
+        return P()
+
+
+class LocalAWS:
+    """In-memory AWS and a local GitHub for the lambdas of one worker process.
+
+    ``install()`` applies ``patches()`` and ``env()`` process-wide; tests apply them through
+    monkeypatch instead. Call ``close()`` to stop the fake GitHub server.
+    """
+
+    def __init__(self, mode: str = "suggest_approve", agent_ms: float = 0.0, seed: int = 0, drift_rate: float = 0.1):
+        from tools.fake_dynamodb import FakeDynamoDB
+        from tools.fake_github import FakeGitHub
+        from tools.fake_s3 import FakeS3
+
+        self.s3 = FakeS3()
+        self.ddb = FakeDynamoDB()
+        self.rng = random.Random(seed)
+        self.stub = _Stub(mode, agent_ms, self._verdict)
+        # Roles the spoke accounts "have"; set per execution from the plan, minus one when drifting
+        self.iam = _Iam([])
+        self.drift_rate = drift_rate
+        self.github = FakeGitHub().start()
+        self.github.route("POST", r"/teams-webhook", lambda m, body, headers: (200, {}, {}))
+        self.stub.secrets[TEAMS_SECRET] = json.dumps({"url": f"{self.github.url}/teams-webhook"})
+        self.ddb.put_item(TableName=TABLE, Item={"run_id": {"S": f"CONFIG#BUNDLE#{BUNDLE}"}, "approved": {"BOOL": True}})
+
+    def _verdict(self) -> Dict[str, Any]:
+        v = self.rng.choices(["green", "amber", "red"], weights=[6, 3, 1])[0]
+        return {"verdict": v, "confidence": round(self.rng.uniform(0.6, 0.99), 2),
+                "drivers": [f"synthetic:{v}"], "markdown": f"Synthetic review: **{v}**"}
+
+    def _client(self, service: str, session: Any = None) -> Any:
+        if isinstance(session, _Iam):
+            return session
+        return {"s3": self.s3, "dynamodb": self.ddb}.get(service, self.stub)
+
+    def patches(self) -> List[Tuple[Any, str, Any]]:
+        from lambdas import _budget, _config_cache, agent_invoker, drift_check, github_checks, publisher, teams_notifier
+
+        emu = self
+        return [
+            (_budget.Budget, "client", lambda self, service, cap, session=None: emu._client(service, session)),
+            (drift_check, "_assume", lambda acct, role, sts=None: emu.iam),
+            (github_checks, "S3", self.stub),
+            (agent_invoker, "AGENT_ID", "local-agent"),
+            (publisher, "TABLE_NAME", TABLE),
+            (publisher, "SNS_TOPIC_ARN", "arn:aws:sns:local:000000000000:pr-review-events"),
+            (_config_cache, "TABLE_NAME", TABLE),
+            (_config_cache, "BUNDLE_HASH", BUNDLE),
+            (teams_notifier, "SECRETS_ARN", TEAMS_SECRET),
+        ]
+
+    def env(self) -> Dict[str, str]:
+        return {"GITHUB_API_URL": self.github.url, "GITHUB_TOKEN": "local-token"}
+
+    def install(self, logs: Optional[str] = None) -> "LocalAWS":
+        """Patch this process; handler logs go to ``logs/worker-<pid>.jsonl`` or nowhere."""
+        for obj, name, value in self.patches():
+            setattr(obj, name, value)
+        os.environ.update(self.env())
+        if logs:
+            os.makedirs(logs, exist_ok=True)
+            sys.stdout = open(os.path.join(logs, f"worker-{os.getpid()}.jsonl"), "a", buffering=1)
+        else:
+            sys.stdout = open(os.devnull, "w")
+        return self
+
+    def close(self) -> None:
+        self.github.stop()
+
+    def execution_input(self, i: int, plan: Dict[str, Any]) -> Dict[str, Any]:
+        run_id = f"local-{i:06d}"
+        key = f"{run_id}/plan.json"
+        roles = summary_from_plan(plan)["iam"]["roles_affected"]
+        if roles and self.rng.random() < self.drift_rate:
+            roles.pop(self.rng.randrange(len(roles)))
+        self.iam.roles = roles
+        self.s3.put_object(Bucket=BUCKET, Key=key, Body=json.dumps(plan).encode("utf-8"))
+        return {"run_id": run_id, "repo": "org/infra", "sha": f"{i:040x}", "pr_number": i + 1,
+                "bucket": BUCKET, "plan_key": key, "token": "local-token",
+                "policy": plan.get("_policy") or {}, "trust": {}, "metadata": {"tags": {"Owner": "o", "CostCenter": "c"}}}
+
+
+def synthetic_plan(i: int, resources: int = 40, seed: int = 0) -> Dict[str, Any]:
+    """PR ``i``'s plan: tools/synth_plan.py with small policies and an occasional wildcard."""
+    return generate(resources, iam_ratio=0.4, module_depth=1, policy_size=2, accounts=4, seed=seed * 1_000_003 + i)
+
+
+# -- benchmark driver -------------------------------------------------------------
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(params: Dict[str, str], mode: str, agent_ms: float, seed: int, logs: Optional[str],
+                 retry_scale: float) -> None:
+    aws = LocalAWS(mode=mode, agent_ms=agent_ms, seed=seed).install(logs)
+    timeouts = {f["module"]: f["timeout_s"] for f in functions().values()}
+    _WORKER.update(aws=aws, emu=Emulator(definition(params), timeouts, retry_scale))
+
+
+def _run_one(args: Tuple[int, int, int]) -> Dict[str, Any]:
+    i, resources, seed = args
+    aws, emu = _WORKER["aws"], _WORKER["emu"]
+    # Same PR, same drift/verdict draws, whichever worker runs it
+    aws.rng.seed(seed * 1_000_003 + i)
+    res = emu.run(aws.execution_input(i, synthetic_plan(i, resources, seed)), name=f"local-{i}")
+    res.pop("output", None)
+    return res
+
+
+def _pct(vals: List[float], q: float) -> float:
+    if not vals:
+        return 0.0
+    s = sorted(vals)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+
+def report(results: List[Dict[str, Any]], wall_s: float) -> Dict[str, Any]:
+    per_state: Dict[str, List[float]] = {}
+    for r in results:
+        for name, ms in r["states"]:
+            per_state.setdefault(name, []).append(ms)
+    totals = [r["ms"] for r in results]
+    failed = [r for r in results if r["status"] != "SUCCEEDED"]
+    return {
+        "executions": len(results),
+        "failed": len(failed),
+        "errors": sorted({f"{r['state']}: {r['error']}" for r in failed}),
+        "wall_s": round(wall_s, 3),
+        "throughput_per_s": round(len(results) / wall_s, 2) if wall_s else 0.0,
+        "latency_ms": {"p50": round(_pct(totals, 0.5), 2), "p95": round(_pct(totals, 0.95), 2),
+                       "p99": round(_pct(totals, 0.99), 2), "max": round(max(totals or [0]), 2)},
+        "states": {n: {"count": len(v), "p50_ms": round(_pct(v, 0.5), 3), "p95_ms": round(_pct(v, 0.95), 3),
+                       "total_ms": round(sum(v), 1)} for n, v in sorted(per_state.items(), key=lambda kv: -sum(kv[1]))},
+    }
+
+
+def benchmark(prs: int, concurrency: int, params: Optional[Dict[str, str]] = None, mode: str = "suggest_approve",
+              agent_ms: float = 0.0, resources: int = 40, seed: int = 0, logs: Optional[str] = None,
+              retry_scale: float = 0.0) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    with ProcessPoolExecutor(max_workers=concurrency, mp_context=ctx, initializer=_init_worker,
+                             initargs=(params or {}, mode, agent_ms, seed, logs, retry_scale)) as pool:
+        # Warm every worker (imports, fake GitHub) before the clock starts
+        list(pool.map(_noop, range(concurrency)))
+        t0 = time.perf_counter()
+        results = list(pool.map(_run_one, [(i, resources, seed) for i in range(prs)]))
+        wall = time.perf_counter() - t0
+    return report(results, wall)
+
+
+def _noop(_: int) -> None:
+    time.sleep(0.05)
+
+
+def _print(rep: Dict[str, Any]) -> None:
+    lat = rep["latency_ms"]
+    print(f"executions {rep['executions']}  failed {rep['failed']}  wall {rep['wall_s']}s  "
+          f"throughput {rep['throughput_per_s']}/s")
+    print(f"end-to-end ms  p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}")
+    for e in rep["errors"]:
+        print(f"  error {e}")
+    print(f"{'state':<24}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'total ms':>12}")
+    for n, s in rep["states"].items():
+        print(f"{n:<24}{s['count']:>7}{s['p50_ms']:>10.3f}{s['p95_ms']:>10.3f}{s['total_ms']:>12.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--prs", type=int, default=50, help="synthetic PR executions")
+    ap.add_argument("--concurrency", type=int, default=4, help="worker processes (in-flight executions)")
+    ap.add_argument("--runner", action="store_true", help="UsePipelineRunner=true")
+    ap.add_argument("--param", action="append", default=[], help="template parameter override NAME=VALUE")
+    ap.add_argument("--mode", default="suggest_approve", help="SSM review mode served by the stub")
+    ap.add_argument("--agent-ms", type=float, default=0.0, help="simulated Bedrock agent latency")
+    ap.add_argument("--resources", type=int, default=40, help="resources per synthetic plan")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--retry-scale", type=float, default=0.0, help="multiply Retry intervals (0 = no sleeping)")
+    ap.add_argument("--logs", help="write handler logs here (one JSON-lines file per worker; see tools/trace_view.py)")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    ap.add_argument("--show", action="store_true", help="run one execution in-process and print its final state")
+    args = ap.parse_args(argv)
+    params = dict(p.split("=", 1) for p in args.param)
+    if args.runner:
+        params["UsePipelineRunner"] = "true"
+    if args.show:
+        real_stdout = sys.stdout
+        aws = LocalAWS(mode=args.mode, agent_ms=args.agent_ms, seed=args.seed).install(args.logs)
+        res = Emulator(definition(params)).run(aws.execution_input(0, synthetic_plan(0, args.resources, args.seed)))
+        sys.stdout = real_stdout
+        print(json.dumps(res, indent=2, default=str))
+        aws.close()
+        return 0 if res["status"] == "SUCCEEDED" else 1
+    rep = benchmark(args.prs, args.concurrency, params, args.mode, args.agent_ms, args.resources, args.seed,
+                    args.logs, args.retry_scale)
+    print(json.dumps(rep, indent=2)) if args.json else _print(rep)
+    return 0 if not rep["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
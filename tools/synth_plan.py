@@ -0,0 +1,120 @@
+"""
+Deterministic synthetic Terraform plans (``terraform show -json`` shape) for benchmarks and load runs.
+
+The same parameters and seed always give the same plan, byte for byte. Knobs:
+  resources       resource_changes entries
+  iam_ratio       share of IAM resources (roles, policies, inline policies, attachments)
+  module_depth    maximum module nesting of an address (module.a.module.b...)
+  policy_size     statements per policy document
+  duplicate_rate  share of policy documents that repeat an earlier document verbatim
+  wildcard_rate   share of policies with an Action:* statement
+  accounts        distinct AccountId tags spread over the resources
+
+Usage:
+    python tools/synth_plan.py --resources 10000 --iam-ratio 0.4 --module-depth 3 > plan.json
+"""
+import argparse
+import json
+import random
+import sys
+from typing import Any, Dict, List, Optional
+
+IAM_MIX = [
+    ("aws_iam_role", 3),
+    ("aws_iam_policy", 3),
+    ("aws_iam_role_policy", 2),
+    ("aws_iam_role_policy_attachment", 2),
+]
+OTHER_TYPES = ["aws_s3_bucket", "aws_lambda_function", "aws_sqs_queue", "aws_dynamodb_table", "aws_sns_topic",
+               "aws_cloudwatch_log_group", "aws_security_group", "aws_kms_key"]
+ACTIONS = ["s3:GetObject", "s3:PutObject", "s3:ListBucket", "dynamodb:GetItem", "dynamodb:Query",
+           "sqs:SendMessage", "sns:Publish", "logs:PutLogEvents", "kms:Decrypt", "lambda:InvokeFunction",
+           "iam:PassRole", "sts:AssumeRole", "ec2:DescribeInstances", "ssm:GetParameter"]
+PLAN_ACTIONS = [(["create"], 5), (["update"], 3), (["delete"], 1), (["delete", "create"], 1)]
+POLICY_TYPES = {"aws_iam_policy", "aws_iam_role_policy"}
+
+
+def _pick(rng: random.Random, weighted):
+    return rng.choices([v for v, _ in weighted], weights=[w for _, w in weighted])[0]
+
+
+def _statement(rng: random.Random, account: str, wildcard: bool) -> Dict[str, Any]:
+    if wildcard:
+        return {"Effect": "Allow", "Action": "*", "Resource": "*"}
+    actions = sorted(rng.sample(ACTIONS, rng.randint(1, 4)))
+    svc = actions[0].split(":")[0]
+    return {"Effect": "Allow", "Action": actions if len(actions) > 1 else actions[0],
+            "Resource": f"arn:aws:{svc}:us-east-1:{account}:res-{rng.randrange(10_000)}"}
+
+
+def generate(resources: int = 100, iam_ratio: float = 0.3, module_depth: int = 2, policy_size: int = 4,
+             duplicate_rate: float = 0.1, wildcard_rate: float = 0.01, accounts: int = 5, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    accts = [str(100000000000 + n) for n in range(max(1, accounts))]
+    module_names = [f"m{n}" for n in range(max(4, resources // 50))]
+    docs: List[str] = []
+    changes = []
+    for n in range(resources):
+        path = "".join(f"module.{rng.choice(module_names)}." for _ in range(rng.randint(0, module_depth)))
+        iam = rng.random() < iam_ratio
+        rtype = _pick(rng, IAM_MIX) if iam else rng.choice(OTHER_TYPES)
+        account = rng.choice(accts)
+        after: Dict[str, Any] = {"tags": {"AccountId": account, "Owner": "team", "CostCenter": "cc"}}
+        if rtype == "aws_iam_role":
+            after["name"] = f"role-{n}"
+            after["assume_role_policy"] = json.dumps({"Version": "2012-10-17", "Statement": [
+                {"Effect": "Allow", "Principal": {"Service": "lambda.amazonaws.com"}, "Action": "sts:AssumeRole"}]})
+        elif rtype in POLICY_TYPES:
+            if docs and rng.random() < duplicate_rate:
+                doc = rng.choice(docs)
+            else:
+                wildcard = rng.random() < wildcard_rate
+                stmts = [_statement(rng, account, wildcard and i == 0) for i in range(max(1, policy_size))]
+                doc = json.dumps({"Version": "2012-10-17", "Statement": stmts})
+                docs.append(doc)
+            after["policy"] = doc
+            after["name"] = f"policy-{n}"
+        elif rtype == "aws_iam_role_policy_attachment":
+            after["role"] = f"role-{rng.randrange(max(1, n))}"
+            after["policy_arn"] = f"arn:aws:iam::{account}:policy/policy-{rng.randrange(max(1, n))}"
+        else:
+            after["name"] = f"{rtype.split('_', 1)[1]}-{n}"
+        actions = _pick(rng, PLAN_ACTIONS)
+        change: Dict[str, Any] = {"actions": actions, "after": None if actions == ["delete"] else after}
+        if actions != ["create"]:
+            change["before"] = after
+        changes.append({"address": f"{path}{rtype}.r{n}", "type": rtype, "change": change})
+    return {"format_version": "1.2", "terraform_version": "1.7.0", "resource_changes": changes}
+
+
+def policy_document(plan: Dict[str, Any], limit: Optional[int] = None) -> Dict[str, Any]:
+    """Every policy statement in the plan as one document (the shape iam_lint.lint_policy takes)."""
+    stmts: List[Dict[str, Any]] = []
+    for rc in plan.get("resource_changes") or []:
+        doc = ((rc.get("change") or {}).get("after") or {}).get("policy")
+        if doc:
+            stmts.extend(json.loads(doc)["Statement"])
+            if limit and len(stmts) >= limit:
+                break
+    return {"Version": "2012-10-17", "Statement": stmts[:limit] if limit else stmts}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--resources", type=int, default=100)
+    ap.add_argument("--iam-ratio", type=float, default=0.3)
+    ap.add_argument("--module-depth", type=int, default=2)
+    ap.add_argument("--policy-size", type=int, default=4)
+    ap.add_argument("--duplicate-rate", type=float, default=0.1)
+    ap.add_argument("--wildcard-rate", type=float, default=0.01)
+    ap.add_argument("--accounts", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    plan = generate(args.resources, args.iam_ratio, args.module_depth, args.policy_size, args.duplicate_rate,
+                    args.wildcard_rate, args.accounts, args.seed)
+    json.dump(plan, sys.stdout, separators=(",", ":"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Per-run waterfall / flame view of the ``trace.span`` records emitted by lambdas/_trace.py.
+
+Input is JSON lines as the lambdas print them: a CloudWatch Logs export, the output of
+``aws logs filter-log-events --output json`` (events whose message holds the record), or
+captured stdout from local runs. Spans from every stage of a run share its run_id, so one
+run's ParsePlan, OPAGate, DriftCheck and AgentReview line up on a single timeline.
+
+Usage:
+    python tools/trace_view.py logs.jsonl [more.jsonl ...] [--run RUN_ID] [--width 50]
+    python tools/trace_view.py logs.jsonl --chrome trace.json   # open in ui.perfetto.dev / chrome://tracing
+    python tools/trace_view.py logs.jsonl --summary             # time per span name across runs
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List
+
+SPAN_MESSAGE = "trace.span"
+# Keys of a span record that are structure, not attributes
+_STRUCT = {"ts", "level", "message", "run_id", "repo", "sha", "span", "span_id", "parent_id", "stage", "start_ms", "dur_ms", "sample_rate"}
+
+
+def _records(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            # Lambda's "<ts>\t<request id>\t<message>" prefix, when present
+            try:
+                rec = json.loads(line.rsplit("\t", 1)[-1])
+            except ValueError:
+                continue
+        if isinstance(rec, dict) and isinstance(rec.get("events"), list):
+            # filter-log-events output
+            for ev in rec["events"]:
+                yield from _records([ev.get("message") or ""])
+            continue
+        if isinstance(rec, dict) and rec.get("message") == SPAN_MESSAGE:
+            yield rec
+
+
+def load(paths: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Spans grouped by run_id, in start order."""
+    runs: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for path in paths:
+        with (sys.stdin if path == "-" else open(path)) as fh:
+            for rec in _records(fh):
+                runs[str(rec.get("run_id") or "unknown")].append(rec)
+    for spans in runs.values():
+        spans.sort(key=lambda s: (s["start_ms"], -s["dur_ms"]))
+    return dict(runs)
+
+
+def tree(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Depth-first order with ``depth`` set; spans whose parent is missing become roots."""
+    ids = {s["span_id"] for s in spans}
+    children: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+    for s in spans:
+        children[s.get("parent_id") if s.get("parent_id") in ids else None].append(s)
+    out: List[Dict[str, Any]] = []
+
+    def walk(parent: Any, depth: int) -> None:
+        for s in children.get(parent, []):
+            out.append(dict(s, depth=depth))
+            walk(s["span_id"], depth + 1)
+
+    walk(None, 0)
+    return out
+
+
+def _attrs(s: Dict[str, Any]) -> str:
+    return " ".join(f"{k}={v}" for k, v in s.items() if k not in _STRUCT and k != "depth")
+
+
+def waterfall(run_id: str, spans: List[Dict[str, Any]], width: int = 50) -> str:
+    t0 = min(s["start_ms"] for s in spans)
+    t1 = max(s["start_ms"] + s["dur_ms"] for s in spans)
+    total = max(t1 - t0, 1e-6)
+    stages = {s.get("stage") for s in spans}
+    lines = [f"run {run_id}  {total:.1f} ms  ({len(stages)} stages, {len(spans)} spans)",
+             f"{'offset ms':>10} {'dur ms':>9}  {'span':<40} timeline"]
+    for s in tree(spans):
+        a = int((s["start_ms"] - t0) / total * width)
+        b = max(a + 1, int((s["start_ms"] + s["dur_ms"] - t0) / total * width))
+        bar = " " * a + "#" * (b - a) + " " * (width - b)
+        label = ("  " * s["depth"] + s["span"])[:40]
+        extra = _attrs(s)
+        lines.append(f"{s['start_ms'] - t0:>10.1f} {s['dur_ms']:>9.1f}  {label:<40} |{bar}| {extra}".rstrip())
+    return "\n".join(lines)
+
+
+def chrome(runs: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Chrome trace-event JSON: one process per run, one thread row per stage."""
+    events = []
+    for pid, (run_id, spans) in enumerate(sorted(runs.items()), start=1):
+        events.append({"ph": "M", "name": "process_name", "pid": pid, "args": {"name": f"run {run_id}"}})
+        for s in spans:
+            events.append({
+                "name": s["span"], "cat": s.get("stage") or "", "ph": "X", "pid": pid, "tid": s.get("stage") or "",
+                "ts": round(s["start_ms"] * 1000), "dur": max(1, round(s["dur_ms"] * 1000)),
+                "args": {k: v for k, v in s.items() if k not in _STRUCT},
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def summary(runs: Dict[str, List[Dict[str, Any]]]) -> str:
+    by_name: Dict[str, List[float]] = defaultdict(list)
+    for spans in runs.values():
+        for s in spans:
+            by_name[s["span"]].append(s["dur_ms"])
+    lines = [f"{'span':<32}{'count':>7}{'total ms':>12}{'p50 ms':>10}{'max ms':>10}"]
+    for name, durs in sorted(by_name.items(), key=lambda kv: -sum(kv[1])):
+        durs.sort()
+        lines.append(f"{name[:32]:<32}{len(durs):>7}{sum(durs):>12.1f}{durs[len(durs) // 2]:>10.1f}{durs[-1]:>10.1f}")
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("paths", nargs="+", help="JSON-lines log files ('-' for stdin)")
+    ap.add_argument("--run", help="only this run_id")
+    ap.add_argument("--width", type=int, default=50)
+    ap.add_argument("--chrome", help="write Chrome trace-event JSON to this path")
+    ap.add_argument("--summary", action="store_true", help="per-span totals across runs")
+    args = ap.parse_args(argv)
+    runs = load(args.paths)
+    if args.run:
+        runs = {k: v for k, v in runs.items() if k == args.run}
+    if not runs:
+        print("no trace.span records found", file=sys.stderr)
+        return 1
+    if args.chrome:
+        with open(args.chrome, "w") as fh:
+            json.dump(chrome(runs), fh)
+    if args.summary:
+        print(summary(runs))
+    elif not args.chrome:
+        print("\n\n".join(waterfall(r, s, args.width) for r, s in sorted(runs.items())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())